@@ -0,0 +1,75 @@
+# benchmarks/bench_ai_fallback_offline.py
+"""
+Test de charge hors ligne du repli IA : deux faux fournisseurs
+(chatbot.fake_llm_server) derrière la passerelle, utilisateurs concurrents
+Usage : python benchmarks/bench_ai_fallback_offline.py [utilisateurs] [tours_par_utilisateur]
+"""
+import os
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from chatbot.fake_llm_server import FakeLLMConfig, serve
+
+USERS = int(sys.argv[1]) if len(sys.argv) > 1 else 20
+TURNS_PER_USER = int(sys.argv[2]) if len(sys.argv) > 2 else 5
+
+# Serveurs démarrés avant l'import de la passerelle, qui lit les URL à l'import
+primary = serve(0, FakeLLMConfig(latency_ms=500, sigma=0.5, error_rate=0.03, hang_rate=0.05, seed=1), background=True)
+backup = serve(0, FakeLLMConfig(latency_ms=700, sigma=0.3, error_rate=0.03, seed=2), background=True)
+os.environ.update({
+    "OPENAI_API_KEY": "fake", "OPENAI_BASE_URL": f"http://127.0.0.1:{primary.server_address[1]}/v1",
+    "OPENROUTER_API_KEY": "fake", "OPENROUTER_BASE_URL": f"http://127.0.0.1:{backup.server_address[1]}/v1",
+    "TOKTOK_LLM_CACHE_ENABLED": "0", "TOKTOK_LLM_TURN_DEADLINE_MS": "3000",
+})
+
+from chatbot import smart_fallback as sf  # noqa: E402
+from chatbot.llm_gateway import llm_gateway, turn_deadline  # noqa: E402
+from chatbot.llm_metering import llm_meter, for_user  # noqa: E402
+
+TURNS = [
+    ("son numéro c'est le zéro six cent vingt trois", "DEST_TEL", "coursier", "phone"),
+    ("environ cinq mille francs je pense", "COURIER_VALUE", "coursier", "amount"),
+    ("euh mettez en deux s'il vous plait", "MARKET_QUANTITY", "marketplace", "quantity"),
+    ("finalement je veux plutôt commander à manger", "DEST_NOM", "coursier", None),
+]
+
+
+def user_session(user: int):
+    timings, llm_answers = [], 0
+    with for_user(f"2420600{user:05d}"):
+        for i in range(TURNS_PER_USER):
+            text, step, flow, expected = TURNS[(user + i) % len(TURNS)]
+            t0 = time.perf_counter()
+            with turn_deadline():
+                turn = sf.understand_turn(f"{text} ({i})", step, flow, expected_type=expected)
+            timings.append((time.perf_counter() - t0) * 1000)
+            llm_answers += turn["llm_calls"]
+    return timings, llm_answers
+
+
+def percentile(values, q):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * q / 100))]
+
+
+if __name__ == "__main__":
+    print(f"{USERS} utilisateurs x {TURNS_PER_USER} tours, fournisseurs simulés sur le port "
+          f"{primary.server_address[1]} (5 % bloqués) et {backup.server_address[1]}")
+    print("-" * 80)
+    t0 = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=USERS) as pool:
+        results = list(pool.map(user_session, range(USERS)))
+    elapsed = time.perf_counter() - t0
+    timings = [t for r, _ in results for t in r]
+    answered = sum(n for _, n in results)
+    gw = llm_gateway.get_stats()
+    print(f"tours {len(timings)} en {elapsed:.1f} s   p50 {percentile(timings, 50):.0f} ms   "
+          f"p95 {percentile(timings, 95):.0f} ms   max {max(timings):.0f} ms")
+    print(f"tours tranchés par l'IA {answered}/{len(timings)}   couvertures {gw['hedges']} "
+          f"(gagnées {gw['hedge_won']})   bascules {gw['failovers']}   échéances → règles {gw['deadline_exceeded']}")
+    print(f"coût estimé {llm_meter.get_stats()['cost_usd']} USD")
+    primary.shutdown()
+    backup.shutdown()
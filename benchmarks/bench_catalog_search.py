@@ -0,0 +1,83 @@
+# benchmarks/bench_catalog_search.py
+"""
+Benchmark : recherche locale BM25 dans le catalogue vs balayage linéaire
+Catalogue synthétique (aucun appel backend)
+Usage : python benchmarks/bench_catalog_search.py [nombre_de_produits]
+"""
+import os
+import sys
+import time
+import random
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from chatbot.catalog_search import CatalogIndex
+from chatbot.gazetteer import fold
+
+N_PRODUCTS = int(sys.argv[1]) if len(sys.argv) > 1 else 3000
+ROUNDS = 200
+
+PLATS = ["Poulet mayo", "Poulet braisé", "Poisson salé", "Pizza reine", "Pizza margherita", "Burger maison",
+         "Saka-saka", "Pondu", "Frites", "Brochettes de bœuf", "Chawarma", "Jus de gingembre", "Bissap",
+         "Ndolé", "Riz sauté", "Beignets", "Attiéké poisson", "Salade composée", "Crêpes", "Glace vanille"]
+ADJECTIFS = ["", "épicé", "XL", "familial", "du chef", "maison", "à emporter"]
+QUERIES = ["poulet mayo", "pizza", "je veux du poisson braisé", "burg", "gingembre", "brochettes boeuf",
+           "chez mama", "saka saka", "attieke", "glace"]
+
+
+def catalog(n: int):
+    rng = random.Random(3)
+    merchants = [{"id": i, "nom_entreprise": f"{rng.choice(['Chez Mama', 'La Braise', 'Savana', 'Le Palmier', 'Maquis'])} {i}",
+                  "type_entreprise": {"nom": rng.choice(["Restaurant", "Boutique", "Pâtisserie"])}}
+                 for i in range(n // 30 + 1)]
+    products = []
+    for i in range(n):
+        plat = rng.choice(PLATS)
+        products.append((rng.choice(merchants), {
+            "id": i, "nom": f"{plat} {rng.choice(ADJECTIFS)}".strip(), "prix": rng.randint(5, 60) * 100,
+            "description": f"{plat.lower()} servi avec accompagnement",
+        }))
+    return merchants, products
+
+
+def linear(products, query):
+    """Approche naïve : chaque mot de la requête cherché dans chaque produit"""
+    words = fold(query).split()
+    scored = []
+    for merchant, prod in products:
+        hay = fold(f"{prod['nom']} {prod['description']} {merchant['nom_entreprise']}")
+        score = sum(1 for w in words if w in hay)
+        if score:
+            scored.append((score, prod["id"]))
+    return sorted(scored, reverse=True)[:8]
+
+
+if __name__ == "__main__":
+    merchants, products = catalog(N_PRODUCTS)
+    index = CatalogIndex()
+    index.add_merchants(merchants)
+    for merchant, prod in products:
+        index.add_products([prod], merchant=merchant)
+    t0 = time.perf_counter()
+    index.search("warmup")
+    t_build = (time.perf_counter() - t0) * 1000
+
+    print(f"{len(products)} produits, {len(merchants)} marchands, index construit en {t_build:.0f} ms")
+    print("-" * 72)
+    for query in QUERIES[:4]:
+        top = index.search(query, limit=3)
+        print(f"{query:<28} → " + " | ".join(f"{h['name']} ({h['score']})" for h in top))
+    print("-" * 72)
+
+    t0 = time.perf_counter()
+    for _ in range(ROUNDS // 10):
+        for query in QUERIES:
+            linear(products, query)
+    t_linear = (time.perf_counter() - t0) / (ROUNDS // 10 * len(QUERIES)) * 1000
+    t0 = time.perf_counter()
+    for _ in range(ROUNDS):
+        for query in QUERIES:
+            index.search(query)
+    t_index = (time.perf_counter() - t0) / (ROUNDS * len(QUERIES)) * 1000
+    print(f"balayage linéaire   {t_linear:>7.2f} ms/requête")
+    print(f"index BM25          {t_index:>7.2f} ms/requête  x{t_linear / t_index:.1f}")
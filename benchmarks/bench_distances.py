@@ -0,0 +1,67 @@
+# benchmarks/bench_distances.py
+"""
+Benchmark : distances haversine scalaires (boucle Python) vs matrice NumPy
+Usage : python benchmarks/bench_distances.py
+"""
+import os
+import sys
+import time
+import random
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import numpy as np
+from chatbot.geocoding_service import haversine_distance, haversine_matrix, distance_eta_matrix
+
+# Boîte englobant Brazzaville
+LAT_RANGE = (-4.35, -4.18)
+LON_RANGE = (15.18, 15.33)
+
+SIZES = [(10, 10), (1000, 1000), (10000, 100)]
+SCALAR_LIMIT = 200_000  # Au-delà, la boucle Python est extrapolée
+
+
+def random_points(n: int):
+    return [(random.uniform(*LAT_RANGE), random.uniform(*LON_RANGE)) for _ in range(n)]
+
+
+def best_of(fn, repeat: int = 3) -> float:
+    best = float("inf")
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        fn()
+        best = min(best, time.perf_counter() - t0)
+    return best
+
+
+def bench(n: int, m: int):
+    origins, destinations = random_points(n), random_points(m)
+    pairs = n * m
+
+    # Boucle scalaire (échantillonnée pour les grandes tailles)
+    rows = max(1, min(n, SCALAR_LIMIT // m))
+    sample = origins[:rows]
+    t_scalar = best_of(lambda: [[haversine_distance(a, b, c, d) for (c, d) in destinations] for (a, b) in sample], 1)
+    t_scalar *= n / rows
+
+    t_numpy = best_of(lambda: distance_eta_matrix(origins, destinations))
+
+    # Cohérence avec la version scalaire (arrondie à 10 m)
+    matrix = haversine_matrix(sample[:5], destinations[:5])
+    ref = np.array([[haversine_distance(a, b, c, d) for (c, d) in destinations[:5]] for (a, b) in sample[:5]])
+    max_err = float(np.abs(np.round(matrix, 2) - ref).max())
+
+    extrapolated = "*" if rows < n else " "
+    print(f"{n:>6}×{m:<6} {pairs:>12,} paires  "
+          f"boucle {t_scalar * 1000:>10.2f} ms{extrapolated}  "
+          f"numpy {t_numpy * 1000:>9.2f} ms  "
+          f"x{t_scalar / t_numpy:>7.1f}  (écart max {max_err:.3f} km)")
+
+
+if __name__ == "__main__":
+    random.seed(42)
+    print("Haversine : boucle Python vs matrice NumPy (meilleur de 3)")
+    print("-" * 100)
+    for n, m in SIZES:
+        bench(n, m)
+    print("* temps extrapolé à partir d'un échantillon de lignes")
@@ -0,0 +1,69 @@
+# benchmarks/bench_lexicon.py
+"""
+Benchmark : lexique compilé (un passage) vs scans linéaires site par site
+Usage : python benchmarks/bench_lexicon.py
+"""
+import os
+import sys
+import time
+import unicodedata
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from chatbot.lexicon import lexicon, VOCABULARY
+
+MESSAGES = [
+    "🔙 Retour", "Confirmer", "📱 Mobile Money", "je veux commander à manger ce soir",
+    "où est mon colis ? ça fait une heure", "10 rue de la paix poto poto", "Marie Okemba",
+    "retour au menu principal", "📋 Missions dispo", "auto-entrepreneur", "Deux roues",
+    "je préfère envoyer un colis à ma soeur à Bacongo", "06 123 45 67", "5000 francs",
+]
+ROUNDS = 2000
+
+
+def _strip_accents(text: str) -> str:
+    text = unicodedata.normalize("NFD", text)
+    return "".join(ch for ch in text if unicodedata.category(ch) != "Mn")
+
+
+# Ancienne approche : chaque site normalise puis parcourt sa propre liste
+_PHRASE_SETS = [
+    {_strip_accents(p.lower()) for p in phrases}
+    for values in VOCABULARY.values() for phrases in values.values()
+]
+_INTENT_LISTS = [list(phrases) for phrases in VOCABULARY["intent"].values()]
+
+
+def legacy(text: str):
+    lower = text.lower()
+    found = [any(word in lower for word in words) for words in _INTENT_LISTS]
+    stripped = _strip_accents(lower.strip())
+    found += [stripped in phrases for phrases in _PHRASE_SETS]
+    return found
+
+
+def compiled(text: str):
+    lex = lexicon.analyze(text)
+    return [lex.values(category) for category in VOCABULARY]
+
+
+def bench(fn) -> float:
+    t0 = time.perf_counter()
+    for _ in range(ROUNDS):
+        for message in MESSAGES:
+            fn(message)
+    return (time.perf_counter() - t0) / (ROUNDS * len(MESSAGES)) * 1e6
+
+
+if __name__ == "__main__":
+    stats = lexicon.get_stats()
+    print(f"{stats['patterns']} expressions, {stats['categories']} catégories, {len(MESSAGES)} messages")
+    print("-" * 72)
+    t_legacy = bench(legacy)
+    t_cold = bench(lexicon._analyze)  # Sans le cache des messages déjà vus
+    t_analyze = bench(lexicon.analyze)
+    t_all = bench(compiled)
+    print(f"scans linéaires (tous les sites)       {t_legacy:>7.1f} µs/message")
+    print(f"lexique : un passage, message nouveau  {t_cold:>7.1f} µs/message  x{t_legacy / t_cold:.1f}")
+    print(f"lexique : un passage, message déjà vu  {t_analyze:>7.1f} µs/message  x{t_legacy / t_analyze:.1f}")
+    print(f"lexique : + toutes les catégories      {t_all:>7.1f} µs/message  x{t_legacy / t_all:.1f}")
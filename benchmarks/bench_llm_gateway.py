@@ -0,0 +1,76 @@
+# benchmarks/bench_llm_gateway.py
+"""
+Benchmark : fournisseurs LLM essayés l'un après l'autre vs passerelle
+avec échéance et requête de couverture
+Latences simulées à queue lourde (aucun appel réseau)
+Usage : python benchmarks/bench_llm_gateway.py [nombre_d_appels]
+"""
+import os
+import sys
+import time
+import random
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from chatbot.llm_gateway import LLMGateway, Provider, LLMDeadlineExceeded
+
+CALLS = int(sys.argv[1]) if len(sys.argv) > 1 else 80
+DEADLINE_MS = 4000
+SLOW_RATE = 0.08  # Part des réponses dans la queue lente
+
+
+class FakeCompletions:
+    """Latence habituelle ~400 ms, parfois plusieurs secondes ; échoue passé le timeout"""
+
+    def __init__(self, seed: int):
+        self.rng = random.Random(seed)
+        self.chat = self
+        self.completions = self
+
+    def create(self, model, messages, timeout=30, **kwargs):
+        slow = self.rng.random() < SLOW_RATE
+        latency = self.rng.uniform(3.0, 8.0) if slow else self.rng.lognormvariate(-0.9, 0.3)
+        time.sleep(min(latency, timeout))
+        if latency > timeout:
+            raise TimeoutError("timeout")
+        return {"latency": latency}
+
+
+def sequential(providers, messages):
+    """Ancien comportement : premier fournisseur (timeout 30 s), puis le second en cas d'échec"""
+    for provider in providers:
+        try:
+            return provider.complete(messages, timeout_s=30)
+        except Exception:
+            continue
+
+
+def percentile(values, q):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * q / 100))]
+
+
+def run(label, fn):
+    timings, failed = [], 0
+    for _ in range(CALLS):
+        t0 = time.perf_counter()
+        try:
+            fn()
+        except LLMDeadlineExceeded:
+            failed += 1
+        timings.append((time.perf_counter() - t0) * 1000)
+    print(f"{label:<24} p50 {percentile(timings, 50):>6.0f} ms  p90 {percentile(timings, 90):>6.0f} ms  "
+          f"p99 {percentile(timings, 99):>6.0f} ms  max {max(timings):>6.0f} ms  repli règles {failed}")
+
+
+if __name__ == "__main__":
+    messages = [{"role": "user", "content": "bonjour"}]
+    print(f"{CALLS} appels, {SLOW_RATE:.0%} de réponses lentes par fournisseur, échéance {DEADLINE_MS} ms")
+    print("-" * 96)
+    providers = [Provider("openai", FakeCompletions(1), "m"), Provider("openrouter", FakeCompletions(2), "m")]
+    run("séquentiel", lambda: sequential(providers, messages))
+    gateway = LLMGateway([Provider("openai", FakeCompletions(1), "m"), Provider("openrouter", FakeCompletions(2), "m")])
+    run("passerelle + couverture", lambda: gateway.complete(messages, deadline_ms=DEADLINE_MS))
+    stats = gateway.get_stats()
+    print(f"couvertures {stats['hedges']}, gagnées {stats['hedge_won']}, "
+          f"seuil {stats['providers']['openai']['hedge_after_ms']} ms")
@@ -0,0 +1,59 @@
+# benchmarks/bench_spatial_index.py
+"""
+Benchmark : k missions les plus proches via l'index en grille vs tri complet
+Usage : python benchmarks/bench_spatial_index.py
+"""
+import os
+import sys
+import time
+import random
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from chatbot.geocoding_service import haversine_distance
+from chatbot.spatial_index import GridSpatialIndex
+
+LAT_RANGE = (-4.35, -4.18)
+LON_RANGE = (15.18, 15.33)
+SIZES = [100, 1000, 10000]
+QUERIES = 500
+K, RADIUS_KM = 5, 5.0
+
+
+def random_point():
+    return (random.uniform(*LAT_RANGE), random.uniform(*LON_RANGE))
+
+
+def bench(n: int):
+    index = GridSpatialIndex()
+    points = {i: random_point() for i in range(n)}
+    index.sync({i: (lat, lon, None) for i, (lat, lon) in points.items()})
+    queries = [random_point() for _ in range(QUERIES)]
+
+    t0 = time.perf_counter()
+    for lat, lon in queries:
+        index.nearest(lat, lon, k=K, radius_km=RADIUS_KM)
+    t_index = (time.perf_counter() - t0) / QUERIES
+
+    t0 = time.perf_counter()
+    for lat, lon in queries[:50]:
+        ranked = sorted((haversine_distance(lat, lon, a, b), i) for i, (a, b) in points.items())
+        [i for d, i in ranked[:K] if d <= RADIUS_KM]
+    t_scan = (time.perf_counter() - t0) / 50
+
+    # Cohérence : mêmes voisins que le tri complet
+    lat, lon = queries[0]
+    expected = [str(i) for d, i in sorted((haversine_distance(lat, lon, a, b), i) for i, (a, b) in points.items())[:K] if d <= RADIUS_KM]
+    got = [key for key, _, _ in index.nearest(lat, lon, k=K, radius_km=RADIUS_KM)]
+
+    print(f"{n:>6} missions  index {t_index * 1e6:>8.1f} µs/requête  "
+          f"tri complet {t_scan * 1e6:>10.1f} µs/requête  "
+          f"x{t_scan / t_index:>6.1f}  voisins identiques: {expected == got}")
+
+
+if __name__ == "__main__":
+    random.seed(7)
+    print(f"k={K} plus proches dans {RADIUS_KM} km")
+    print("-" * 90)
+    for n in SIZES:
+        bench(n)
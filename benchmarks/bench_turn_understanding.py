@@ -0,0 +1,106 @@
+# benchmarks/bench_turn_understanding.py
+"""
+Benchmark : appels IA chaînés (intention + validation + message d'erreur)
+vs compréhension du tour en un seul appel
+Le LLM est simulé avec une latence fixe par aller-retour (aucun appel réseau)
+Usage : python benchmarks/bench_turn_understanding.py [latence_ms]
+"""
+import os
+import sys
+import json
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ["TOKTOK_LLM_CACHE_ENABLED"] = "0"  # Mesurer les allers-retours, pas le cache
+
+from chatbot import smart_fallback as sf
+
+LATENCY_MS = float(sys.argv[1]) if len(sys.argv) > 1 else 600.0
+
+# (saisie, étape, flow, type attendu)
+TURNS = [
+    ("son numéro c'est le zéro six cent vingt trois", "DEST_TEL", "coursier", "phone"),
+    ("06 123 45 67", "DEST_TEL", "coursier", "phone"),
+    ("environ cinq mille francs je pense", "COURIER_VALUE", "coursier", "amount"),
+    ("5000", "COURIER_VALUE", "coursier", "amount"),
+    ("euh mettez en deux s'il vous plait", "MARKET_QUANTITY", "marketplace", "quantity"),
+    ("3", "MARKET_QUANTITY", "marketplace", "quantity"),
+    ("je sais pas trop, c'est mon frère qui a le numéro", "EXPEDITEUR_TEL", "coursier", "phone"),
+]
+
+
+class _Message:
+    def __init__(self, content):
+        self.content = content
+
+
+class _Choice:
+    def __init__(self, content):
+        self.message = _Message(content)
+
+
+class _Completion:
+    def __init__(self, content):
+        self.choices = [_Choice(content)]
+
+
+class FakeCompletions:
+    """Répond un JSON plausible après LATENCY_MS"""
+
+    def __init__(self):
+        self.calls = 0
+
+    def create(self, model, messages, **kwargs):
+        self.calls += 1
+        time.sleep(LATENCY_MS / 1000)
+        return _Completion(json.dumps({
+            "intent_change": None,
+            "is_valid": False,
+            "extracted_value": None,
+            "error_message": "Format invalide",
+            "validation": {"is_valid": False, "extracted_value": None, "error_message": "Format invalide"},
+        }))
+
+
+class FakeClient:
+    """Remplace la passerelle LLM"""
+
+    def __init__(self):
+        self.completions = FakeCompletions()
+
+    def complete(self, messages, **kwargs):
+        return self.completions.create(None, messages, **kwargs)
+
+
+def chained(text, step, flow, expected_type):
+    """Ancienne séquence des flows"""
+    sf.detect_intent_change(text, flow)
+    is_valid, _, _ = sf.smart_validate(text, expected_type, step)
+    if not is_valid:
+        sf.generate_smart_error_message(text, expected_type, step)
+
+
+def combined(text, step, flow, expected_type):
+    sf.understand_turn(text, step, flow, expected_type=expected_type)
+
+
+def run(label, fn):
+    sf.llm_client = client = FakeClient()
+    worst = 0
+    t0 = time.perf_counter()
+    for turn in TURNS:
+        before = client.completions.calls
+        fn(*turn)
+        worst = max(worst, client.completions.calls - before)
+    elapsed = (time.perf_counter() - t0) * 1000
+    print(f"{label:<16} {client.completions.calls:>3} appels IA  {elapsed:>7.0f} ms  "
+          f"{elapsed / len(TURNS):>5.0f} ms/tour  max {worst} appel(s)/tour")
+    return elapsed
+
+
+if __name__ == "__main__":
+    print(f"{len(TURNS)} tours, latence simulée {LATENCY_MS:.0f} ms par appel")
+    print("-" * 80)
+    t_chained = run("chaîné", chained)
+    t_combined = run("un seul appel", combined)
+    print(f"gain: x{t_chained / t_combined:.1f}")
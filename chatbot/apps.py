@@ -1,6 +1,25 @@
+import os
+import sys
+
 from django.apps import AppConfig
 
 
 class ChatbotConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'chatbot'
+
+    def ready(self):
+        # Backend et catalogue marketplace tenus chauds en arrière-plan, côté serveur uniquement
+        # (pas pour migrate/shell/test ni pour le process de surveillance de l'autoreload)
+        if "pytest" in sys.modules:
+            return
+        if sys.argv and sys.argv[0].endswith("manage.py"):
+            command = sys.argv[1] if len(sys.argv) > 1 else ""
+            if command != "runserver":
+                return
+            if os.environ.get("RUN_MAIN") != "true" and "--noreload" not in sys.argv:
+                return
+        from .backend_warmth import start_keepwarm
+        from .catalog_refresher import start_catalog_refresher
+        start_keepwarm()
+        start_catalog_refresher()
@@ -2,6 +2,8 @@
 from __future__ import annotations
 import os, logging, requests, unicodedata
 from typing import Dict, Any, Optional, List
+from .lexicon import lexicon
+from .backend_warmth import backend_warmth
 
 logger = logging.getLogger("toktok.auth")
 
@@ -85,59 +87,27 @@ def _strip_accents(text: str) -> str:
     return unicodedata.normalize("NFC", text)
 
 # ---------- Normalisations des choix (évite les 400) ----------
-_ALLOWED_TYPE_LIVREUR = {"independant", "societe", "autoentrepreneur"}
+# Valeurs acceptées par l'API = valeurs canoniques du lexique
 def _norm_type_livreur(raw: str) -> Optional[str]:
-    t = _strip_accents((raw or "").strip().lower())
-    alias = {
-        "independant": "independant",
-        "indépendant": "independant",
-        "indep": "independant",
-        "solo": "independant",
-        "societe": "societe",
-        "société": "societe",
-        "company": "societe",
-        "autoentrepreneur": "autoentrepreneur",
-        "auto-entrepreneur": "autoentrepreneur",
-        "auto entrepreneur": "autoentrepreneur",
-    }
-    t = alias.get(t, t)
-    return t if t in _ALLOWED_TYPE_LIVREUR else None
+    return lexicon.exact(raw, "type_livreur")
 
-_ALLOWED_TYPE_VEHICULE = {"moto", "voiture", "velo", "camionnette"}
 def _norm_type_vehicule(raw: str) -> Optional[str]:
-    t = _strip_accents((raw or "").strip().lower())
-    alias = {
-        "moto": "moto",
-        "scooter": "moto",
-        "2 roues": "moto",
-        "deux roues": "moto",
-        "voiture": "voiture",
-        "auto": "voiture",
-        "car": "voiture",
-        "velo": "velo",
-        "vélo": "velo",
-        "bicycle": "velo",
-        "camionnette": "camionnette",
-        "pickup": "camionnette",
-        "fourgon": "camionnette",
-    }
-    t = alias.get(t, t)
-    return t if t in _ALLOWED_TYPE_VEHICULE else None
+    return lexicon.exact(raw, "type_vehicule")
 
 # ---------- Détection de rôle & profils ----------
 def detect_role_via_profiles(session: Dict[str, Any]) -> Optional[str]:
     try:
-        r = requests.get(f"{API_BASE}/api/v1/auth/clients/my_profile/", headers=_auth_headers(session), timeout=TIMEOUT)
+        r = backend_warmth.request("GET", f"{API_BASE}/api/v1/auth/clients/my_profile/", headers=_auth_headers(session), timeout=TIMEOUT)
         if r.status_code == 200: return "client"
     except Exception:
         pass
     try:
-        r = requests.get(f"{API_BASE}/api/v1/auth/livreurs/my_profile/", headers=_auth_headers(session), timeout=TIMEOUT)
+        r = backend_warmth.request("GET", f"{API_BASE}/api/v1/auth/livreurs/my_profile/", headers=_auth_headers(session), timeout=TIMEOUT)
         if r.status_code == 200: return "livreur"
     except Exception:
         pass
     try:
-        r = requests.get(f"{API_BASE}/api/v1/auth/entreprises/my_profile/", headers=_auth_headers(session), timeout=TIMEOUT)
+        r = backend_warmth.request("GET", f"{API_BASE}/api/v1/auth/entreprises/my_profile/", headers=_auth_headers(session), timeout=TIMEOUT)
         if r.status_code == 200: return "entreprise"
     except Exception:
         pass
@@ -152,7 +122,7 @@ def fetch_role_profile(session: Dict[str, Any], role: str) -> Dict[str, Any]:
     path = url_map.get(role)
     if not path:
         return {}
-    r = requests.get(f"{API_BASE}{path}", headers=_auth_headers(session), timeout=TIMEOUT)
+    r = backend_warmth.request("GET", f"{API_BASE}{path}", headers=_auth_headers(session), timeout=TIMEOUT)
     return r.json() if r.status_code == 200 else {}
 
 def route_to_role_menu(session: Dict[str, Any], role: str, intro_text: str) -> Dict[str, Any]:
@@ -189,11 +159,17 @@ def route_to_role_menu(session: Dict[str, Any], role: str, intro_text: str) -> D
 
 # ---------- Login commun ----------
 def login_common(session: Dict[str, Any], username: str, password: str) -> Dict[str, Any]:
-    r = requests.post(
-        f"{API_BASE}/api/v1/auth/login/",
-        json={"username": username, "password": password},
-        timeout=TIMEOUT
-    )
+    try:
+        # Délai allongé automatiquement si le backend est en train de se réveiller
+        r = backend_warmth.request(
+            "POST",
+            f"{API_BASE}/api/v1/auth/login/",
+            json={"username": username, "password": password},
+            timeout=TIMEOUT
+        )
+    except requests.RequestException as e:
+        logger.warning("login_unreachable", extra={"event": "login_unreachable", "phone": username, "err": type(e).__name__})
+        return build_response("⏳ Notre service met un peu de temps à répondre.\nRenvoyez votre mot de passe dans un instant 🙏", ["🔙 Retour"])
     if r.status_code != 200:
         logger.info("login_failed", extra={"event": "login_failed", "phone": username, "status_code": r.status_code})
         return build_response("⛔ Mot de passe incorrect ou compte introuvable.\nRéessayez ou tapez *Aide* si besoin.", ["Connexion", "Aide", "🔙 Retour"])
@@ -271,7 +247,7 @@ def handle_signup_step(phone: str, text: str) -> Dict[str, Any]:
     tl = _strip_accents(t.lower())
 
     # Gestion bouton retour contextuel - étape par étape
-    if tl in {"retour", "back", "🔙 retour"}:
+    if lexicon.exact(t, "nav") == "retour":
         current_step = session.get("step", "")
         role = session.get("signup", {}).get("role")
         
@@ -535,7 +511,7 @@ def handle_signup_step(phone: str, text: str) -> Dict[str, Any]:
 
     if session["step"] == "SIGNUP_MARCHAND_GPS":
         # Si l'utilisateur a tapé "Passer", on continue sans GPS
-        if tl in {"passer", "skip", "suivant", "continuer"}:
+        if lexicon.exact(t, "answer") == "passer":
             session["signup"]["data"]["coordonnees_gps"] = ""
             session["step"] = "SIGNUP_MARCHAND_RCCM"
             return build_response("🧾 *Numéro RCCM* ?\nExemple : `CG-BZV-01-2024-B12-00123`", ["🔙 Retour"])
@@ -597,7 +573,7 @@ def signup_submit(session: Dict[str, Any], phone: str) -> Dict[str, Any]:
                 "coordonnees_gps": "",
                 "preferences_livraison": "Standard",
             }
-            rr = requests.post(f"{API_BASE}/api/v1/auth/clients/", json=payload, timeout=TIMEOUT)
+            rr = backend_warmth.request("POST", f"{API_BASE}/api/v1/auth/clients/", json=payload, timeout=TIMEOUT)
 
         elif role == "livreur":
             # Créer un username convivial pour le livreur au lieu du numéro de téléphone
@@ -634,7 +610,7 @@ def signup_submit(session: Dict[str, Any], phone: str) -> Dict[str, Any]:
                 "numero_permis": data.get("numero_permis", ""),
                 "zone_activite": data.get("zone_activite", ""),
             }
-            rr = requests.post(f"{API_BASE}/api/v1/auth/livreurs/", json=payload, timeout=TIMEOUT)
+            rr = backend_warmth.request("POST", f"{API_BASE}/api/v1/auth/livreurs/", json=payload, timeout=TIMEOUT)
 
         elif role == "entreprise":
             payload = {
@@ -656,7 +632,7 @@ def signup_submit(session: Dict[str, Any], phone: str) -> Dict[str, Any]:
                 "numero_rccm": data.get("numero_rccm", ""),
                 "horaires_ouverture": data.get("horaires_ouverture", ""),
             }
-            rr = requests.post(f"{API_BASE}/api/v1/auth/entreprises/", json=payload, timeout=TIMEOUT)
+            rr = backend_warmth.request("POST", f"{API_BASE}/api/v1/auth/entreprises/", json=payload, timeout=TIMEOUT)
 
         else:
             return build_response("❌ Rôle inconnu. Reprenez *Inscription*.", SIGNUP_ROLE_BTNS)
@@ -713,12 +689,13 @@ def ensure_auth_or_ask_password(phone: str, text: str):
         return build_response(WELCOME_TEXT, WELCOME_BTNS)
 
     if session["step"] == "WELCOME_CHOICE":
-        if t in {"connexion", "login"}:
+        choice = lexicon.exact(t, "welcome")
+        if choice == "connexion":
             session["step"] = "LOGIN_WAIT_PASSWORD"
             return build_response("🔑 Entrez votre *mot de passe*.")
-        if t in {"inscription", "s'inscrire", "sinscrire", "signup"}:
+        if choice == "inscription":
             return signup_start(session)
-        if t in {"aide", "help"}:
+        if choice == "aide":
             return build_response("ℹ️ Envoyez *Connexion* pour vous connecter, ou *Inscription* pour créer un compte.")
         return build_response("👉 Choisissez *Connexion* ou *Inscription*.", WELCOME_BTNS)
 
@@ -0,0 +1,229 @@
+# chatbot/backend_warmth.py
+"""
+Détection des démarrages à froid du backend (Render) et maintien au chaud
+Un pinger de fond sollicite un endpoint léger quand le backend n'a reçu
+aucun appel récemment (intervalle adaptatif, resserré pendant un réveil).
+Signature d'un réveil : latence très longue, timeout, 502/503/504. Pendant
+un réveil, les appels interactifs passent sur un délai long et l'utilisateur
+reçoit un message « un instant » ; chaque incident est journalisé
+"""
+import os
+import time
+import logging
+import threading
+from collections import deque
+from typing import Dict, Any, Optional, List
+
+import requests
+
+logger = logging.getLogger(__name__)
+
+# Configuration
+API_BASE = os.getenv("TOKTOK_BASE_URL", "https://toktok-bsfz.onrender.com")
+KEEPWARM_ENABLED = os.getenv("TOKTOK_BACKEND_KEEPWARM", "1") == "1"
+PING_PATH = os.getenv("TOKTOK_BACKEND_PING_PATH", "/api/v1/")  # Toute réponse HTTP prouve que le service est réveillé
+PING_TIMEOUT = float(os.getenv("TOKTOK_BACKEND_PING_TIMEOUT", "90"))
+# Render endort le service après ~15 min sans requête : intervalle de base bien en dessous
+PING_INTERVAL = float(os.getenv("TOKTOK_BACKEND_PING_INTERVAL", "300"))
+PING_INTERVAL_COLD = float(os.getenv("TOKTOK_BACKEND_PING_INTERVAL_COLD", "10"))
+COLD_LATENCY_MS = float(os.getenv("TOKTOK_BACKEND_COLD_LATENCY_MS", "8000"))  # Au-delà : réveil en cours
+WARM_LATENCY_MS = float(os.getenv("TOKTOK_BACKEND_WARM_LATENCY_MS", "3000"))  # En deçà : réveil terminé
+COLD_TIMEOUT = float(os.getenv("TOKTOK_BACKEND_COLD_TIMEOUT", "60"))  # Délai des appels interactifs pendant un réveil
+IDLE_SLEEP_S = float(os.getenv("TOKTOK_BACKEND_IDLE_SLEEP", "900"))  # Inactivité après laquelle Render endort le service
+COLD_STATUSES = {502, 503, 504}
+MAX_INCIDENTS = 50
+
+COLD_NOTICE = "⏳ Un instant, notre service se réveille… Votre demande est en cours de traitement."
+
+
+class BackendWarmth:
+    """État chaud / froid du backend, alimenté par le pinger et par les appels réels"""
+
+    def __init__(self, base_url: str = API_BASE):
+        self.base_url = base_url
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._wake = threading.Event()
+        self._worker: Optional[threading.Thread] = None
+        self._latencies = deque(maxlen=500)
+        self._last_call = 0.0          # Dernier appel backend observé (monotonic)
+        self._incident: Optional[Dict[str, Any]] = None
+        self.incidents = deque(maxlen=MAX_INCIDENTS)
+        self.stats = {"pings": 0, "pings_skipped": 0, "observed": 0, "cold_signals": 0,
+                      "notices_sent": 0, "incidents": 0}
+
+    # ---------- État ----------
+    def is_cold(self) -> bool:
+        return self._incident is not None
+
+    def _open_incident(self, trigger: str, source: str, latency_ms: Optional[float]):
+        """Sous verrou"""
+        self.stats["incidents"] += 1
+        self._incident = {"started_at": time.time(), "trigger": trigger, "source": source,
+                          "max_latency_ms": latency_ms or 0, "signals": 1, "notified": set()}
+        logger.warning(f"[BACKEND_WARMTH] Démarrage à froid détecté ({trigger}, {source})")
+
+    def warming(self) -> bool:
+        """
+        Backend en cours de réveil, ou présumé endormi (aucun appel depuis IDLE_SLEEP_S) :
+        dans ce cas l'incident est ouvert d'avance, avant le premier appel lent
+        """
+        with self._lock:
+            if (self._incident is None and self._last_call
+                    and time.monotonic() - self._last_call > IDLE_SLEEP_S):
+                self._open_incident("inactivité", "présumé", None)
+                self._wake.set()
+            return self._incident is not None
+
+    def timeout(self, base: float) -> float:
+        """Délai à appliquer à un appel interactif (allongé pendant un réveil)"""
+        return max(base, COLD_TIMEOUT) if self.warming() else base
+
+    def observe(self, latency_ms: Optional[float], status: Optional[int] = None,
+                error: Optional[str] = None, source: str = "api"):
+        """
+        Enregistre l'issue d'un appel backend
+
+        Args:
+            latency_ms: Durée de l'appel (None si non mesurée)
+            status: Code HTTP, None si exception
+            error: Nom de l'exception (Timeout, ConnectionError...)
+            source: "api" (appel d'un flow) ou "ping"
+        """
+        cold = bool(error) or status in COLD_STATUSES or (latency_ms or 0) >= COLD_LATENCY_MS
+        warm = not cold and status is not None and (latency_ms or 0) < WARM_LATENCY_MS
+        ended = None
+        with self._lock:
+            self._last_call = time.monotonic()
+            self.stats["observed"] += 1
+            if latency_ms is not None and not error:
+                self._latencies.append(latency_ms)
+            if cold:
+                self.stats["cold_signals"] += 1
+                if self._incident is None:
+                    trigger = error or (f"HTTP {status}" if status in COLD_STATUSES else f"{latency_ms:.0f} ms")
+                    self._open_incident(trigger, source, latency_ms)
+                else:
+                    self._incident["signals"] += 1
+                    self._incident["max_latency_ms"] = max(self._incident["max_latency_ms"], latency_ms or 0)
+            elif warm and self._incident is not None:
+                ended, self._incident = self._incident, None
+                self.incidents.append({
+                    "started_at": ended["started_at"],
+                    "duration_s": round(time.time() - ended["started_at"], 1),
+                    "trigger": ended["trigger"],
+                    "source": ended["source"],
+                    "max_latency_ms": round(ended["max_latency_ms"]),
+                    "signals": ended["signals"],
+                    "users_notified": len(ended["notified"]),
+                })
+        if cold:
+            self._wake.set()  # Le pinger passe au rythme rapide
+        if ended:
+            logger.info(f"[BACKEND_WARMTH] Backend réveillé après {self.incidents[-1]['duration_s']} s")
+
+    def should_notify(self, phone: str) -> bool:
+        """Vrai une seule fois par utilisateur et par incident : lui envoyer COLD_NOTICE"""
+        if not self.warming():
+            return False
+        with self._lock:
+            if self._incident is None or phone in self._incident["notified"]:
+                return False
+            self._incident["notified"].add(phone)
+            self.stats["notices_sent"] += 1
+            return True
+
+    # ---------- Appels ----------
+    def request(self, method: str, url: str, timeout: float = 15, **kwargs) -> requests.Response:
+        """
+        requests.request mesuré, avec délai allongé pendant un réveil
+
+        Raises:
+            requests.RequestException: comme requests.request (l'échec est enregistré)
+        """
+        t0 = time.perf_counter()
+        try:
+            r = requests.request(method, url, timeout=self.timeout(timeout), **kwargs)
+        except requests.RequestException as e:
+            self.observe((time.perf_counter() - t0) * 1000, error=type(e).__name__)
+            raise
+        self.observe((time.perf_counter() - t0) * 1000, status=r.status_code)
+        return r
+
+    def ping(self) -> Optional[float]:
+        """Sollicite l'endpoint léger ; latence en ms, None en cas d'échec"""
+        with self._lock:
+            self.stats["pings"] += 1
+        t0 = time.perf_counter()
+        try:
+            r = requests.get(f"{self.base_url}{PING_PATH}", timeout=PING_TIMEOUT)
+        except requests.RequestException as e:
+            self.observe((time.perf_counter() - t0) * 1000, error=type(e).__name__, source="ping")
+            return None
+        latency = (time.perf_counter() - t0) * 1000
+        self.observe(latency, status=r.status_code, source="ping")
+        return latency
+
+    # ---------- Pinger ----------
+    def next_interval(self) -> float:
+        """Rapide pendant un réveil, sinon l'intervalle de base"""
+        return PING_INTERVAL_COLD if self.is_cold() else PING_INTERVAL
+
+    def _run(self):
+        while not self._stop.is_set():
+            idle = time.monotonic() - self._last_call
+            if self.is_cold() or idle >= PING_INTERVAL:
+                self.ping()
+                delay = self.next_interval()
+            else:
+                # Trafic réel récent : il suffit à garder le service éveillé
+                with self._lock:
+                    self.stats["pings_skipped"] += 1
+                delay = PING_INTERVAL - idle
+            self._wake.clear()
+            self._wake.wait(delay)
+
+    def start(self) -> bool:
+        """Démarre le pinger (premier ping immédiat : réveil dès le déploiement)"""
+        with self._lock:
+            if self._worker is not None and self._worker.is_alive():
+                return False
+            self._stop.clear()
+            self._worker = threading.Thread(target=self._run, name="backend-keepwarm", daemon=True)
+            self._worker.start()
+        logger.info(f"[BACKEND_WARMTH] Pinger démarré ({self.base_url}{PING_PATH}, toutes les {PING_INTERVAL:.0f} s)")
+        return True
+
+    def stop(self):
+        self._stop.set()
+        self._wake.set()
+
+    def get_stats(self) -> Dict[str, Any]:
+        with self._lock:
+            latencies = sorted(self._latencies)
+            current = dict(self._incident) if self._incident else None
+            snapshot = dict(self.stats)
+            incidents: List[Dict[str, Any]] = list(self.incidents)
+        if current:
+            current["notified"] = len(current["notified"])
+            current["elapsed_s"] = round(time.time() - current["started_at"], 1)
+        snapshot.update(
+            cold=current is not None,
+            current_incident=current,
+            recent_incidents=incidents[-10:],
+            p50_ms=round(latencies[len(latencies) // 2]) if latencies else None,
+            p95_ms=round(latencies[min(len(latencies) - 1, int(len(latencies) * 0.95))]) if latencies else None,
+        )
+        return snapshot
+
+
+# Instance globale
+backend_warmth = BackendWarmth()
+
+
+def start_keepwarm() -> bool:
+    """Point d'entrée de ChatbotConfig.ready (désactivable : TOKTOK_BACKEND_KEEPWARM=0)"""
+    if not KEEPWARM_ENABLED:
+        logger.info("[BACKEND_WARMTH] Désactivé (TOKTOK_BACKEND_KEEPWARM=0)")
+        return False
+    return backend_warmth.start()
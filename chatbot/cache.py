@@ -6,7 +6,9 @@ En production, remplacer par Redis
 
 import logging
 import time
-from typing import Dict, Any, Optional, Callable
+import threading
+from collections import OrderedDict
+from typing import Dict, Any, Optional, Callable, Hashable
 from functools import wraps
 
 logger = logging.getLogger(__name__)
@@ -91,6 +93,64 @@ class SimpleCache:
 cache = SimpleCache(default_ttl=300)  # 5 minutes par défaut
 
 
+class LRUCache:
+    """Cache mémoire borné (éviction du moins récemment utilisé), sans TTL"""
+    
+    def __init__(self, max_size: int = 1024, name: str = "lru"):
+        """
+        Args:
+            max_size: Nombre maximum d'entrées
+            name: Nom utilisé dans les logs et statistiques
+        """
+        self.max_size = max_size
+        self.name = name
+        self._data: "OrderedDict[Hashable, Any]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+    
+    def get(self, key: Hashable, default: Any = None) -> Any:
+        """Récupère une valeur (et la marque comme récente)"""
+        with self._lock:
+            if key in self._data:
+                self._data.move_to_end(key)
+                self.hits += 1
+                return self._data[key]
+            self.misses += 1
+            return default
+    
+    def set(self, key: Hashable, value: Any):
+        """Stocke une valeur, évince la plus ancienne si plein"""
+        with self._lock:
+            self._data[key] = value
+            self._data.move_to_end(key)
+            while len(self._data) > self.max_size:
+                self._data.popitem(last=False)
+                self.evictions += 1
+    
+    def clear(self):
+        """Vide le cache (les compteurs sont conservés)"""
+        with self._lock:
+            self._data.clear()
+    
+    def __len__(self) -> int:
+        return len(self._data)
+    
+    def get_stats(self) -> Dict[str, Any]:
+        """Statistiques du cache"""
+        total = self.hits + self.misses
+        return {
+            "name": self.name,
+            "size": len(self._data),
+            "max_size": self.max_size,
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "hit_rate": round(self.hits / total, 4) if total else 0,
+        }
+
+
 # === Décorateurs pour caching automatique ===
 
 def cached(ttl: int = 300, key_prefix: str = ""):
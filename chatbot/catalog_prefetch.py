@@ -0,0 +1,194 @@
+# chatbot/catalog_prefetch.py
+"""
+Préchargement spéculatif du niveau suivant du marketplace
+Dès qu'une liste est affichée, le niveau que l'utilisateur ouvrira
+probablement est chargé en tâche de fond dans le cache du catalogue :
+liste des catégories → marchands puis produits des catégories populaires ;
+liste des marchands → produits des marchands affichés (les plus choisis d'abord).
+Au choix, le flow lit le cache (ou attend le préchargement en cours au lieu
+de relancer la même requête)
+"""
+import os
+import time
+import logging
+import threading
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor, Future
+from typing import Dict, Any, Optional, List, Tuple, Callable
+
+from .cache import get_cached_merchants, get_cached_products, CACHE_TTL_MERCHANTS, CACHE_TTL_PRODUCTS
+
+logger = logging.getLogger(__name__)
+
+# Configuration
+PREFETCH_ENABLED = os.getenv("TOKTOK_CATALOG_PREFETCH", "1") == "1"
+PREFETCH_WORKERS = int(os.getenv("TOKTOK_CATALOG_PREFETCH_WORKERS", "2"))
+PREFETCH_CATEGORIES = int(os.getenv("TOKTOK_PREFETCH_CATEGORIES", "2"))  # Catégories populaires préparées
+PREFETCH_MERCHANTS = int(os.getenv("TOKTOK_PREFETCH_MERCHANTS", "3"))    # Marchands par liste affichée
+CLAIM_WAIT = float(os.getenv("TOKTOK_PREFETCH_CLAIM_WAIT", "15"))        # Attente max d'un préchargement en cours
+
+TTLS = {"merchants": CACHE_TTL_MERCHANTS, "products": CACHE_TTL_PRODUCTS}
+
+
+def _loaders():
+    # Import tardif : le flow marketplace importe ce module
+    from . import conversation_flow_marketplace as market
+    return market
+
+
+def _auth_only(session: Dict[str, Any]) -> Dict[str, Any]:
+    """Copie minimale de la session pour les threads (jeton seulement)"""
+    return {"auth": dict(session.get("auth") or {})}
+
+
+class CatalogPrefetcher:
+    """Préchargements en cours ou récents, popularité des choix, taux de réussite"""
+
+    def __init__(self, workers: int = PREFETCH_WORKERS):
+        self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="catalog-prefetch")
+        self._lock = threading.Lock()
+        self._entries: Dict[Tuple[str, str], Dict[str, Any]] = {}  # (niveau, id) → {"future", "at", "claimed"}
+        self.popularity = {"category": Counter(), "merchant": Counter()}
+        self.stats = {"submitted": 0, "skipped_cached": 0, "hits": 0, "late_hits": 0, "misses": 0,
+                      "wasted": 0, "errors": 0}
+
+    # ---------- Popularité ----------
+    def record_choice(self, kind: str, item_id: Any):
+        """Choix réel de l'utilisateur ("category" ou "merchant")"""
+        if item_id is None:
+            return
+        with self._lock:
+            self.popularity[kind][str(item_id)] += 1
+
+    def _rank(self, kind: str, items: List[Dict[str, Any]], limit: int) -> List[Dict[str, Any]]:
+        """Les plus choisis d'abord, puis l'ordre d'affichage"""
+        with self._lock:
+            counts = self.popularity[kind]
+            ranked = sorted(items, key=lambda it: -counts[str(it.get("id"))])
+        return ranked[:limit]
+
+    # ---------- Soumission ----------
+    def _sweep(self):
+        """Sous verrou : oublie les préchargements expirés, ceux jamais lus sont du gaspillage"""
+        now = time.monotonic()
+        for key in [k for k, e in self._entries.items() if now - e["at"] > TTLS[k[0]]]:
+            if not self._entries.pop(key)["claimed"]:
+                self.stats["wasted"] += 1
+
+    def _submit(self, level: str, item_id: str, fn: Callable[[], Any]) -> Optional[Future]:
+        with self._lock:
+            self._sweep()
+            if (level, item_id) in self._entries:
+                return None
+            future = self._executor.submit(self._run, level, item_id, fn)
+            self._entries[(level, item_id)] = {"future": future, "at": time.monotonic(), "claimed": False}
+            self.stats["submitted"] += 1
+        logger.debug(f"[CATALOG_PREFETCH] {level} {item_id} soumis")
+        return future
+
+    def _run(self, level: str, item_id: str, fn: Callable[[], Any]):
+        try:
+            return fn()
+        except Exception as e:
+            with self._lock:
+                self.stats["errors"] += 1
+            logger.warning(f"[CATALOG_PREFETCH] {level} {item_id} : {e}")
+            return None
+
+    def after_categories(self, session: Dict[str, Any], categories: List[Dict[str, Any]]):
+        """
+        Liste des catégories affichée : entreprises (pour les marchands) puis
+        produits des marchands des catégories les plus populaires
+
+        Args:
+            session: Session de l'utilisateur (seul le jeton est transmis au thread)
+            categories: Catégories affichées, dans l'ordre
+        """
+        if not PREFETCH_ENABLED or not categories:
+            return
+        auth = _auth_only(session)
+        ranked = self._rank("category", categories, PREFETCH_CATEGORIES)
+        if get_cached_merchants("all") is None:
+            self._submit("merchants", "all", lambda: self._categories_then_products(auth, ranked))
+        else:
+            with self._lock:
+                self.stats["skipped_cached"] += 1
+            self._products_for_categories(auth, ranked)
+
+    def _categories_then_products(self, auth: Dict[str, Any], categories: List[Dict[str, Any]]):
+        ents = _loaders()._load_entreprises(auth)
+        self._products_for_categories(auth, categories)
+        return ents
+
+    def _products_for_categories(self, auth: Dict[str, Any], categories: List[Dict[str, Any]]):
+        market = _loaders()
+        for category in categories:
+            self.after_merchants(auth, market._load_merchants_by_category(auth, category), limit=1)
+
+    def after_merchants(self, session: Dict[str, Any], merchants: List[Dict[str, Any]],
+                        limit: int = PREFETCH_MERCHANTS):
+        """
+        Liste des marchands affichée : produits des plus probables
+
+        Args:
+            session: Session de l'utilisateur (seul le jeton est transmis au thread)
+            merchants: Marchands affichés, dans l'ordre
+            limit: Nombre de marchands préchargés
+        """
+        if not PREFETCH_ENABLED or not merchants:
+            return
+        auth = _auth_only(session)
+        market = _loaders()
+        for merchant in self._rank("merchant", [m for m in merchants if m.get("id") is not None], limit):
+            mid = str(merchant["id"])
+            if get_cached_products(mid):
+                with self._lock:
+                    self.stats["skipped_cached"] += 1
+                continue
+            self._submit("products", mid, lambda mid=mid: market._load_products_by_category(auth, mid))
+
+    # ---------- Lecture ----------
+    def claim(self, level: str, item_id: Any):
+        """
+        Le flow a besoin de ce niveau : compte le succès du préchargement et attend
+        s'il est encore en cours (le chargement qui suit lira alors le cache)
+
+        Args:
+            level: "merchants" ou "products"
+            item_id: "all" pour les entreprises, id du marchand pour ses produits
+        """
+        key = (level, str(item_id))
+        cached = get_cached_merchants("all") is not None if level == "merchants" else bool(get_cached_products(key[1]))
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                if not cached:  # Déjà en cache sans préchargement : ni succès ni échec
+                    self.stats["misses"] += 1
+                return
+            entry["claimed"] = True
+            future = entry["future"]
+            self.stats["hits" if future.done() else "late_hits"] += 1
+        if not future.done():
+            try:
+                future.result(timeout=CLAIM_WAIT)
+            except Exception as e:
+                logger.debug(f"[CATALOG_PREFETCH] {level} {item_id} non terminé : {e}")
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Taux de succès (besoins déjà préchargés) et préchargements gaspillés (jamais lus)"""
+        with self._lock:
+            self._sweep()
+            snapshot = dict(self.stats)
+            snapshot["pending"] = sum(1 for e in self._entries.values() if not e["future"].done())
+            snapshot["top_categories"] = self.popularity["category"].most_common(5)
+            snapshot["top_merchants"] = self.popularity["merchant"].most_common(5)
+        served = snapshot["hits"] + snapshot["late_hits"]
+        needed = served + snapshot["misses"]
+        settled = served + snapshot["wasted"]
+        snapshot["hit_rate"] = round(served / needed, 4) if needed else 0
+        snapshot["waste_rate"] = round(snapshot["wasted"] / settled, 4) if settled else 0
+        return snapshot
+
+
+# Instance globale
+catalog_prefetcher = CatalogPrefetcher()
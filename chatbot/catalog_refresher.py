@@ -0,0 +1,188 @@
+# chatbot/catalog_refresher.py
+"""
+Préchargement et rafraîchissement de fond du catalogue marketplace
+Catégories, entreprises et produits disponibles chargés au démarrage puis
+relus périodiquement (avec gigue) avant l'expiration de leur TTL : aucun
+utilisateur ne paie le réveil du backend ni un chargement complet à froid.
+En cas d'échec, la dernière version connue est remise en cache
+"""
+import os
+import time
+import random
+import logging
+import threading
+from typing import Dict, Any, Optional, Callable, List
+
+from .cache import (
+    cache_categories, cache_merchants, cache_products,
+    CACHE_TTL_CATEGORIES, CACHE_TTL_MERCHANTS, CACHE_TTL_PRODUCTS,
+)
+
+logger = logging.getLogger(__name__)
+
+# Configuration
+CATALOG_REFRESHER_ENABLED = os.getenv("TOKTOK_CATALOG_REFRESHER", "1") == "1"
+# Intervalle < plus petit TTL (produits, 180 s) : le cache ne refroidit jamais
+CATALOG_REFRESH_INTERVAL = float(os.getenv("TOKTOK_CATALOG_REFRESH_INTERVAL", "120"))
+CATALOG_REFRESH_JITTER = float(os.getenv("TOKTOK_CATALOG_REFRESH_JITTER", "0.2"))  # ± 20 %
+CATALOG_WARM_WAIT = float(os.getenv("TOKTOK_CATALOG_WARM_WAIT", "20"))  # Attente max d'un utilisateur pendant le préchargement
+CATALOG_SERVICE_TOKEN = os.getenv("TOKTOK_CATALOG_TOKEN")  # Jeton backend optionnel du rafraîchisseur
+
+DATASETS = ("categories", "entreprises", "produits")
+
+
+def _loaders() -> Dict[str, Callable[[Dict[str, Any]], List[Dict[str, Any]]]]:
+    # Import tardif : le flow marketplace importe ce module
+    from .conversation_flow_marketplace import _load_categories, _load_entreprises, _load_available_products
+    return {
+        "categories": lambda s: _load_categories(s, refresh=True),
+        "entreprises": lambda s: _load_entreprises(s, refresh=True),
+        "produits": lambda s: _load_available_products(s, refresh=True),
+    }
+
+
+def _recache(name: str, items: List[Dict[str, Any]]):
+    """Remet en cache la dernière version connue (backend indisponible)"""
+    if name == "categories":
+        cache_categories(items)
+    elif name == "entreprises":
+        cache_merchants("all", items)
+    else:
+        cache_products("disponibles", items)
+
+
+class CatalogRefresher:
+    """Thread de fond qui garde le catalogue chaud dans chatbot/cache.py et l'index de recherche"""
+
+    def __init__(self, interval: float = CATALOG_REFRESH_INTERVAL, jitter: float = CATALOG_REFRESH_JITTER):
+        self.interval = interval
+        self.jitter = jitter
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._warm = threading.Event()
+        self._first_cycle = threading.Event()
+        self._worker: Optional[threading.Thread] = None
+        self._last_good: Dict[str, List[Dict[str, Any]]] = {}
+        self.datasets: Dict[str, Dict[str, Any]] = {
+            name: {"last_success": None, "last_duration_ms": None, "items": 0, "errors": 0,
+                   "consecutive_errors": 0}
+            for name in DATASETS
+        }
+        self.stats = {"cycles": 0, "cycle_ms": 0.0, "max_cycle_ms": 0.0, "warm_waits": 0, "stale_served": 0}
+
+    @property
+    def running(self) -> bool:
+        return self._worker is not None and self._worker.is_alive()
+
+    def start(self) -> bool:
+        """Démarre le thread (préchargement immédiat) ; False s'il tourne déjà"""
+        with self._lock:
+            if self.running:
+                return False
+            self._stop.clear()
+            self._worker = threading.Thread(target=self._run, name="catalog-refresher", daemon=True)
+            self._worker.start()
+        logger.info(f"[CATALOG_REFRESH] Démarré (toutes les {self.interval:.0f} s ± {self.jitter:.0%})")
+        return True
+
+    def stop(self):
+        self._stop.set()
+
+    def next_delay(self) -> float:
+        """Intervalle avec gigue : les workers gunicorn ne frappent pas le backend ensemble"""
+        return max(1.0, self.interval * (1 + random.uniform(-self.jitter, self.jitter)))
+
+    def _run(self):
+        while not self._stop.is_set():
+            self.refresh()
+            self._stop.wait(self.next_delay())
+
+    def refresh(self) -> Dict[str, bool]:
+        """
+        Relit les trois jeux de données depuis le backend
+
+        Returns:
+            {jeu de données: succès}
+        """
+        session = {"auth": {"access": CATALOG_SERVICE_TOKEN}}
+        t_cycle = time.perf_counter()
+        results = {}
+        for name, load in _loaders().items():
+            t0 = time.perf_counter()
+            try:
+                items = load(session)
+            except Exception as e:
+                logger.warning(f"[CATALOG_REFRESH] {name} : {e}")
+                items = []
+            elapsed = (time.perf_counter() - t0) * 1000
+            with self._lock:
+                ds = self.datasets[name]
+                ds["last_duration_ms"] = round(elapsed, 1)
+                if items:
+                    self._last_good[name] = items
+                    ds.update(last_success=time.time(), items=len(items), consecutive_errors=0)
+                else:
+                    ds["errors"] += 1
+                    ds["consecutive_errors"] += 1
+                stale = None if items else self._last_good.get(name)
+            if stale:
+                _recache(name, stale)
+                with self._lock:
+                    self.stats["stale_served"] += 1
+                logger.warning(f"[CATALOG_REFRESH] {name} indisponible, version précédente conservée")
+            results[name] = bool(items)
+        cycle_ms = (time.perf_counter() - t_cycle) * 1000
+        with self._lock:
+            self.stats["cycles"] += 1
+            self.stats["cycle_ms"] = round(cycle_ms, 1)
+            self.stats["max_cycle_ms"] = round(max(self.stats["max_cycle_ms"], cycle_ms), 1)
+        if any(results.values()):
+            self._warm.set()
+        self._first_cycle.set()
+        logger.info(f"[CATALOG_REFRESH] Cycle en {cycle_ms:.0f} ms : "
+                    + ", ".join(f"{k} {'ok' if v else 'échec'}" for k, v in results.items()))
+        return results
+
+    def wait_warm(self, timeout: float = CATALOG_WARM_WAIT) -> bool:
+        """
+        Attend la fin du préchargement si le premier cycle est en cours
+        (après un premier cycle en échec, on n'attend plus : chargement à la demande)
+
+        Returns:
+            True si le catalogue est chaud (inutile de charger soi-même)
+        """
+        if self._warm.is_set():
+            return True
+        if not self.running or self._first_cycle.is_set():
+            return False
+        with self._lock:
+            self.stats["warm_waits"] += 1
+        self._first_cycle.wait(timeout)
+        return self._warm.is_set()
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Durées de rafraîchissement et fraîcheur (âge de la dernière lecture réussie) par jeu de données"""
+        now = time.time()
+        ttls = {"categories": CACHE_TTL_CATEGORIES, "entreprises": CACHE_TTL_MERCHANTS, "produits": CACHE_TTL_PRODUCTS}
+        with self._lock:
+            datasets = {}
+            for name, ds in self.datasets.items():
+                age = round(now - ds["last_success"], 1) if ds["last_success"] else None
+                datasets[name] = {**ds, "age_s": age, "ttl_s": ttls[name],
+                                  "stale": age is None or age > ttls[name]}
+            snapshot = dict(self.stats)
+        snapshot.update(running=self.running, warm=self._warm.is_set(), interval_s=self.interval,
+                        datasets=datasets)
+        return snapshot
+
+
+# Instance globale
+catalog_refresher = CatalogRefresher()
+
+
+def start_catalog_refresher() -> bool:
+    """Point d'entrée de ChatbotConfig.ready (désactivable : TOKTOK_CATALOG_REFRESHER=0)"""
+    if not CATALOG_REFRESHER_ENABLED:
+        logger.info("[CATALOG_REFRESH] Désactivé (TOKTOK_CATALOG_REFRESHER=0)")
+        return False
+    return catalog_refresher.start()
@@ -0,0 +1,240 @@
+# chatbot/catalog_search.py
+"""
+Recherche plein texte locale sur le catalogue marketplace (BM25)
+Marchands et produits (nom, description, marchand) indexés au fil des
+chargements ; mots sans accents ni pluriel, préfixes acceptés ("pou" →
+poulet). Résultats classés en quelques millisecondes, sans appel IA ni backend
+"""
+import math
+import time
+import bisect
+import logging
+import threading
+from collections import defaultdict
+from typing import Dict, Any, Optional, List, Tuple
+
+from .lexicon import tokenize
+
+logger = logging.getLogger(__name__)
+
+# Paramètres BM25
+K1 = 1.2
+B = 0.75
+NAME_BOOST = 2       # Les mots du nom comptent double
+PREFIX_WEIGHT = 0.6  # Correspondance par préfixe, moins sûre qu'un mot entier
+MIN_PREFIX_LEN = 3
+
+# Mots vides, normalisés comme les documents ("veux" → "veu")
+STOPWORDS = set(tokenize(
+    "de la le les du des et au aux a un une en pour avec je veux voudrais svp stp moi chez sur il y quoi"
+))
+
+
+def _terms(text: str) -> List[str]:
+    return [tok for tok in tokenize(text or "") if tok not in STOPWORDS and len(tok) > 1]
+
+
+def _first(doc: Dict[str, Any], *keys: str) -> str:
+    for key in keys:
+        value = doc.get(key)
+        if value not in (None, ""):
+            return str(value)
+    return ""
+
+
+def merchant_name(ent: Dict[str, Any]) -> str:
+    return _first(ent, "nom_entreprise", "nom", "name", "display_name", "raison_sociale") or "—"
+
+
+def _merchant_type(ent: Dict[str, Any]) -> str:
+    te = ent.get("type_entreprise")
+    if isinstance(te, dict):
+        return _first(te, "nom", "name")
+    return str(te) if isinstance(te, str) else ""
+
+
+def _product_merchant_id(prod: Dict[str, Any]) -> Optional[str]:
+    ent = prod.get("entreprise") or prod.get("marchand") or prod.get("merchant")
+    if isinstance(ent, dict):
+        ent = ent.get("id")
+    return str(ent) if ent not in (None, "") else None
+
+
+class CatalogIndex:
+    """Index inversé BM25 des marchands et produits déjà chargés"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.docs: Dict[Tuple[str, str], Dict[str, Any]] = {}  # (type, id) → document
+        self.merchants: Dict[str, Dict[str, Any]] = {}
+        self._dirty = True
+        self._keys: List[Tuple[str, str]] = []
+        self._postings: Dict[str, Dict[int, int]] = {}
+        self._lengths: List[int] = []
+        self._vocabulary: List[str] = []
+        self._avg_length = 1.0
+        self.stats = {"searches": 0, "rebuilds": 0, "search_ms": 0.0, "empty": 0}
+
+    # ---------- Alimentation ----------
+    def _drop_missing(self, kind: str, seen: set, merchant_id: Optional[str] = None):
+        """Sous verrou : retire les documents d'un instantané complet qui n'y figurent plus"""
+        stale = [key for key, doc in self.docs.items()
+                 if key[0] == kind and key[1] not in seen
+                 and (merchant_id is None or doc["merchant_id"] == merchant_id)]
+        for key in stale:
+            del self.docs[key]
+            if kind == "merchant":
+                self.merchants.pop(key[1], None)
+        if stale:
+            logger.debug(f"[CATALOG_SEARCH] {len(stale)} {kind}(s) retiré(s) de l'index")
+
+    def add_merchants(self, merchants: List[Dict[str, Any]], snapshot: bool = False):
+        """
+        Indexe (ou remplace) des marchands
+
+        Args:
+            merchants: Marchands renvoyés par le backend
+            snapshot: Liste complète : les marchands absents sont retirés de l'index
+        """
+        with self._lock:
+            if snapshot:
+                self._drop_missing("merchant", {str(e["id"]) for e in merchants or [] if e.get("id") is not None})
+            for ent in merchants or []:
+                if ent.get("id") is None:
+                    continue
+                mid = str(ent["id"])
+                self.merchants[mid] = ent
+                self.docs[("merchant", mid)] = {
+                    "kind": "merchant", "id": mid, "item": ent, "merchant_id": mid,
+                    "name": merchant_name(ent),
+                    "text": " ".join(filter(None, [_merchant_type(ent), _first(ent, "description", "raison_sociale")])),
+                }
+            self._dirty = True
+
+    def add_products(self, products: List[Dict[str, Any]], merchant: Optional[Dict[str, Any]] = None,
+                     snapshot: bool = False):
+        """
+        Indexe (ou remplace) des produits
+
+        Args:
+            products: Produits renvoyés par le backend
+            merchant: Marchand dont ils proviennent, si connu
+            snapshot: Liste complète (de ce marchand, ou de tout le catalogue sans
+                      marchand) : les produits absents ne sont plus proposés
+        """
+        with self._lock:
+            if snapshot:
+                scope = str(merchant["id"]) if merchant and merchant.get("id") is not None else None
+                self._drop_missing("product", {str(p["id"]) for p in products or [] if p.get("id") is not None},
+                                   merchant_id=scope)
+            for prod in products or []:
+                if prod.get("id") is None:
+                    continue
+                mid = str(merchant["id"]) if merchant and merchant.get("id") is not None else _product_merchant_id(prod)
+                ent = merchant or self.merchants.get(mid) or {}
+                self.docs[("product", str(prod["id"]))] = {
+                    "kind": "product", "id": str(prod["id"]), "item": prod, "merchant_id": mid,
+                    "name": _first(prod, "nom", "name") or "—",
+                    "text": " ".join(filter(None, [
+                        _first(prod, "description"), _first(prod, "categorie_nom", "category"),
+                        merchant_name(ent) if ent else _first(prod, "entreprise_nom"),
+                    ])),
+                }
+            self._dirty = True
+
+    def clear(self):
+        with self._lock:
+            self.docs.clear()
+            self.merchants.clear()
+            self._dirty = True
+
+    def _rebuild(self):
+        """Reconstruit les listes inversées (sous verrou ; catalogue de quelques milliers de documents)"""
+        postings: Dict[str, Dict[int, int]] = defaultdict(dict)
+        keys, lengths = list(self.docs.keys()), []
+        for i, key in enumerate(keys):
+            doc = self.docs[key]
+            terms = _terms(doc["name"]) * NAME_BOOST + _terms(doc["text"])
+            lengths.append(len(terms))
+            for term in terms:
+                postings[term][i] = postings[term].get(i, 0) + 1
+        self._keys, self._lengths, self._postings = keys, lengths, dict(postings)
+        self._vocabulary = sorted(postings)
+        self._avg_length = (sum(lengths) / len(lengths)) if lengths else 1.0
+        self._dirty = False
+        self.stats["rebuilds"] += 1
+
+    def _expand(self, term: str) -> List[Tuple[str, float]]:
+        """Termes du vocabulaire correspondant à un mot de la requête (entier, puis préfixe)"""
+        matches = [(term, 1.0)] if term in self._postings else []
+        if len(term) >= MIN_PREFIX_LEN:
+            i = bisect.bisect_left(self._vocabulary, term)
+            while i < len(self._vocabulary) and self._vocabulary[i].startswith(term):
+                if self._vocabulary[i] != term:
+                    matches.append((self._vocabulary[i], PREFIX_WEIGHT))
+                i += 1
+        return matches
+
+    # ---------- Recherche ----------
+    def search(self, query: str, limit: int = 8, kind: Optional[str] = None) -> List[Dict[str, Any]]:
+        """
+        Documents les plus pertinents pour une requête libre
+
+        Args:
+            query: Texte de l'utilisateur ("poulet mayo", "pizza chez mario")
+            limit: Nombre maximal de résultats
+            kind: "product", "merchant" ou None (les deux)
+
+        Returns:
+            Liste de {"kind", "id", "score", "name", "item", "merchant"} par score décroissant
+        """
+        t0 = time.perf_counter()
+        query_terms = list(dict.fromkeys(_terms(query)))
+        with self._lock:
+            if self._dirty:
+                self._rebuild()
+            n_docs = len(self._keys)
+            scores: Dict[int, float] = defaultdict(float)
+            for term in query_terms:
+                best: Dict[int, float] = {}
+                for match, weight in self._expand(term):
+                    postings = self._postings[match]
+                    idf = math.log(1 + (n_docs - len(postings) + 0.5) / (len(postings) + 0.5))
+                    for i, tf in postings.items():
+                        norm = tf + K1 * (1 - B + B * self._lengths[i] / self._avg_length)
+                        score = weight * idf * tf * (K1 + 1) / norm
+                        if score > best.get(i, 0):
+                            best[i] = score
+                for i, score in best.items():
+                    scores[i] += score
+            ranked = sorted(scores.items(), key=lambda kv: kv[1], reverse=True)
+            results = []
+            for i, score in ranked:
+                doc = self.docs[self._keys[i]]
+                if kind and doc["kind"] != kind:
+                    continue
+                results.append({"kind": doc["kind"], "id": doc["id"], "score": round(score, 3),
+                                "name": doc["name"], "item": doc["item"],
+                                "merchant": self.merchants.get(doc["merchant_id"] or "")})
+                if len(results) >= limit:
+                    break
+            self.stats["searches"] += 1
+            self.stats["search_ms"] += (time.perf_counter() - t0) * 1000
+            if not results:
+                self.stats["empty"] += 1
+        logger.debug(f"[CATALOG_SEARCH] '{query[:40]}' → {len(results)} résultat(s)")
+        return results
+
+    def get_stats(self) -> Dict[str, Any]:
+        with self._lock:
+            snapshot = dict(self.stats)
+            snapshot["documents"] = len(self.docs)
+            snapshot["products"] = sum(1 for k, _ in self.docs if k == "product")
+            snapshot["merchants"] = len(self.merchants)
+            snapshot["terms"] = len(self._postings)
+        snapshot["avg_search_ms"] = round(snapshot["search_ms"] / snapshot["searches"], 3) if snapshot["searches"] else 0
+        return snapshot
+
+
+# Instance globale
+catalog_index = CatalogIndex()
@@ -1,20 +1,21 @@
 # chatbot/conversation_flow.py
 from __future__ import annotations
-import os, re, logging, requests
+import os, re, logging
 from typing import Dict, Any, Optional
 from urllib.parse import quote_plus
 from datetime import datetime
-from openai import OpenAI
 from .auth_core import get_session, build_response, normalize
+from .llm_cache import llm_cache
+from .llm_gateway import llm_gateway
+from .lexicon import lexicon
+from .backend_warmth import backend_warmth
 
 logger = logging.getLogger(__name__)
 
 API_BASE = os.getenv("TOKTOK_BASE_URL", "https://toktok-bsfz.onrender.com")
 TIMEOUT  = int(os.getenv("TOKTOK_TIMEOUT", "15"))
 
-OPENAI_API_KEY = os.getenv("OPENAI_API_KEY", "").strip()
-OPENAI_MODEL   = os.getenv("OPENAI_MODEL", "gpt-4o-mini").strip()
-openai_client  = OpenAI(api_key=OPENAI_API_KEY) if OPENAI_API_KEY else None
+llm_client     = llm_gateway if llm_gateway.available else None
 
 WELCOME_TEXT = (
     "🚚 Bienvenue sur *TokTok* !\n"
@@ -35,7 +36,7 @@ def _headers(session: Dict[str, Any]) -> Dict[str, str]:
 def api_request(session: Dict[str, Any], method: str, path: str, **kwargs):
     headers = {**_headers(session), **kwargs.pop("headers", {})}
     url = f"{API_BASE}{path}"
-    r = requests.request(method, url, headers=headers, timeout=TIMEOUT, **kwargs)
+    r = backend_warmth.request(method, url, headers=headers, timeout=TIMEOUT, **kwargs)
     logger.debug(f"[API] {method} {path} -> {r.status_code}")
     return r
 
@@ -57,7 +58,7 @@ def _extract_results(payload):
 # IA Fallback
 # ------------------------------------------------------
 def ai_fallback(user_message: str, phone: str) -> Dict[str, Any]:
-    if not openai_client:
+    if not llm_client:
         return build_response(
             "❓ Désolé, je n’ai pas compris.\n👉 Tapez *menu* pour voir les choix disponibles.",
             MAIN_MENU_BTNS
@@ -69,16 +70,20 @@ def ai_fallback(user_message: str, phone: str) -> Dict[str, Any]:
             "- Si la demande concerne une livraison, propose les options du menu.\n"
             "- Les options valides sont : Nouvelle demande, Suivre ma demande, Marketplace."
         )
-        completion = openai_client.chat.completions.create(
-            model=OPENAI_MODEL,
-            messages=[
-                {"role": "system", "content": system},
-                {"role": "user", "content": user_message}
-            ],
-            temperature=0.3,
-            max_tokens=220,
-        )
-        ai_reply = (completion.choices[0].message.content or "").strip()
+
+        def ask():
+            completion = llm_client.complete(
+                messages=[
+                    {"role": "system", "content": system},
+                    {"role": "user", "content": user_message}
+                ],
+                temperature=0.3,
+                max_tokens=220,
+                function="ai_fallback", flow="client", step=get_session(phone).get("step") or "",
+            )
+            return (completion.choices[0].message.content or "").strip() or None  # Réponse vide : pas mise en cache
+
+        ai_reply = llm_cache.cached_call("ai_fallback", user_message, ask) or ""
         return build_response(ai_reply, MAIN_MENU_BTNS)
     except Exception as e:
         logger.error(f"[AI_FALLBACK] {e}")
@@ -364,16 +369,18 @@ def handle_message(phone: str, text: str,
         return build_response("👉 Choisissez une option :", MAIN_MENU_BTNS)
 
     # Menu principal
-    if t in {"1","nouvelle demande"}:
+    lex = lexicon.analyze(t)
+    choice = lex.exact("main_menu")
+    if choice == "nouvelle_demande":
         session["step"] = "COURIER_DEPART"
         resp = build_response("📍 Indiquez votre adresse de départ ou partagez votre localisation.")
         resp["ask_location"] = True
         return resp
-    if t in {"2","suivre","suivre ma demande"}:
+    if choice == "suivre":
         return handle_follow(session)
-    if t in {"3","historique"}:
+    if choice == "historique":
         return handle_history(session)
-    if t in {"4","marketplace"}:
+    if choice == "marketplace":
         return handle_marketplace(session)
 
     # Gestion localisation
@@ -428,9 +435,10 @@ def handle_message(phone: str, text: str,
         )
         return build_response(recap, ["Confirmer","Annuler","Modifier"])
     if step == "COURIER_CONFIRM":
-        if t in {"confirmer","oui"}:
+        answer = lex.exact("answer")
+        if answer == "confirmer":
             return courier_create(session)
-        if t in {"annuler","non"}:
+        if answer == "annuler":
             session["step"] = "MENU"
             session.pop("new_request", None)
             return build_response("✅ Demande annulée.", MAIN_MENU_BTNS)
@@ -1,16 +1,16 @@
 # chatbot/conversation_flow_coursier.py
 from __future__ import annotations
-import os, re, logging, requests
+import os, re, logging
 from typing import Dict, Any, Optional
 from .auth_core import get_session, build_response, normalize
 from .conversation_flow import ai_fallback  # réutilise la fonction IA
 from .analytics import analytics
-from .smart_fallback import (
-    extract_structured_data,
-    smart_validate,
-    detect_intent_change,
-    generate_smart_error_message
-)
+from .mission_broadcast import mission_broadcaster
+from .rule_extractors import extract_reference
+from .speculative_geocoding import prefetch_geocode, recap_distance, clear_prefetch
+from .smart_fallback import understand_turn
+from .lexicon import lexicon
+from .backend_warmth import backend_warmth
 
 logger = logging.getLogger(__name__)
 
@@ -19,6 +19,9 @@ TIMEOUT = int(os.getenv("TOKTOK_TIMEOUT", "15"))
 
 MAIN_MENU_BTNS = ["Nouvelle demande", "Suivre ma demande", "Marketplace"]
 
+# Type validé à chaque étape de saisie libre (compréhension du tour)
+TURN_EXPECTED_TYPES = {"DEST_TEL": "phone", "EXPEDITEUR_TEL": "phone", "COURIER_VALUE": "amount"}
+
 # --- Helpers UI ---
 def _fmt_fcfa(n: int | str | None) -> str:
     try:
@@ -115,7 +118,7 @@ def _headers(session: Dict[str, Any]) -> Dict[str, str]:
 def api_request(session: Dict[str, Any], method: str, path: str, **kwargs):
     headers = {**_headers(session), **kwargs.pop("headers", {})}
     url = f"{API_BASE}{path}"
-    r = requests.request(method, url, headers=headers, timeout=TIMEOUT, **kwargs)
+    r = backend_warmth.request(method, url, headers=headers, timeout=TIMEOUT, **kwargs)
     logger.debug(f"[API-C] {method} {path} -> {r.status_code}")
     return r
 
@@ -199,7 +202,8 @@ def follow_lookup(session: Dict[str, Any], text: str) -> Dict[str, Any]:
         if not all_missions:
             return build_response("❌ Vous n'avez aucune demande enregistrée.", MAIN_MENU_BTNS)
 
-        ref = text.strip()
+        # Isoler la référence si elle est noyée dans une phrase ("où en est COUR-...-003 ?")
+        ref = extract_reference(text)["value"] or text.strip()
         mission = None
 
         # Recherche exacte par numero_mission
@@ -329,6 +333,12 @@ def courier_create(session: Dict[str, Any]) -> Dict[str, Any]:
         except Exception as e:
             logger.warning(f"[COURIER] Could not track conversion: {e}")
         
+        # Alerter les livreurs disponibles autour du point de départ
+        try:
+            mission_broadcaster.broadcast({**payload, **mission, "id": mission_id})
+        except Exception as e:
+            logger.warning(f"[COURIER] Could not broadcast mission: {e}")
+        
         msg = (
             "🎉 *MISSION CRÉÉE AVEC SUCCÈS*\n\n"
             f"*Référence :* `{ref}`\n"
@@ -342,6 +352,7 @@ def courier_create(session: Dict[str, Any]) -> Dict[str, Any]:
         )
         # On nettoie le brouillon pour la prochaine demande
         session.pop("new_request", None)
+        clear_prefetch(session)
         return build_response(msg, MAIN_MENU_BTNS)
 
     except Exception as e:
@@ -358,18 +369,29 @@ def courier_create(session: Dict[str, Any]) -> Dict[str, Any]:
 def flow_coursier_handle(session: Dict[str, Any], text: str, lat: Optional[float] = None, lng: Optional[float] = None) -> Dict[str, Any]:
     step = session.get("step")
     t = normalize(text).lower() if text else ""
+    lex = lexicon.analyze(t)  # Boutons et mots-clés reconnus en un seul passage
+    nav = lex.exact("nav")
     
-    # === SMART FALLBACK : Détection d'intention ===
-    # Vérifier si l'utilisateur veut changer de flow
-    intent_change = detect_intent_change(text, "coursier")
+    # === SMART FALLBACK : Compréhension du tour (un seul appel IA au plus) ===
+    # Changement de flow, validation de la saisie et extraction libre ensemble
+    is_nav = nav is not None or "suivre" in lex.tokens
+    extract = step == "COURIER_POSITION_TYPE" and len(text or "") > 20 and not lex.exact("position")
+    turn = understand_turn(
+        text or "", step, "coursier",
+        expected_type=None if is_nav else TURN_EXPECTED_TYPES.get(step),
+        extract=extract,
+        context=session.get("new_request", {})
+    )
+    intent_change = turn["intent_change"]
     if intent_change and intent_change != "coursier":
         logger.info(f"[SMART] Intent change detected: coursier → {intent_change}")
         
         if intent_change == "marketplace":
-            from .conversation_flow_marketplace import flow_marketplace_handle
+            from .conversation_flow_marketplace import flow_marketplace_handle, search_products
             session["step"] = "MARKET_CATEGORY"
-            # Ne pas passer le texte original, laisser le marketplace afficher les catégories
-            return flow_marketplace_handle(session, "")
+            # Demande précise ("je veux un poulet mayo") : résultats de recherche directement,
+            # sinon le marketplace affiche les catégories (sans le texte original)
+            return search_products(session, text or "") or flow_marketplace_handle(session, "")
         
         elif intent_change == "follow":
             return handle_follow(session)
@@ -380,16 +402,16 @@ def flow_coursier_handle(session: Dict[str, Any], text: str, lat: Optional[float
             return build_response("🏠 Menu principal", MAIN_MENU_BTNS)
 
     # Menu principal - Options disponibles
-    if t in {"suivre ma demande", "suivre", "2"} or "suivre" in t:
+    if lex.exact("main_menu") == "suivre" or "suivre" in lex.tokens:
         return handle_follow(session)
     
-    if t in {"menu", "accueil"}:
+    if nav == "menu":
         session["step"] = "MENU"
         session.pop("new_request", None)
         return build_response("🏠 Menu principal", MAIN_MENU_BTNS)
 
     # Gestion bouton retour contextuel - étape par étape
-    if t in {"retour", "back", "🔙 retour"}:
+    if nav == "retour":
         current_step = session.get("step", "")
         
         # Retour depuis FOLLOW_WAIT vers menu
@@ -504,13 +526,13 @@ def flow_coursier_handle(session: Dict[str, Any], text: str, lat: Optional[float
             return build_response("🏠 Menu principal", MAIN_MENU_BTNS)
 
     # Raccourcis menu
-    if t in {"menu", "accueil", "0"}:
+    if nav == "menu" or t == "0":
         session["step"] = "MENU"
         session.pop("new_request", None)
         return build_response("🏠 Menu principal — que souhaitez-vous faire ?", MAIN_MENU_BTNS)
 
     # Début du flow - Demander où se trouve le client
-    if step in {None, "MENU", "AUTHENTICATED"} and (t in {"nouvelle demande", "1"} or "nouvelle demande" in t):
+    if step in {None, "MENU", "AUTHENTICATED"} and "nouvelle_demande" in lex.values("main_menu"):
         session.pop("new_request", None)  # Nettoyer au départ
         session["step"] = "COURIER_POSITION_TYPE"
         return build_response(
@@ -537,18 +559,11 @@ def flow_coursier_handle(session: Dict[str, Any], text: str, lat: Optional[float
         
         # === SMART FALLBACK : Extraction si l'utilisateur donne directement l'adresse ===
         # Ex: "Je veux envoyer le colis à Marie à Moungali"
-        if len(text) > 20 and not t in {"au point de depart", "depart", "point de depart", "au point d'arrivee", "arrivee", "1", "2"}:
-            extracted = extract_structured_data(
-                user_input=text,
-                current_step=step,
-                current_flow="coursier",
-                context=session.get("new_request", {})
-            )
-            
-            if extracted["confidence"] > 0.6:
-                logger.info(f"[SMART] Extracted from COURIER_POSITION_TYPE: {extracted}")
+        if extract:
+            if turn["confidence"] > 0.6:
+                logger.info(f"[SMART] Extracted from COURIER_POSITION_TYPE: {turn['extracted_fields']}")
                 nr = session.setdefault("new_request", {})
-                fields = extracted["extracted_fields"]
+                fields = turn["extracted_fields"]
                 
                 # Remplir les champs trouvés
                 if fields.get("adresse_destination"):
@@ -567,7 +582,8 @@ def flow_coursier_handle(session: Dict[str, Any], text: str, lat: Optional[float
                     return resp
         
         # Cas standard : choix départ/arrivée
-        if t in {"au point de depart", "depart", "point de depart", "1"} or "depart" in t:
+        position = next(iter(lex.values("position")), None)
+        if position == "depart":
             session.setdefault("new_request", {})["client_position"] = "depart"
             session["step"] = "COURIER_DEPART_GPS"
             resp = build_response(
@@ -579,7 +595,7 @@ def flow_coursier_handle(session: Dict[str, Any], text: str, lat: Optional[float
             )
             resp["ask_location"] = True
             return resp
-        elif t in {"au point d'arrivee", "arrivee", "point d'arrivee", "destination", "2"} or "arrivee" in t or "arrivée" in t:
+        elif position == "arrivee":
             session.setdefault("new_request", {})["client_position"] = "arrivee"
             session["step"] = "COURIER_DEST_GPS"
             resp = build_response(
@@ -645,6 +661,7 @@ def flow_coursier_handle(session: Dict[str, Any], text: str, lat: Optional[float
     if step == "COURIER_DEST_TEXT":
         nr = session.setdefault("new_request", {})
         nr["destination"] = text
+        prefetch_geocode(session, "destination", text)  # Géocodage pendant la saisie du contact
         session["step"] = "DEST_NOM"
         return build_response(
             "[▓▓▓▓▓▓░░░░] 60% · _Contact destinataire_\n\n"
@@ -658,6 +675,7 @@ def flow_coursier_handle(session: Dict[str, Any], text: str, lat: Optional[float
     if step == "COURIER_DEPART_TEXT":
         nr = session.setdefault("new_request", {})
         nr["depart"] = text
+        prefetch_geocode(session, "depart", text)  # Géocodage pendant la saisie du contact
         session["step"] = "EXPEDITEUR_NOM"
         return build_response(
             "[▓▓▓▓▓▓░░░░] 60% · _Contact expéditeur_\n\n"
@@ -682,11 +700,10 @@ def flow_coursier_handle(session: Dict[str, Any], text: str, lat: Optional[float
     # Téléphone du destinataire (quand client est au départ)
     if step == "DEST_TEL":
         # === SMART FALLBACK : Validation intelligente du téléphone ===
-        is_valid, extracted_value, error_msg = smart_validate(text, "phone", step)
+        is_valid, extracted_value = turn["is_valid"], turn["value"]
         
         if not is_valid:
-            error = generate_smart_error_message(text, "phone", step)
-            return build_response(error, ["🔙 Retour"])
+            return build_response(turn["error_message"], ["🔙 Retour"])
         
         session["new_request"]["destinataire_tel"] = extracted_value
         # Copier aussi vers contact_autre pour uniformiser
@@ -706,11 +723,10 @@ def flow_coursier_handle(session: Dict[str, Any], text: str, lat: Optional[float
     # Téléphone de l'expéditeur (quand client est à l'arrivée)
     if step == "EXPEDITEUR_TEL":
         # === SMART FALLBACK : Validation intelligente du téléphone ===
-        is_valid, extracted_value, error_msg = smart_validate(text, "phone", step)
+        is_valid, extracted_value = turn["is_valid"], turn["value"]
         
         if not is_valid:
-            error = generate_smart_error_message(text, "phone", step)
-            return build_response(error, ["🔙 Retour"])
+            return build_response(turn["error_message"], ["🔙 Retour"])
         
         session["new_request"]["expediteur_tel"] = extracted_value
         # On garde l'expéditeur dans destinataire_nom/tel pour l'API (car c'est le contact du colis)
@@ -729,12 +745,11 @@ def flow_coursier_handle(session: Dict[str, Any], text: str, lat: Optional[float
 
     if step == "COURIER_VALUE":
         # === SMART FALLBACK : Validation intelligente du montant ===
-        is_valid, extracted_value, error_msg = smart_validate(text, "amount", step)
+        is_valid, extracted_value = turn["is_valid"], turn["value"]
         
         if not is_valid:
-            # Message d'erreur personnalisé
-            error = generate_smart_error_message(text, "amount", step)
-            return build_response(error, ["🔙 Retour"])
+            # Message d'erreur personnalisé (produit par le même appel)
+            return build_response(turn["error_message"], ["🔙 Retour"])
         
         session["new_request"]["value_fcfa"] = extracted_value
         session["step"] = "COURIER_DESC"
@@ -782,20 +797,27 @@ def flow_coursier_handle(session: Dict[str, Any], text: str, lat: Optional[float
             "*📦 Colis*\n"
             f"• Contenu : _{d.get('description', '—')}_\n"
             f"• Valeur : *{_fmt_fcfa(d.get('value_fcfa'))} FCFA*\n\n"
+        )
+        # Distance issue du géocodage lancé aux étapes précédentes (sans attente)
+        dist = recap_distance(session)
+        if dist:
+            recap += f"*📏 Trajet estimé :* {dist['distance_text']} · ⏱️ {dist['estimated_time']}\n\n"
+        recap += (
             "━━━━━━━━━━━━━━━━━━━━\n\n"
             "✅ _Tout est correct ?_"
         )
         return build_response(recap, ["✅ Confirmer", "✏️ Modifier", "🔙 Retour"])
 
     if step == "COURIER_CONFIRM":
-        if t in {"confirmer", "oui", "ok"}:
+        answer = lex.exact("answer")
+        if answer == "confirmer":
             # message de transition doux
             return build_response("✨ Je finalise votre demande…") | courier_create(session)
-        if t in {"annuler", "non"}:
+        if answer == "annuler":
             session["step"] = "MENU"
             session.pop("new_request", None)
             return build_response("✅ Demande annulée. Que souhaitez-vous faire ?", MAIN_MENU_BTNS)
-        if t in {"modifier"}:
+        if answer == "modifier":
             session["step"] = "COURIER_EDIT"
             return build_response(
                 "✏️ Que voulez-vous modifier ?",
@@ -830,6 +852,13 @@ def flow_coursier_handle(session: Dict[str, Any], text: str, lat: Optional[float
     if step == "FOLLOW_WAIT":
         return follow_lookup(session, text)
 
+    # Menu : saisie libre qui désigne un produit du catalogue déjà chargé → recherche marketplace
+    if text and step in {None, "MENU", "AUTHENTICATED"}:
+        from .conversation_flow_marketplace import search_products
+        found = search_products(session, text, warm=False)
+        if found:
+            return found
+
     # fallback IA (petite garde-fou UX)
     if text:
         return ai_fallback(text, session.get("phone"))
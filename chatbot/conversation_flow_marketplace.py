@@ -1,44 +1,32 @@
 # chatbot/conversation_flow_marketplace.py
 # VERSION FINALE CORRIGÉE - Tous les bugs fixes appliqués
 from __future__ import annotations
-import os, logging, requests, re
+import os, logging, re
 from typing import Dict, Any, Optional, List, Tuple
 from .auth_core import get_session, build_response, normalize
 from .conversation_flow import ai_fallback
 from .analytics import analytics
-from .smart_fallback import (
-    extract_structured_data,
-    smart_validate,
-    detect_intent_change,
-    generate_smart_error_message
+from .smart_fallback import understand_turn
+from .lexicon import lexicon
+from .cache import (
+    cache_categories, get_cached_categories, cache_merchants, get_cached_merchants,
+    cache_products, get_cached_products,
 )
+from .catalog_search import catalog_index
+from .catalog_refresher import catalog_refresher
+from .catalog_prefetch import catalog_prefetcher
+from .backend_warmth import backend_warmth
 
 logger = logging.getLogger(__name__)
 
 API_BASE = os.getenv("TOKTOK_BASE_URL", "https://toktok-bsfz.onrender.com")
 TIMEOUT = int(os.getenv("TOKTOK_TIMEOUT", "15"))
+SEARCH_LIMIT = 40  # Résultats de recherche gardés (affichés page par page)
 
 MAIN_MENU_BTNS = ["Nouvelle demande", "Suivre ma demande", "Marketplace"]
 
 # ==================== CONSTANTS ====================
-PAYMENT_METHODS = {
-    # Espèces variants
-    "espèces": "espèces",
-    "cash": "espèces",
-    "1": "espèces",
-
-    # Mobile Money variants
-    "mobile money": "mobile_money",
-    "mobile": "mobile_money",
-    "mtn": "mobile_money",
-    "2": "mobile_money",
-
-    # Virement variants
-    "virement": "virement",
-    "transfer": "virement",
-    "bank": "virement",
-    "3": "virement",
-}
+# Modes de paiement et leurs variantes : catégorie "payment" de chatbot/lexicon.py
 
 
 # ==================== HELPERS ====================
@@ -98,14 +86,15 @@ def _headers(session: Dict[str, Any]) -> Dict[str, str]:
 def api_request(session: Dict[str, Any], method: str, path: str, **kwargs):
     headers = {**_headers(session), **kwargs.pop("headers", {})}
     url = f"{API_BASE}{path}"
-    r = requests.request(method, url, headers=headers, timeout=TIMEOUT, **kwargs)
+    r = backend_warmth.request(method, url, headers=headers, timeout=TIMEOUT, **kwargs)
     logger.debug(f"[API-M] {method} {path} -> {r.status_code}")
     return r
 
 
 def _cleanup_marketplace_session(session: Dict[str, Any]) -> None:
     keys = ["market_categories", "market_category", "market_merchants",
-            "market_merchant", "market_products", "selected_product", "new_request"]
+            "market_merchant", "market_products", "selected_product", "new_request",
+            "market_search_results", "market_search_query"]
     for key in keys:
         session.pop(key, None)
 
@@ -124,15 +113,39 @@ def _build_list_response(text: str, rows: List[dict], section_title: str = "Opti
 def _is_retour(txt: str) -> bool:
     if not txt:
         return False
-    txt_lower = txt.strip().lower()
-    if "🔙" in txt or txt_lower in {"retour", "back", "🔙 retour"}:
-        return True
-    return normalize(txt) == "retour"
+    return "🔙" in txt or lexicon.exact(txt, "nav") == "retour"
 
 
 # ==================== DATA LOADERS ====================
-def _load_categories(session: Dict[str, Any]) -> List[Dict[str, Any]]:
-    cats: List[Dict[str, Any]] = []
+# Catalogue mis en cache (chatbot/cache.py) et indexé pour la recherche libre
+def _cached_or_warm(getter) -> Optional[list]:
+    """Catalogue en cache ; à froid, attend le préchargement de fond plutôt que de charger soi-même"""
+    value = getter()
+    if not value and catalog_refresher.wait_warm():
+        value = getter()
+    return value
+
+
+# refresh=True : lecture backend forcée (rafraîchissement de fond, chatbot/catalog_refresher.py)
+def _load_entreprises(session: Dict[str, Any], refresh: bool = False) -> List[Dict[str, Any]]:
+    ents = None if refresh else _cached_or_warm(lambda: get_cached_merchants("all"))
+    if ents is not None:
+        return ents
+    r = api_request(session, "GET", "/api/v1/auth/entreprises/")
+    if not r.ok:
+        return []
+    data = r.json()
+    ents = data.get("results", []) if isinstance(data, dict) else (data or [])
+    if ents:
+        cache_merchants("all", ents)
+        catalog_index.add_merchants(ents, snapshot=True)
+    return ents
+
+
+def _load_categories(session: Dict[str, Any], refresh: bool = False) -> List[Dict[str, Any]]:
+    cats: List[Dict[str, Any]] = [] if refresh else (_cached_or_warm(get_cached_categories) or [])
+    if cats:
+        return cats
     try:
         r = api_request(session, "GET", "/api/v1/marketplace/categories/")
         if r.ok:
@@ -142,13 +155,14 @@ def _load_categories(session: Dict[str, Any]) -> List[Dict[str, Any]]:
         logger.warning(f"[MARKET] categories failed: {e}")
 
     if cats:
+        cache_categories(cats)
         return cats
+    if refresh:
+        return []
 
     try:
-        r = api_request(session, "GET", "/api/v1/auth/entreprises/")
-        if r.ok:
-            data = r.json()
-            ents = data.get("results", []) if isinstance(data, dict) else (data or [])
+        ents = _load_entreprises(session)
+        if ents:
             tmp = {}
             for e in ents:
                 te = e.get("type_entreprise")
@@ -169,11 +183,7 @@ def _load_categories(session: Dict[str, Any]) -> List[Dict[str, Any]]:
 
 def _load_merchants_by_category(session: Dict[str, Any], category: Dict[str, Any]) -> List[Dict[str, Any]]:
     try:
-        r = api_request(session, "GET", "/api/v1/auth/entreprises/")
-        if not r.ok:
-            return []
-        data = r.json()
-        ents = data.get("results", []) if isinstance(data, dict) else (data or [])
+        ents = _load_entreprises(session)
         cid = category.get("id")
         cnom = (category.get("nom") or category.get("name") or "").strip().lower()
 
@@ -194,6 +204,9 @@ def _load_merchants_by_category(session: Dict[str, Any], category: Dict[str, Any
 
 
 def _load_products_by_category(session: Dict[str, Any], category_id: Any) -> List[Dict[str, Any]]:
+    prods = get_cached_products(str(category_id))
+    if prods:
+        return prods
     try:
         path = f"/api/v1/marketplace/produits/{category_id}/"
         r = api_request(session, "GET", path)
@@ -201,15 +214,30 @@ def _load_products_by_category(session: Dict[str, Any], category_id: Any) -> Lis
             data = r.json()
             prods = data.get("results", []) if isinstance(data, dict) else (data or [])
             if prods:
+                cache_products(str(category_id), prods)
+                # Liste complète de ce marchand (sans marchand connu, ce n'est pas tout le catalogue)
+                merchant = catalog_index.merchants.get(str(category_id))
+                catalog_index.add_products(prods, merchant=merchant, snapshot=merchant is not None)
                 return prods
     except Exception as e:
         logger.warning(f"[MARKET] produits by_category failed: {e}")
 
+    return _load_available_products(session)
+
+
+def _load_available_products(session: Dict[str, Any], refresh: bool = False) -> List[Dict[str, Any]]:
+    prods = None if refresh else _cached_or_warm(lambda: get_cached_products("disponibles"))
+    if prods:
+        return prods
     try:
         r = api_request(session, "GET", "/api/v1/marketplace/produits/disponibles/")
         if r.ok:
             data = r.json()
-            return data.get("results", []) if isinstance(data, dict) else (data or [])
+            prods = data.get("results", []) if isinstance(data, dict) else (data or [])
+            if prods:
+                cache_products("disponibles", prods)
+                catalog_index.add_products(prods, snapshot=True)
+            return prods
     except Exception as e:
         logger.error(f"[MARKET] produits disponibles failed: {e}")
 
@@ -230,6 +258,127 @@ def _merchant_pickup_info(ent: Dict[str, Any]) -> Tuple[str, str]:
     return str(addr), coords
 
 
+def _merchant_rows(merchants_indexed: Dict[str, Dict[str, Any]]) -> List[dict]:
+    rows = []
+    for k in sorted(merchants_indexed.keys(), key=lambda x: int(x)):
+        m = merchants_indexed[k]
+        rows.append({
+            "id": k,
+            "title": _truncate_title(_merchant_display_name(m), 24),
+            "description": m.get("raison_sociale", "")[:60] if m.get("raison_sociale") else ""
+        })
+    return rows
+
+
+def _search_merchants(session: Dict[str, Any], query: str) -> Optional[Dict[str, Any]]:
+    """Saisie libre ("poulet mayo") : marchands qui correspondent, via l'index local du catalogue"""
+    merchants, seen = [], set()
+    for hit in catalog_index.search(query, limit=SEARCH_LIMIT):
+        ent = hit["item"] if hit["kind"] == "merchant" else hit["merchant"]
+        if ent and ent.get("id") is not None and str(ent["id"]) not in seen:
+            seen.add(str(ent["id"]))
+            merchants.append(ent)
+    if not merchants:
+        return None
+    merchants_indexed = {str(i): m for i, m in enumerate(merchants)}
+    session["market_merchants"] = merchants_indexed
+    session["market_category"] = {"nom": query}
+    session["step"] = "MARKET_MERCHANT"
+    catalog_prefetcher.after_merchants(session, merchants)
+    return _build_list_response(f"🔎 *Marchands pour « {query.strip()[:40]} »*",
+                                _merchant_rows(merchants_indexed), section_title="Marchands")
+
+
+def _select_product(session: Dict[str, Any], produit: Dict[str, Any]) -> Dict[str, Any]:
+    """Produit choisi (liste du marchand ou résultats de recherche) : passage à la quantité"""
+    session["selected_product"] = produit
+    session.setdefault("new_request", {})
+    session["new_request"]["market_choice"] = produit.get("nom")
+    session["new_request"]["description"] = (produit.get("description") or "").strip()
+    # Convertir le prix en float dès le départ pour éviter les erreurs de multiplication
+    # Le prix peut être "2 500 FCFA" ou "2500" ou 2500
+    prix_raw = produit.get("prix", 0)
+    try:
+        if isinstance(prix_raw, str):
+            # Nettoyer: enlever espaces, "FCFA", etc.
+            prix_clean = prix_raw.replace(" ", "").replace("FCFA", "").replace("fcfa", "").strip()
+            prix_float = float(prix_clean) if prix_clean else 0
+        else:
+            prix_float = float(prix_raw) if prix_raw else 0
+    except (ValueError, TypeError):
+        logger.warning(f"[MARKET] Impossible de convertir prix: {prix_raw}")
+        prix_float = 0
+    
+    session["new_request"]["unit_price"] = prix_float
+    session["step"] = "MARKET_QUANTITY"
+
+    # Si le produit a une image, l'afficher
+    image_url = produit.get("image") or produit.get("photo")
+    resp = build_response(
+        "*📦 QUANTITÉ*\n"
+        "━━━━━━━━━━━━━━━━━━━━\n\n"
+        f"*Produit :* _{produit.get('nom', '—')}_\n"
+        f"*Prix unitaire :* {_fmt_fcfa(produit.get('prix', 0))} FCFA\n\n"
+        "━━━━━━━━━━━━━━━━━━━━\n\n"
+        "🔢 *Combien en voulez-vous ?*\n\n"
+        "_Tapez un nombre_\n"
+        "_Exemple :_ `2`",
+        ["🔙 Retour"]
+    )
+    
+    # Ajouter l'image si disponible
+    if image_url and isinstance(image_url, str) and image_url.startswith("http"):
+        resp["media"] = {
+            "type": "image",
+            "url": image_url,
+            "product_id": produit.get("id"),  # Photo préparée et réutilisée par media_id (product_images)
+            "caption": f"📦 {produit.get('nom', '—')}\n💰 {_fmt_fcfa(produit.get('prix', 0))} FCFA"
+        }
+    
+    return resp
+
+
+def search_products(session: Dict[str, Any], query: str, warm: bool = True) -> Optional[Dict[str, Any]]:
+    """
+    Recherche directe de produits : une liste de résultats, puis la quantité
+
+    Args:
+        query: Saisie libre ("poulet mayo")
+        warm: Charger le catalogue des produits disponibles (cache) si l'index est vide
+
+    Returns:
+        Liste des résultats (étape MARKET_SEARCH), ou None si rien ne correspond
+    """
+    query = (query or "").strip()
+    if len(query) < 3 or query.isdigit():
+        return None
+    if warm and not catalog_index.get_stats()["products"]:
+        try:
+            _load_entreprises(session)
+            _load_available_products(session)
+        except Exception as e:
+            logger.warning(f"[MARKET] search warmup failed: {e}")
+    hits = [h for h in catalog_index.search(query, limit=SEARCH_LIMIT, kind="product") if h["merchant"]]
+    if not hits:
+        return None
+    session["market_search_results"] = {
+        str(i): {"product": h["item"], "merchant": h["merchant"]} for i, h in enumerate(hits, start=1)
+    }
+    session["market_search_query"] = query[:40]
+    session["step"] = "MARKET_SEARCH"
+    return _search_results_response(session, f"🔎 *Résultats pour « {session['market_search_query']} »*")
+
+
+def _search_results_response(session: Dict[str, Any], msg: str) -> Dict[str, Any]:
+    rows = []
+    for k, hit in session.get("market_search_results", {}).items():
+        p = hit["product"]
+        title, description = _build_product_title_and_desc(p.get("nom", "—"), p.get("prix", 0),
+                                                           _merchant_display_name(hit["merchant"]))
+        rows.append({"id": k, "title": title, "description": description})
+    return _build_list_response(msg, rows, section_title="Produits")
+
+
 # ==================== MARKETPLACE ORDER ====================
 def marketplace_create_order(session: Dict[str, Any]) -> Dict[str, Any]:
     try:
@@ -366,6 +515,8 @@ def _begin_marketplace(session: Dict[str, Any]) -> Dict[str, Any]:
                 "title": nom[:30]
             })
 
+        # Pendant que l'utilisateur choisit : marchands et produits probables en tâche de fond
+        catalog_prefetcher.after_categories(session, categories)
         return _build_list_response("🛍️ *Sélectionnez une catégorie*", rows, section_title="Catégories")
     except Exception as e:
         logger.error(f"[MARKET] begin failed: {e}")
@@ -379,8 +530,12 @@ def flow_marketplace_handle(session: Dict[str, Any], text: str,
     step = session.get("step", "MARKET_CATEGORY")
     t = normalize(text) if text else ""
     
-    # === SMART FALLBACK : Détection d'intention ===
-    intent_change = detect_intent_change(text, "marketplace")
+    # === SMART FALLBACK : Compréhension du tour (un seul appel IA au plus) ===
+    turn = understand_turn(
+        text or "", step, "marketplace",
+        expected_type="quantity" if step == "MARKET_QUANTITY" and not _is_retour(text) else None
+    )
+    intent_change = turn["intent_change"]
     if intent_change and intent_change != "marketplace":
         logger.info(f"[SMART] Intent change detected: marketplace → {intent_change}")
         
@@ -432,6 +587,10 @@ def flow_marketplace_handle(session: Dict[str, Any], text: str,
             if t in category_name_to_id:
                 t = category_name_to_id[t]
             else:
+                # Saisie libre : produits correspondants, sinon marchands
+                found = search_products(session, text) or (None if t.isdigit() else _search_merchants(session, text))
+                if found:
+                    return found
                 # Vraiment invalide
                 rows = []
                 for k in sorted(categories.keys(), key=lambda x: int(x)):
@@ -444,6 +603,8 @@ def flow_marketplace_handle(session: Dict[str, Any], text: str,
                 return _build_list_response(msg, rows, section_title="Catégories")
 
         category = categories[t]
+        catalog_prefetcher.record_choice("category", category.get("id"))
+        catalog_prefetcher.claim("merchants", "all")
         merchants = _load_merchants_by_category(session, category)
 
         if not merchants:
@@ -474,8 +635,32 @@ def flow_marketplace_handle(session: Dict[str, Any], text: str,
 
         cat_name = category.get("nom") or category.get("name", "Catégorie")
         msg = f"🏪 *Marchands de {cat_name}*"
+        catalog_prefetcher.after_merchants(session, merchants)
         return _build_list_response(msg, rows, section_title="Marchands")
 
+    # ========== RECHERCHE ==========
+    if step == "MARKET_SEARCH":
+        results = session.get("market_search_results", {})
+        if _is_retour(text) or not results:
+            session["step"] = "MARKET_CATEGORY"
+            session.pop("market_search_results", None)
+            return flow_marketplace_handle(session, "")
+
+        if t not in results:
+            by_name = {normalize(hit["product"].get("nom") or ""): k for k, hit in results.items()}
+            if t in by_name:
+                t = by_name[t]
+            else:
+                # Nouvelle saisie libre : on affine la recherche
+                found = search_products(session, text)
+                if found:
+                    return found
+                return _search_results_response(session, "⚠️ Choix invalide.")
+
+        hit = results[t]
+        session["market_merchant"] = hit["merchant"]
+        return _select_product(session, hit["product"])
+
     # ========== MARCHANDS ==========
     if step == "MARKET_MERCHANT":
         if _is_retour(text):
@@ -520,6 +705,8 @@ def flow_marketplace_handle(session: Dict[str, Any], text: str,
 
         merchant = merchants[t]
         session["market_merchant"] = merchant
+        catalog_prefetcher.record_choice("merchant", merchant.get("id"))
+        catalog_prefetcher.claim("products", merchant.get("id"))
         produits = _load_products_by_category(session, merchant.get("id"))
 
         if not produits:
@@ -534,7 +721,6 @@ def flow_marketplace_handle(session: Dict[str, Any], text: str,
             msg = f"❌ Aucun produit."
             return _build_list_response(msg, rows, section_title="Marchands")
 
-        produits = produits[:10]
         session["market_products"] = {str(i + 1): p for i, p in enumerate(produits)}
         session["step"] = "MARKET_PRODUCTS"
 
@@ -604,76 +790,36 @@ def flow_marketplace_handle(session: Dict[str, Any], text: str,
                 msg = "⚠️ Choix invalide."
                 return _build_list_response(msg, rows, section_title="Produits")
 
-        produit = produits[t]
-        session["selected_product"] = produit
-        session.setdefault("new_request", {})
-        session["new_request"]["market_choice"] = produit.get("nom")
-        session["new_request"]["description"] = (produit.get("description") or "").strip()
-        # Convertir le prix en float dès le départ pour éviter les erreurs de multiplication
-        # Le prix peut être "2 500 FCFA" ou "2500" ou 2500
-        prix_raw = produit.get("prix", 0)
-        try:
-            if isinstance(prix_raw, str):
-                # Nettoyer: enlever espaces, "FCFA", etc.
-                prix_clean = prix_raw.replace(" ", "").replace("FCFA", "").replace("fcfa", "").strip()
-                prix_float = float(prix_clean) if prix_clean else 0
-            else:
-                prix_float = float(prix_raw) if prix_raw else 0
-        except (ValueError, TypeError):
-            logger.warning(f"[MARKET] Impossible de convertir prix: {prix_raw}")
-            prix_float = 0
-        
-        session["new_request"]["unit_price"] = prix_float
-        session["step"] = "MARKET_QUANTITY"
-
-        # Si le produit a une image, l'afficher
-        image_url = produit.get("image") or produit.get("photo")
-        resp = build_response(
-            "*📦 QUANTITÉ*\n"
-            "━━━━━━━━━━━━━━━━━━━━\n\n"
-            f"*Produit :* _{produit.get('nom', '—')}_\n"
-            f"*Prix unitaire :* {_fmt_fcfa(produit.get('prix', 0))} FCFA\n\n"
-            "━━━━━━━━━━━━━━━━━━━━\n\n"
-            "🔢 *Combien en voulez-vous ?*\n\n"
-            "_Tapez un nombre_\n"
-            "_Exemple :_ `2`",
-            ["🔙 Retour"]
-        )
-        
-        # Ajouter l'image si disponible
-        if image_url and isinstance(image_url, str) and image_url.startswith("http"):
-            resp["media"] = {
-                "type": "image",
-                "url": image_url,
-                "caption": f"📦 {produit.get('nom', '—')}\n💰 {_fmt_fcfa(produit.get('prix', 0))} FCFA"
-            }
-        
-        return resp
+        session.pop("market_search_results", None)
+        return _select_product(session, produits[t])
 
     # ========== QUANTITÉ ==========
     if step == "MARKET_QUANTITY":
+        if _is_retour(text) and session.get("market_search_results"):
+            session["step"] = "MARKET_SEARCH"
+            return _search_results_response(session, f"🔎 *Résultats pour « {session.get('market_search_query', '')} »*")
         if _is_retour(text):
             session["step"] = "MARKET_PRODUCTS"
             # Réafficher la liste des produits
-            produits = session.get("market_products_list", [])
+            produits = session.get("market_products", {})
             if not produits:
                 return build_response("⚠️ Liste de produits vide.", ["🔙 Retour"])
             
             rows = []
-            for idx, p in enumerate(produits, start=1):
-                title, description = _build_product_title_and_desc(p)
-                rows.append({"id": str(idx), "title": title, "description": description})
+            for k in sorted(produits.keys(), key=lambda x: int(x)):
+                p = produits[k]
+                title, description = _build_product_title_and_desc(p.get("nom", "—"), p.get("prix", 0), p.get("description", ""))
+                rows.append({"id": k, "title": title, "description": description})
             
             resp = build_response("📦 *Produits de " + _merchant_display_name(session.get("market_merchant", {})) + "*")
-            resp["list"] = {"rows": rows[:10], "button": "Voir produits", "title": "Produits"}
+            resp["list"] = {"rows": rows, "button": "Voir produits", "title": "Produits"}
             return resp
         
         # === SMART FALLBACK : Validation intelligente de la quantité ===
-        is_valid, qty, error_msg = smart_validate(text, "quantity", step)
+        is_valid, qty = turn["is_valid"], turn["value"]
         
         if not is_valid:
-            error = generate_smart_error_message(text, "quantity", step)
-            return build_response(error, ["🔙 Retour"])
+            return build_response(turn["error_message"], ["🔙 Retour"])
         
         # CONVERSION CRITIQUE : qty peut être une string ("5"), il faut la convertir en int
         try:
@@ -802,16 +948,15 @@ def flow_marketplace_handle(session: Dict[str, Any], text: str,
             resp["ask_location"] = True
             return resp
 
-        # FIX #3: Utiliser PAYMENT_METHODS avec normalize()
-        key = normalize(text)
-        if key not in PAYMENT_METHODS:
+        # FIX #3: Modes de paiement reconnus par le lexique (variantes, accents, émojis)
+        payment_method = lexicon.exact(text, "payment")
+        if not payment_method:
             return build_response(
                 "⚠️ *Choix invalide*\n\n"
                 "_Veuillez sélectionner un mode de paiement :_",
                 ["💵 Espèces", "📱 Mobile Money", "🏦 Virement", "🔙 Retour"]
             )
 
-        payment_method = PAYMENT_METHODS[key]
         session.setdefault("new_request", {})["payment_method"] = payment_method
         session["step"] = "MARKET_CONFIRM"
 
@@ -835,7 +980,7 @@ def flow_marketplace_handle(session: Dict[str, Any], text: str,
         except (ValueError, TypeError):
             total_price = 0
 
-        # FIX #3: Utiliser PAYMENT_METHODS pour afficher le label correct
+        # FIX #3: Label affiché selon la valeur canonique
         payment_label = "Espèces" if payment_method == "espèces" else \
             "Mobile Money" if payment_method == "mobile_money" else \
                 "Virement"
@@ -873,13 +1018,14 @@ def flow_marketplace_handle(session: Dict[str, Any], text: str,
 
         # FIX #4: Vérifier la confirmation EN PREMIER avec tous les variants
         t_lower = normalize(text)
+        answer = lexicon.exact(text, "answer")
 
         # Confirmer l'ordre
-        if t_lower in {"confirmer", "oui", "valider", "ok", "yes", "1"}:
+        if answer == "confirmer" or t_lower == "1":
             return marketplace_create_order(session)
 
         # Modifier
-        if t_lower in {"modifier", "editer", "change", "changer", "2"}:
+        if answer == "modifier" or t_lower == "2":
             session["step"] = "MARKET_PAY"
             return build_response(
                 "*💳 MODE DE PAIEMENT*\n"
@@ -889,7 +1035,7 @@ def flow_marketplace_handle(session: Dict[str, Any], text: str,
             )
 
         # Annuler
-        if t_lower in {"annuler", "non", "cancel", "no", "3"}:
+        if answer == "annuler" or t_lower == "3":
             _cleanup_marketplace_session(session)
             session["step"] = "MENU"
             return build_response("✅ Commande annulée.", MAIN_MENU_BTNS)
@@ -0,0 +1,252 @@
+# chatbot/eta_model.py
+"""
+Modèle d'ETA appris sur l'historique TrackingGPS
+Tables de vitesse par heure de la journée et par zone (cellule de grille),
+construites hors ligne (manage.py build_eta_tables) et consultées en mémoire
+"""
+import os
+import json
+import math
+import time
+import logging
+from collections import defaultdict
+from typing import Dict, Any, Optional, Tuple, List, Iterable
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+# Configuration
+ETA_TABLES_PATH = os.getenv(
+    "TOKTOK_ETA_TABLES_PATH",
+    os.path.join(os.path.dirname(__file__), "data", "eta_tables.json")
+)
+UTC_OFFSET_HOURS = int(os.getenv("TOKTOK_UTC_OFFSET_HOURS", "1"))  # Brazzaville : UTC+1 (WAT)
+DEFAULT_SPEED_KMH = 25.0  # Repli quand aucune table n'est disponible
+DEFAULT_DETOUR_FACTOR = 1.0
+
+ETA_CELL_KM = 2.0
+KM_PER_DEG_LAT = 111.32
+REF_LAT = -4.27
+
+# Filtres de nettoyage des traces GPS
+MIN_SEGMENT_SEC, MAX_SEGMENT_SEC = 5, 600
+MIN_SPEED_KMH, MAX_SPEED_KMH = 0.5, 90.0
+MIN_TRIP_SEC, MAX_TRIP_SEC = 60, 4 * 3600
+MIN_TRIP_KM = 0.3
+MIN_BUCKET_SECONDS = 600  # Temps cumulé minimal pour qu'une case de table soit fiable
+
+
+def _haversine_km(lat1: float, lon1: float, lat2: float, lon2: float) -> float:
+    lat1, lon1, lat2, lon2 = map(math.radians, (lat1, lon1, lat2, lon2))
+    a = math.sin((lat2 - lat1) / 2) ** 2 + math.cos(lat1) * math.cos(lat2) * math.sin((lon2 - lon1) / 2) ** 2
+    return 2 * 6371 * math.asin(math.sqrt(min(1.0, a)))
+
+
+def local_hour(ts: Optional[float] = None) -> int:
+    """Heure locale (0-23) d'un horodatage epoch"""
+    ts = time.time() if ts is None else ts
+    return (time.gmtime(ts).tm_hour + UTC_OFFSET_HOURS) % 24
+
+
+class ETAModel:
+    """Lookup en mémoire : (cellule, heure) → vitesse moyenne"""
+
+    def __init__(self, tables: Optional[Dict[str, Any]] = None):
+        tables = tables or {}
+        self.version = tables.get("version", "default")
+        self.cell_km = tables.get("cell_km", ETA_CELL_KM)
+        self.dlat = self.cell_km / KM_PER_DEG_LAT
+        self.dlon = self.cell_km / (KM_PER_DEG_LAT * math.cos(math.radians(tables.get("ref_lat", REF_LAT))))
+        self.global_speed = tables.get("global_speed_kmh", DEFAULT_SPEED_KMH)
+        self.detour = tables.get("detour_factor", DEFAULT_DETOUR_FACTOR)
+        self.hourly: List[float] = [self.global_speed] * 24
+        for h, v in (tables.get("hourly") or {}).items():
+            self.hourly[int(h)] = v
+        # (i, j) → liste de 24 vitesses (None = repli sur la moyenne horaire)
+        self.cells: Dict[Tuple[int, int], List[Optional[float]]] = {}
+        for key, by_hour in (tables.get("cells") or {}).items():
+            i, j = map(int, key.split(","))
+            row: List[Optional[float]] = [None] * 24
+            for h, v in by_hour.items():
+                row[int(h)] = v
+            self.cells[(i, j)] = row
+
+    @classmethod
+    def load(cls, path: str = ETA_TABLES_PATH) -> "ETAModel":
+        """Charge les tables construites hors ligne (modèle par défaut si absentes)"""
+        if not os.path.exists(path):
+            logger.info(f"[ETA] Pas de tables ({path}), vitesse fixe {DEFAULT_SPEED_KMH} km/h")
+            return cls()
+        try:
+            with open(path, encoding="utf-8") as f:
+                model = cls(json.load(f))
+            logger.info(f"[ETA] Tables {model.version} chargées ({len(model.cells)} zones)")
+            return model
+        except Exception as e:
+            logger.error(f"[ETA] Chargement impossible ({path}): {e}")
+            return cls()
+
+    def cell(self, lat: float, lon: float) -> Tuple[int, int]:
+        return (math.floor(lat / self.dlat), math.floor(lon / self.dlon))
+
+    def speed_at(self, lat: float, lon: float, hour: int) -> float:
+        """Vitesse attendue (km/h) dans la zone à cette heure"""
+        row = self.cells.get(self.cell(lat, lon))
+        if row is not None and row[hour] is not None:
+            return row[hour]
+        return self.hourly[hour]
+
+    def predict_minutes(self, lat1: float, lon1: float, lat2: float, lon2: float,
+                        hour: Optional[int] = None, distance_km: Optional[float] = None) -> float:
+        """
+        Durée de trajet estimée en minutes
+
+        Args:
+            lat1, lon1: Point de départ
+            lat2, lon2: Point d'arrivée
+            hour: Heure locale du départ (maintenant par défaut)
+            distance_km: Distance à vol d'oiseau si déjà calculée
+        """
+        hour = local_hour() if hour is None else hour
+        if distance_km is None:
+            distance_km = _haversine_km(lat1, lon1, lat2, lon2)
+        # Moyenne harmonique des vitesses des zones de départ et d'arrivée
+        v1 = self.speed_at(lat1, lon1, hour)
+        v2 = self.speed_at(lat2, lon2, hour)
+        speed = 2 * v1 * v2 / (v1 + v2)
+        return distance_km * self.detour / speed * 60
+
+
+def _clean_segments(track: List[Tuple[float, float, float]]):
+    """Segments (t0, lat_mid, lon_mid, km, secondes) plausibles d'une trace triée"""
+    for (t0, la0, lo0), (t1, la1, lo1) in zip(track, track[1:]):
+        dt = t1 - t0
+        if not MIN_SEGMENT_SEC <= dt <= MAX_SEGMENT_SEC:
+            continue
+        km = _haversine_km(la0, lo0, la1, lo1)
+        if not MIN_SPEED_KMH <= km / dt * 3600 <= MAX_SPEED_KMH:
+            continue
+        yield t0, (la0 + la1) / 2, (lo0 + lo1) / 2, km, dt
+
+
+def trip_summary(track: List[Tuple[float, float, float]]) -> Optional[Dict[str, Any]]:
+    """
+    Résumé d'une livraison : départ, arrivée, durée réelle, distance parcourue
+
+    Args:
+        track: Points (epoch, lat, lon) triés par horodatage
+    """
+    if len(track) < 2:
+        return None
+    t0, la0, lo0 = track[0]
+    t1, la1, lo1 = track[-1]
+    duration = t1 - t0
+    straight = _haversine_km(la0, lo0, la1, lo1)
+    if not MIN_TRIP_SEC <= duration <= MAX_TRIP_SEC or straight < MIN_TRIP_KM:
+        return None
+    path = sum(_haversine_km(a[1], a[2], b[1], b[2]) for a, b in zip(track, track[1:]))
+    return {
+        "start": (la0, lo0), "end": (la1, lo1), "start_ts": t0,
+        "duration_min": duration / 60, "straight_km": straight, "path_km": path,
+    }
+
+
+def build_tables(tracks: Iterable[List[Tuple[float, float, float]]],
+                 cell_km: float = ETA_CELL_KM,
+                 min_bucket_seconds: float = MIN_BUCKET_SECONDS) -> Dict[str, Any]:
+    """
+    Construit les tables de vitesse à partir de traces GPS
+
+    Args:
+        tracks: Une trace par livraison, points (epoch, lat, lon) triés
+        cell_km: Taille des zones en kilomètres
+        min_bucket_seconds: Temps cumulé minimal par case (sinon repli)
+
+    Returns:
+        Tables sérialisables en JSON (chargées par ETAModel)
+    """
+    grid = ETAModel({"cell_km": cell_km})
+    cell_acc = defaultdict(lambda: [0.0, 0.0])  # (cellule, heure) → [km, secondes]
+    hour_acc = defaultdict(lambda: [0.0, 0.0])
+    total = [0.0, 0.0]
+    detours = []
+    n_trips = 0
+
+    for track in tracks:
+        for t0, lat, lon, km, dt in _clean_segments(track):
+            h = local_hour(t0)
+            for acc in (cell_acc[(grid.cell(lat, lon), h)], hour_acc[h], total):
+                acc[0] += km
+                acc[1] += dt
+        trip = trip_summary(track)
+        if trip:
+            n_trips += 1
+            detours.append(trip["path_km"] / trip["straight_km"])
+
+    def speed(acc):
+        return round(acc[0] / acc[1] * 3600, 2)
+
+    global_speed = speed(total) if total[1] >= min_bucket_seconds else DEFAULT_SPEED_KMH
+    cells: Dict[str, Dict[str, float]] = defaultdict(dict)
+    for ((i, j), h), acc in cell_acc.items():
+        if acc[1] >= min_bucket_seconds:
+            cells[f"{i},{j}"][str(h)] = speed(acc)
+
+    return {
+        "version": time.strftime("%Y%m%d%H%M%S", time.gmtime()),
+        "built_at": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime()),
+        "cell_km": cell_km,
+        "ref_lat": REF_LAT,
+        "utc_offset_hours": UTC_OFFSET_HOURS,
+        "trips": n_trips,
+        "global_speed_kmh": global_speed,
+        "detour_factor": round(float(np.clip(np.median(detours), 1.0, 3.0)), 3) if detours else DEFAULT_DETOUR_FACTOR,
+        "hourly": {str(h): speed(acc) for h, acc in sorted(hour_acc.items()) if acc[1] >= min_bucket_seconds},
+        "cells": dict(cells),
+    }
+
+
+def evaluate(model: ETAModel, tracks: Iterable[List[Tuple[float, float, float]]]) -> Dict[str, Any]:
+    """
+    Compare durées prédites et réelles (et la vitesse fixe historique)
+
+    Returns:
+        Rapport : nombre de trajets, MAE, MAPE, médiane/p90 de l'erreur absolue, biais
+    """
+    actual, predicted, baseline = [], [], []
+    for track in tracks:
+        trip = trip_summary(track)
+        if not trip:
+            continue
+        (la0, lo0), (la1, lo1) = trip["start"], trip["end"]
+        actual.append(trip["duration_min"])
+        predicted.append(model.predict_minutes(la0, lo0, la1, lo1, hour=local_hour(trip["start_ts"]),
+                                               distance_km=trip["straight_km"]))
+        baseline.append(trip["straight_km"] / DEFAULT_SPEED_KMH * 60)
+
+    if not actual:
+        return {"trips": 0}
+
+    y = np.array(actual)
+
+    def metrics(pred):
+        err = np.array(pred) - y
+        abs_err = np.abs(err)
+        return {
+            "mae_min": round(float(abs_err.mean()), 2),
+            "mape_pct": round(float((abs_err / y).mean() * 100), 1),
+            "median_abs_err_min": round(float(np.median(abs_err)), 2),
+            "p90_abs_err_min": round(float(np.percentile(abs_err, 90)), 2),
+            "bias_min": round(float(err.mean()), 2),
+        }
+
+    return {
+        "trips": len(actual),
+        "model": metrics(predicted),
+        "baseline_25kmh": metrics(baseline),
+    }
+
+
+# Instance globale
+eta_model = ETAModel.load()
@@ -0,0 +1,244 @@
+# chatbot/fake_llm_server.py
+"""
+Faux serveur chat completions (format OpenAI) pour les tests de charge et la CI
+Réponses scénarisées (JSONL) ou déduites par règles (lexique, extracteurs),
+latence log-normale, taux d'erreurs et de blocages configurables. Le client
+s'y branche via OPENAI_BASE_URL / OPENROUTER_BASE_URL
+
+Usage : python -m chatbot.fake_llm_server [--port 8765] [--latency-ms 400] [--error-rate 0.02]
+        OPENAI_API_KEY=fake OPENAI_BASE_URL=http://127.0.0.1:8765/v1 python ...
+"""
+import re
+import json
+import time
+import random
+import logging
+import argparse
+import threading
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+from typing import Dict, Any, Optional, List
+
+from .lexicon import lexicon
+from .rule_extractors import rule_validate
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_PORT = 8765
+
+# Indices du type attendu dans le prompt (questions de validation de smart_fallback)
+TYPE_HINTS = [
+    ("phone", ("téléphone", "numéro")),
+    ("amount", ("montant", "fcfa")),
+    ("quantity", ("quantité",)),
+    ("reference", ("référence",)),
+]
+_INPUT_RE = re.compile(r"^\s*Input(?: utilisateur)?\s*:\s*(.+)$", re.IGNORECASE | re.MULTILINE)
+
+
+class FakeLLMConfig:
+    """Comportement du serveur : latence, erreurs, scénario"""
+
+    def __init__(self, latency_ms: float = 400.0, sigma: float = 0.4, error_rate: float = 0.0,
+                 hang_rate: float = 0.0, hang_ms: float = 30000.0, script: Optional[List[Dict[str, Any]]] = None,
+                 seed: Optional[int] = None):
+        self.latency_ms = latency_ms  # Médiane
+        self.sigma = sigma            # Dispersion log-normale (0 = latence fixe)
+        self.error_rate = error_rate  # Réponses 500 / 429
+        self.hang_rate = hang_rate    # Réponses très lentes (queue de latence, timeouts)
+        self.hang_ms = hang_ms
+        self.script = script or []
+        self._rng = random.Random(seed)
+        self._lock = threading.Lock()
+        self.stats = {"requests": 0, "errors": 0, "hangs": 0, "scripted": 0}
+
+    def draw(self) -> Dict[str, Any]:
+        """Tire le sort d'une requête : erreur, blocage, latence"""
+        with self._lock:
+            roll = self._rng.random()
+            latency = self.latency_ms * (self._rng.lognormvariate(0, self.sigma) if self.sigma else 1)
+            status = 429 if self._rng.random() < 0.5 else 500
+        if roll < self.error_rate:
+            return {"error": status, "latency_ms": latency / 4}
+        if roll < self.error_rate + self.hang_rate:
+            return {"latency_ms": self.hang_ms, "hang": True}
+        return {"latency_ms": latency}
+
+    def count(self, key: str):
+        with self._lock:
+            self.stats[key] += 1
+
+
+def load_script(path: str) -> List[Dict[str, Any]]:
+    """Scénario JSONL : {"match": "regex sur l'input", "response": {...} ou "texte"}"""
+    rules = []
+    with open(path, encoding="utf-8") as f:
+        for line in f:
+            line = line.strip()
+            if not line:
+                continue
+            row = json.loads(line)
+            rules.append({"match": re.compile(row.get("match", ".*"), re.IGNORECASE), "response": row["response"]})
+    return rules
+
+
+def _user_input(messages: List[Dict[str, Any]]) -> str:
+    """Saisie utilisateur : ligne "Input utilisateur: ..." sinon dernier message user"""
+    user = next((m.get("content") or "" for m in reversed(messages) if m.get("role") == "user"), "")
+    found = _INPUT_RE.findall(user)
+    return found[-1].strip() if found else user.strip()
+
+
+def rule_based_reply(messages: List[Dict[str, Any]], json_mode: bool) -> str:
+    """
+    Réponse plausible sans modèle : intention par le lexique, validation par
+    les extracteurs à règles ; couvre les schémas JSON de smart_fallback
+    """
+    text = _user_input(messages)
+    if not json_mode:
+        return "👉 Choisissez une option : Nouvelle demande, Suivre ma demande ou Marketplace."
+    prompt = " ".join(m.get("content") or "" for m in messages).lower()
+    intents = lexicon.analyze(text).values("intent")
+    intent = intents[0] if intents else None
+
+    expected = next((t for t, hints in TYPE_HINTS if any(h in prompt for h in hints)), None)
+    rule = rule_validate(text, expected) if expected else None
+    is_valid = rule["is_valid"] if rule else bool(text)
+    value = (rule["value"] if rule else text) if is_valid else None
+    error = "" if is_valid else "Format invalide, par exemple : 06 123 45 67"
+    validation = {"is_valid": is_valid, "extracted_value": value, "error_message": error or None}
+    return json.dumps({
+        "intent_change": intent,
+        "intent": {"coursier": "courier"}.get(intent, intent) or "courier",
+        **validation,
+        "validation": validation,
+        "extraction": {"extracted_value": value, "confidence": 0.8 if is_valid else 0.2, "extracted_fields": {}},
+        "confidence": 0.8 if is_valid else 0.2,
+        "extracted_fields": {},
+        "reasoning": "règles locales",
+    }, ensure_ascii=False)
+
+
+def _completion(model: str, content: str, messages: List[Dict[str, Any]]) -> Dict[str, Any]:
+    prompt_tokens = sum(len(m.get("content") or "") for m in messages) // 4 + 1
+    completion_tokens = len(content) // 4 + 1
+    return {
+        "id": f"chatcmpl-fake-{int(time.time() * 1000)}",
+        "object": "chat.completion",
+        "created": int(time.time()),
+        "model": model,
+        "choices": [{"index": 0, "message": {"role": "assistant", "content": content}, "finish_reason": "stop"}],
+        "usage": {
+            "prompt_tokens": prompt_tokens,
+            "completion_tokens": completion_tokens,
+            "total_tokens": prompt_tokens + completion_tokens,
+            "prompt_tokens_details": {"cached_tokens": 0},
+        },
+    }
+
+
+def make_handler(config: FakeLLMConfig):
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+
+        def log_message(self, fmt, *args):
+            logger.debug(f"[FAKE_LLM] {fmt % args}")
+
+        def _send(self, status: int, payload: Dict[str, Any], headers: Optional[Dict[str, str]] = None):
+            body = json.dumps(payload, ensure_ascii=False).encode()
+            self.send_response(status)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(body)))
+            for key, value in (headers or {}).items():
+                self.send_header(key, value)
+            self.end_headers()
+            try:
+                self.wfile.write(body)
+            except (BrokenPipeError, ConnectionResetError):
+                pass  # Client parti (timeout, requête de couverture gagnante)
+
+        def do_GET(self):
+            if self.path.rstrip("/").endswith("/stats"):
+                return self._send(200, config.stats)
+            self._send(404, {"error": {"message": "not found"}})
+
+        def do_POST(self):
+            if not self.path.rstrip("/").endswith("/chat/completions"):
+                return self._send(404, {"error": {"message": "not found"}})
+            length = int(self.headers.get("Content-Length") or 0)
+            try:
+                request = json.loads(self.rfile.read(length) or b"{}")
+            except ValueError:
+                return self._send(400, {"error": {"message": "invalid JSON", "type": "invalid_request_error"}})
+            config.count("requests")
+            fate = config.draw()
+            time.sleep(fate["latency_ms"] / 1000)
+            if fate.get("hang"):
+                config.count("hangs")
+            if fate.get("error"):
+                config.count("errors")
+                return self._send(fate["error"], {"error": {"message": "simulated failure", "type": "server_error"}},
+                                  {"Retry-After": "1"} if fate["error"] == 429 else None)
+
+            messages = request.get("messages") or []
+            json_mode = (request.get("response_format") or {}).get("type") == "json_object"
+            text = _user_input(messages)
+            content = None
+            for rule in config.script:
+                if rule["match"].search(text):
+                    config.count("scripted")
+                    response = rule["response"]
+                    content = response if isinstance(response, str) else json.dumps(response, ensure_ascii=False)
+                    break
+            if content is None:
+                content = rule_based_reply(messages, json_mode)
+            self._send(200, _completion(request.get("model", "fake"), content, messages))
+
+    return Handler
+
+
+def serve(port: int = DEFAULT_PORT, config: Optional[FakeLLMConfig] = None,
+          host: str = "127.0.0.1", background: bool = False) -> ThreadingHTTPServer:
+    """
+    Démarre le serveur
+
+    Args:
+        port: Port d'écoute (0 = port libre, lire server.server_address)
+        config: Latence, erreurs, scénario
+        background: True = thread démon (tests, benchmarks), False = bloquant
+
+    Returns:
+        Le serveur (server.shutdown() pour l'arrêter)
+    """
+    server = ThreadingHTTPServer((host, port), make_handler(config or FakeLLMConfig()))
+    server.daemon_threads = True
+    logger.info(f"[FAKE_LLM] http://{host}:{server.server_address[1]}/v1")
+    if background:
+        threading.Thread(target=server.serve_forever, name="fake-llm", daemon=True).start()
+    else:
+        server.serve_forever()
+    return server
+
+
+def main(argv: Optional[List[str]] = None):
+    parser = argparse.ArgumentParser(description="Faux serveur OpenAI chat completions")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=DEFAULT_PORT)
+    parser.add_argument("--latency-ms", type=float, default=400.0, help="Latence médiane")
+    parser.add_argument("--sigma", type=float, default=0.4, help="Dispersion log-normale (0 = fixe)")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="Part de réponses 500 / 429")
+    parser.add_argument("--hang-rate", type=float, default=0.0, help="Part de réponses bloquées")
+    parser.add_argument("--hang-ms", type=float, default=30000.0)
+    parser.add_argument("--script", default=None, help="Réponses scénarisées (JSONL)")
+    parser.add_argument("--seed", type=int, default=None)
+    args = parser.parse_args(argv)
+    logging.basicConfig(level=logging.INFO)
+    config = FakeLLMConfig(args.latency_ms, args.sigma, args.error_rate, args.hang_rate, args.hang_ms,
+                           load_script(args.script) if args.script else None, args.seed)
+    try:
+        serve(args.port, config, host=args.host)
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,195 @@
+# chatbot/gazetteer.py
+"""
+Gazetteer local Brazzaville / Pointe-Noire
+Résout quartiers, arrondissements et lieux connus sans appel réseau
+(index exact + trigrammes, insensible aux accents)
+"""
+import os
+import re
+import json
+import logging
+import unicodedata
+from collections import defaultdict
+from typing import Optional, Tuple, Dict, Any, List
+
+logger = logging.getLogger(__name__)
+
+# Configuration
+GAZETTEER_PATH = os.getenv(
+    "TOKTOK_GAZETTEER_PATH",
+    os.path.join(os.path.dirname(__file__), "data", "gazetteer.json")
+)
+FUZZY_THRESHOLD = float(os.getenv("TOKTOK_GAZETTEER_FUZZY_THRESHOLD", "0.72"))
+
+# Plus le type est précis, plus il est prioritaire
+TYPE_PRIORITY = {"landmark": 3, "quartier": 2, "arrondissement": 1}
+
+# Mots qui, seuls, ne désignent jamais un lieu
+STOPWORDS = {
+    "a", "au", "aux", "de", "du", "des", "la", "le", "les", "l", "d", "en", "et",
+    "rue", "avenue", "av", "bd", "boulevard", "chez", "pres", "vers", "cote",
+    "quartier", "qtier", "arrondissement", "ville", "congo", "n", "no", "numero",
+}
+
+MIN_FUZZY_LEN = 4  # En dessous, seule la correspondance exacte est acceptée
+
+
+def fold(text: str) -> str:
+    """
+    Normalise un texte pour la recherche : minuscules, sans accents,
+    ponctuation et tirets remplacés par des espaces
+    """
+    if not text:
+        return ""
+    text = text.lower()
+    if not text.isascii():
+        text = unicodedata.normalize("NFD", text)
+        text = "".join(ch for ch in text if unicodedata.category(ch) != "Mn")
+    text = re.sub(r"[^a-z0-9]+", " ", text)
+    return " ".join(text.split())
+
+
+def _trigrams(text: str) -> set:
+    padded = f"  {text} "
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+
+class Gazetteer:
+    """Index en mémoire des lieux connus, chargé une seule fois"""
+
+    def __init__(self, entries: List[Dict[str, Any]]):
+        self.entries: List[Dict[str, Any]] = []
+        self.cities: Dict[str, str] = {}  # alias → nom de ville
+        self._exact: Dict[str, List[int]] = defaultdict(list)  # alias → entrées
+        self._aliases: List[Tuple[str, int, int]] = []  # (alias, entrée, nb trigrammes)
+        self._trigram_index: Dict[str, List[int]] = defaultdict(list)  # trigramme → alias
+        self._max_tokens = 1
+
+        for entry in entries:
+            aliases = {fold(a) for a in entry.get("aliases", [])} | {fold(entry["name"])}
+            aliases.discard("")
+
+            if entry.get("type") == "ville":
+                for alias in aliases:
+                    self.cities[alias] = entry["name"]
+                continue
+
+            idx = len(self.entries)
+            self.entries.append(entry)
+            for alias in aliases:
+                self._exact[alias].append(idx)
+                self._max_tokens = max(self._max_tokens, len(alias.split()))
+                if len(alias.replace(" ", "")) < MIN_FUZZY_LEN:
+                    continue
+                grams = _trigrams(alias)
+                alias_id = len(self._aliases)
+                self._aliases.append((alias, idx, len(grams)))
+                for g in grams:
+                    self._trigram_index[g].append(alias_id)
+
+        logger.info(f"[GAZETTEER] {len(self.entries)} lieux indexés ({len(self._aliases)} alias)")
+
+    @classmethod
+    def load(cls, path: str = GAZETTEER_PATH) -> "Gazetteer":
+        """Charge le gazetteer depuis le fichier JSON embarqué"""
+        try:
+            with open(path, encoding="utf-8") as f:
+                data = json.load(f)
+            return cls(data.get("entries", []))
+        except Exception as e:
+            logger.error(f"[GAZETTEER] Chargement impossible ({path}): {e}")
+            return cls([])
+
+    def _detect_city(self, tokens: List[str]) -> Tuple[Optional[str], set]:
+        """Première ville mentionnée et positions de tous les mots de ville de l'adresse"""
+        city, positions = None, set()
+        for n in (2, 1):
+            for i in range(len(tokens) - n + 1):
+                span = range(i, i + n)
+                if positions.intersection(span):
+                    continue
+                name = self.cities.get(" ".join(tokens[i:i + n]))
+                if name:
+                    city = city or name
+                    positions.update(span)
+        return city, positions
+
+    def _rank(self, idx: int, n_tokens: int, score: float, city: Optional[str]) -> tuple:
+        entry = self.entries[idx]
+        same_city = 1 if not city or fold(entry.get("city", "")) == fold(city) else 0
+        return (same_city, score, n_tokens, TYPE_PRIORITY.get(entry.get("type"), 0))
+
+    def lookup(self, address: str, city: Optional[str] = None) -> Optional[Dict[str, Any]]:
+        """
+        Cherche le lieu le plus précis mentionné dans une adresse
+
+        Args:
+            address: Adresse libre (ex: "25 Rue Malanda, Poto-Poto")
+            city: Ville par défaut si l'adresse n'en mentionne aucune
+
+        Returns:
+            Entrée du gazetteer (name, type, city, lat, lon) ou None ; avec une
+            ville (détectée ou par défaut), seuls ses lieux sont renvoyés
+        """
+        tokens = fold(address).split()
+        if not tokens:
+            return None
+        detected, city_positions = self._detect_city(tokens)
+        city = detected or city
+
+        # Les mots de ville ne désignent jamais un lieu à eux seuls ("Pointe-Noire"
+        # ne doit pas tomber sur "Port de Pointe-Noire") : une fenêtre doit contenir
+        # un autre mot significatif, et l'approché ne voit jamais la ville
+        windows = []
+        for n in range(min(self._max_tokens, len(tokens)), 0, -1):
+            for i in range(len(tokens) - n + 1):
+                window = tokens[i:i + n]
+                if all(t in STOPWORDS or t.isdigit() or i + k in city_positions
+                       for k, t in enumerate(window)):
+                    continue
+                has_city = bool(city_positions.intersection(range(i, i + n)))
+                windows.append((" ".join(window), n, has_city))
+
+        # 1. Correspondance exacte sur les n-grammes de mots
+        best, best_rank = None, None
+        for text, n, _ in windows:
+            for idx in self._exact.get(text, ()):
+                rank = self._rank(idx, n, 1.0, city)
+                if best_rank is None or rank > best_rank:
+                    best, best_rank = idx, rank
+        if best is not None and best_rank[0]:
+            return self.entries[best]
+
+        # 2. Correspondance approchée (coefficient de Dice sur trigrammes)
+        for text, n, has_city in windows:
+            if has_city or len(text.replace(" ", "")) < MIN_FUZZY_LEN:
+                continue
+            grams = _trigrams(text)
+            shared: Dict[int, int] = defaultdict(int)
+            for g in grams:
+                for alias_id in self._trigram_index.get(g, ()):
+                    shared[alias_id] += 1
+            for alias_id, count in shared.items():
+                alias, idx, size = self._aliases[alias_id]
+                score = 2 * count / (len(grams) + size)
+                if score < FUZZY_THRESHOLD:
+                    continue
+                rank = self._rank(idx, n, score, city)
+                if best_rank is None or rank > best_rank:
+                    best, best_rank = idx, rank
+
+        # Jamais de lieu d'une autre ville (≈ 400 km d'écart) : Nominatim prend le relais
+        if best is None or not best_rank[0]:
+            return None
+        return self.entries[best]
+
+    def geocode(self, address: str, city: Optional[str] = None) -> Optional[Tuple[float, float]]:
+        """Retourne (latitude, longitude) du lieu reconnu ou None"""
+        entry = self.lookup(address, city)
+        if not entry:
+            return None
+        return (float(entry["lat"]), float(entry["lon"]))
+
+
+# Instance globale
+gazetteer = Gazetteer.load()
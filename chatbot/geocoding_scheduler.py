@@ -0,0 +1,203 @@
+# chatbot/geocoding_scheduler.py
+"""
+Ordonnanceur des requêtes Nominatim
+Respecte la politique d'usage (1 requête/s) pour tous les workers,
+déduplique les requêtes identiques et sert les appels interactifs en priorité
+"""
+import os
+import time
+import heapq
+import logging
+import tempfile
+import threading
+from collections import deque
+from concurrent.futures import Future
+from typing import Callable, Optional, Any, Dict
+
+try:
+    from filelock import FileLock
+except ImportError:  # Verrou limité au process courant
+    FileLock = None
+
+logger = logging.getLogger(__name__)
+
+PRIORITY_INTERACTIVE = 0
+PRIORITY_BACKGROUND = 10
+
+# Attente maximale tolérée dans la file avant rejet (secondes)
+MAX_WAIT_BY_PRIORITY = {
+    PRIORITY_INTERACTIVE: float(os.getenv("NOMINATIM_MAX_WAIT_INTERACTIVE", "4")),
+    PRIORITY_BACKGROUND: float(os.getenv("NOMINATIM_MAX_WAIT_BACKGROUND", "60")),
+}
+
+
+class GlobalRateGate:
+    """
+    Espacement minimal entre deux requêtes, partagé entre process via un
+    fichier horodaté protégé par un verrou (gunicorn lance plusieurs workers)
+    """
+
+    def __init__(self, name: str, min_interval: float):
+        self.min_interval = min_interval
+        base = os.path.join(tempfile.gettempdir(), f"toktok_{name}")
+        self.stamp_path = f"{base}.stamp"
+        self._local_lock = threading.Lock()
+        self._file_lock = FileLock(f"{base}.lock") if FileLock else None
+        self._last_local = 0.0
+
+    def _read_last(self) -> float:
+        try:
+            with open(self.stamp_path) as f:
+                return float(f.read().strip() or 0)
+        except (OSError, ValueError):
+            return self._last_local
+
+    def _write_last(self, ts: float):
+        self._last_local = ts
+        try:
+            with open(self.stamp_path, "w") as f:
+                f.write(repr(ts))
+        except OSError as e:
+            logger.debug(f"[GEO_SCHED] Stamp non écrit: {e}")
+
+    def wait_turn(self):
+        """Bloque jusqu'à ce qu'une requête soit autorisée, puis la réserve"""
+        with self._local_lock:
+            if self._file_lock is not None:
+                with self._file_lock:
+                    self._reserve()
+            else:
+                self._reserve()
+
+    def _reserve(self):
+        delay = self._read_last() + self.min_interval - time.time()
+        if delay > 0:
+            time.sleep(delay)
+        self._write_last(time.time())
+
+
+class GeocodingScheduler:
+    """File de requêtes de géocodage avec priorité, déduplication et débit global"""
+
+    def __init__(self, fetch: Callable[[str], Any], min_interval: float = 1.0,
+                 max_queue: int = 50, name: str = "nominatim"):
+        """
+        Args:
+            fetch: Fonction exécutant réellement la requête (query → résultat)
+            min_interval: Intervalle minimal entre deux requêtes (secondes)
+            max_queue: Taille maximale de la file d'attente
+        """
+        self.fetch = fetch
+        self.max_queue = max_queue
+        self.gate = GlobalRateGate(name, min_interval)
+
+        self._heap: list = []
+        self._inflight: Dict[str, Future] = {}
+        self._queued: Dict[str, tuple] = {}  # query → entrée valide du tas (les autres sont périmées)
+        self._running = False
+        self._cond = threading.Condition()
+        self._seq = 0
+        self._worker: Optional[threading.Thread] = None
+
+        self._waits = deque(maxlen=500)
+        self.stats = {"submitted": 0, "deduplicated": 0, "rejected": 0, "executed": 0, "errors": 0,
+                      "promoted": 0}
+
+    def _ensure_worker(self):
+        if self._worker is None or not self._worker.is_alive():
+            self._worker = threading.Thread(target=self._run, name="geocoding-scheduler", daemon=True)
+            self._worker.start()
+
+    def _estimated_wait(self, priority: int) -> float:
+        ahead = sum(1 for p, *_ in self._queued.values() if p <= priority) + (1 if self._running else 0)
+        return (ahead + 1) * self.gate.min_interval
+
+    def _push(self, priority: int, queued_at: float, query: str, future: Future):
+        """Sous verrou : (re)place la requête dans le tas, l'ancienne entrée devient périmée"""
+        self._seq += 1
+        entry = (priority, self._seq, queued_at, query, future)
+        heapq.heappush(self._heap, entry)
+        self._queued[query] = entry
+
+    def submit(self, query: str, priority: int = PRIORITY_INTERACTIVE) -> Optional[Future]:
+        """
+        Place une requête dans la file
+
+        Returns:
+            Future du résultat, ou None si la requête est rejetée (file saturée)
+        """
+        with self._cond:
+            self.stats["submitted"] += 1
+
+            existing = self._inflight.get(query)
+            if existing is not None:
+                self.stats["deduplicated"] += 1
+                queued = self._queued.get(query)
+                if queued is not None and priority < queued[0]:
+                    # Un utilisateur attend une requête déjà en file en arrière-plan : elle passe devant
+                    self._push(priority, queued[2], query, existing)
+                    self.stats["promoted"] += 1
+                return existing
+
+            max_wait = MAX_WAIT_BY_PRIORITY.get(priority, MAX_WAIT_BY_PRIORITY[PRIORITY_BACKGROUND])
+            if len(self._queued) >= self.max_queue or self._estimated_wait(priority) > max_wait:
+                self.stats["rejected"] += 1
+                logger.warning(f"[GEO_SCHED] Rejected '{query}' (queue={len(self._queued)}, priority={priority})")
+                return None
+
+            future: Future = Future()
+            self._push(priority, time.time(), query, future)
+            self._inflight[query] = future
+            self._ensure_worker()
+            self._cond.notify()
+            return future
+
+    def geocode(self, query: str, priority: int = PRIORITY_INTERACTIVE, timeout: float = 8.0) -> Any:
+        """Soumet la requête et attend son résultat (None si rejet ou délai dépassé)"""
+        future = self.submit(query, priority)
+        if future is None:
+            return None
+        try:
+            return future.result(timeout=timeout)
+        except Exception as e:
+            logger.warning(f"[GEO_SCHED] No result for '{query}': {e}")
+            return None
+
+    def _run(self):
+        while True:
+            with self._cond:
+                while True:
+                    while not self._heap:
+                        self._cond.wait()
+                    entry = heapq.heappop(self._heap)
+                    if self._queued.get(entry[3]) is entry:
+                        break  # Sinon entrée périmée (requête promue)
+                priority, _, queued_at, query, future = entry
+                del self._queued[query]
+                self._running = True
+
+            self.gate.wait_turn()
+            self._waits.append(time.time() - queued_at)
+            try:
+                result = self.fetch(query)
+                self.stats["executed"] += 1
+                future.set_result(result)
+            except Exception as e:
+                self.stats["errors"] += 1
+                future.set_exception(e)
+            finally:
+                with self._cond:
+                    self._inflight.pop(query, None)
+                    self._running = False
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Statistiques de l'ordonnanceur (attente en file, taux de rejet)"""
+        waits = sorted(self._waits)
+        submitted = self.stats["submitted"]
+        return {
+            **self.stats,
+            "queue_length": len(self._queued),
+            "queue_wait_avg_ms": round(sum(waits) / len(waits) * 1000, 1) if waits else 0,
+            "queue_wait_p95_ms": round(waits[min(len(waits) - 1, int(len(waits) * 0.95))] * 1000, 1) if waits else 0,
+            "rejected_ratio": round(self.stats["rejected"] / submitted, 4) if submitted else 0,
+        }
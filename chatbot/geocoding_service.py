@@ -6,32 +6,34 @@ Convertit adresses → coordonnées et calcule les distances
 import os
 import logging
 import requests
-from typing import Optional, Tuple, Dict, Any
+import numpy as np
+from typing import Optional, Tuple, Dict, Any, List, Sequence
 from math import radians, cos, sin, asin, sqrt
+from .gazetteer import gazetteer
+from .geocoding_scheduler import GeocodingScheduler, PRIORITY_INTERACTIVE
+from .eta_model import eta_model, local_hour
+from .cache import LRUCache
 
 logger = logging.getLogger(__name__)
 
 # Configuration
 NOMINATIM_BASE_URL = "https://nominatim.openstreetmap.org"
 USER_AGENT = "TokTokDelivery/1.0"
+NOMINATIM_MIN_INTERVAL = float(os.getenv("NOMINATIM_MIN_INTERVAL", "1.0"))  # Politique d'usage : 1 req/s
+NOMINATIM_WAIT_TIMEOUT = float(os.getenv("NOMINATIM_WAIT_TIMEOUT", "8"))
+EARTH_RADIUS_KM = 6371
+AVERAGE_SPEED_KMH = 25  # Vitesse moyenne en ville
+MEMO_GRID_DEG = float(os.getenv("TOKTOK_GEO_MEMO_GRID_DEG", "0.00045"))  # ≈ 50 m
+MEMO_MAX_SIZE = int(os.getenv("TOKTOK_GEO_MEMO_SIZE", "4096"))
 
+# Mémo des trajets (coordonnées arrondies) et des adresses déjà géocodées
+travel_memo = LRUCache(max_size=MEMO_MAX_SIZE, name="travel")
+address_memo = LRUCache(max_size=MEMO_MAX_SIZE, name="address")
 
-def geocode_address(address: str, city: str = "Brazzaville", country: str = "Congo") -> Optional[Tuple[float, float]]:
-    """
-    Convertit une adresse en coordonnées GPS (latitude, longitude)
-    
-    Args:
-        address: Adresse à géocoder (ex: "25 Rue Malanda")
-        city: Ville (par défaut "Brazzaville")
-        country: Pays (par défaut "Congo")
-    
-    Returns:
-        (latitude, longitude) ou None si non trouvé
-    """
+
+def _nominatim_search(query: str) -> Optional[Tuple[float, float]]:
+    """Exécute une recherche Nominatim (appelée uniquement par l'ordonnanceur)"""
     try:
-        # Construire la query pour Nominatim
-        query = f"{address}, {city}, {country}"
-        
         params = {
             "q": query,
             "format": "json",
@@ -52,12 +54,10 @@ def geocode_address(address: str, city: str = "Brazzaville", country: str = "Con
         if response.status_code == 200:
             results = response.json()
             if results:
-                lat = float(results[0]["lat"])
-                lon = float(results[0]["lon"])
-                logger.info(f"[GEOCODE] '{address}' → ({lat}, {lon})")
-                return (lat, lon)
+                return (float(results[0]["lat"]), float(results[0]["lon"]))
+        elif response.status_code in (403, 429):
+            logger.warning(f"[GEOCODE] Nominatim throttling ({response.status_code})")
         
-        logger.warning(f"[GEOCODE] Impossible de géocoder '{address}'")
         return None
         
     except Exception as e:
@@ -65,6 +65,51 @@ def geocode_address(address: str, city: str = "Brazzaville", country: str = "Con
         return None
 
 
+# Une seule requête Nominatim par seconde, tous workers confondus
+nominatim_scheduler = GeocodingScheduler(
+    _nominatim_search,
+    min_interval=NOMINATIM_MIN_INTERVAL,
+    max_queue=int(os.getenv("NOMINATIM_MAX_QUEUE", "50")),
+)
+
+
+def geocode_address(address: str, city: str = "Brazzaville", country: str = "Congo",
+                    priority: int = PRIORITY_INTERACTIVE) -> Optional[Tuple[float, float]]:
+    """
+    Convertit une adresse en coordonnées GPS (latitude, longitude)
+    Essaie d'abord le gazetteer local (quartiers, lieux connus), puis Nominatim
+    
+    Args:
+        address: Adresse à géocoder (ex: "25 Rue Malanda")
+        city: Ville (par défaut "Brazzaville")
+        country: Pays (par défaut "Congo")
+        priority: PRIORITY_INTERACTIVE (utilisateur en attente) ou PRIORITY_BACKGROUND
+    
+    Returns:
+        (latitude, longitude) ou None si non trouvé
+    """
+    # Gazetteer local : aucun appel réseau pour les quartiers et lieux connus
+    local = gazetteer.geocode(address, city)
+    if local:
+        logger.debug(f"[GEOCODE] '{address}' → {local} (gazetteer)")
+        return local
+    
+    # Nominatim via l'ordonnanceur (débit global, déduplication, priorité)
+    query = f"{address}, {city}, {country}"
+    memo_key = query.strip().lower()
+    result = address_memo.get(memo_key)
+    if result:
+        return result
+    result = nominatim_scheduler.geocode(query, priority=priority, timeout=NOMINATIM_WAIT_TIMEOUT)
+    if result:
+        logger.info(f"[GEOCODE] '{address}' → {result}")
+        address_memo.set(memo_key, result)
+        return result
+    
+    logger.warning(f"[GEOCODE] Impossible de géocoder '{address}'")
+    return None
+
+
 def haversine_distance(lat1: float, lon1: float, lat2: float, lon2: float) -> float:
     """
     Calcule la distance entre deux points GPS en kilomètres
@@ -86,13 +131,199 @@ def haversine_distance(lat1: float, lon1: float, lat2: float, lon2: float) -> fl
     a = sin(dlat/2)**2 + cos(lat1) * cos(lat2) * sin(dlon/2)**2
     c = 2 * asin(sqrt(a))
     
-    # Rayon de la Terre en km
-    r = 6371
-    
-    distance = c * r
+    distance = c * EARTH_RADIUS_KM
     return round(distance, 2)
 
 
+def _as_coords_array(points: Sequence[Tuple[float, float]]) -> np.ndarray:
+    """Convertit une liste de (lat, lon) en tableau (N, 2) en radians"""
+    arr = np.asarray(points, dtype=np.float64).reshape(-1, 2)
+    return np.radians(arr)
+
+
+def haversine_matrix(origins: Sequence[Tuple[float, float]],
+                     destinations: Sequence[Tuple[float, float]]) -> np.ndarray:
+    """
+    Calcule toutes les distances origine → destination en une seule passe NumPy
+    
+    Args:
+        origins: N points (lat, lon)
+        destinations: M points (lat, lon)
+    
+    Returns:
+        Matrice (N, M) des distances en kilomètres
+    """
+    o = _as_coords_array(origins)
+    d = _as_coords_array(destinations)
+    lat1, lon1 = o[:, 0:1], o[:, 1:2]
+    lat2, lon2 = d[:, 0][None, :], d[:, 1][None, :]
+    
+    a = np.sin((lat2 - lat1) / 2) ** 2 + np.cos(lat1) * np.cos(lat2) * np.sin((lon2 - lon1) / 2) ** 2
+    return 2 * EARTH_RADIUS_KM * np.arcsin(np.sqrt(np.clip(a, 0.0, 1.0)))
+
+
+def haversine_pairwise(origins: Sequence[Tuple[float, float]],
+                       destinations: Sequence[Tuple[float, float]]) -> np.ndarray:
+    """
+    Distances ligne à ligne : origins[i] → destinations[i]
+    
+    Returns:
+        Vecteur (N,) des distances en kilomètres
+    """
+    o = _as_coords_array(origins)
+    d = _as_coords_array(destinations)
+    if o.shape != d.shape:
+        raise ValueError(f"Tailles incompatibles: {o.shape} vs {d.shape}")
+    
+    a = (np.sin((d[:, 0] - o[:, 0]) / 2) ** 2
+         + np.cos(o[:, 0]) * np.cos(d[:, 0]) * np.sin((d[:, 1] - o[:, 1]) / 2) ** 2)
+    return 2 * EARTH_RADIUS_KM * np.arcsin(np.sqrt(np.clip(a, 0.0, 1.0)))
+
+
+def distance_eta_matrix(origins: Sequence[Tuple[float, float]],
+                        destinations: Sequence[Tuple[float, float]],
+                        speed_kmh: float = AVERAGE_SPEED_KMH) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Matrices de distance (km) et de temps de trajet estimé (minutes)
+    
+    Args:
+        origins: N points (lat, lon)
+        destinations: M points (lat, lon)
+        speed_kmh: Vitesse moyenne utilisée pour l'ETA
+    
+    Returns:
+        (distances (N, M) en km, ETA (N, M) en minutes)
+    """
+    dist = haversine_matrix(origins, destinations)
+    return dist, dist / speed_kmh * 60
+
+
+def parse_coords(coords: Optional[str]) -> Optional[Tuple[float, float]]:
+    """Parse des coordonnées au format "lat,lng" (None si invalide)"""
+    if not coords:
+        return None
+    try:
+        lat, lon = map(float, str(coords).split(","))
+        return (lat, lon)
+    except (TypeError, ValueError):
+        return None
+
+
+def format_travel_time(time_minutes: int) -> str:
+    """Formate une durée en minutes (ex: "15 min", "1h05")"""
+    if time_minutes < 60:
+        return f"{time_minutes} min"
+    return f"{time_minutes // 60}h{time_minutes % 60:02d}"
+
+
+def _snap(lat: float, lon: float) -> Tuple[int, int]:
+    return (round(lat / MEMO_GRID_DEG), round(lon / MEMO_GRID_DEG))
+
+
+def _travel_key(a: Tuple[float, float], b: Tuple[float, float], hour: int) -> tuple:
+    return (_snap(*a), _snap(*b), eta_model.version, hour)
+
+
+def travel_estimate(lat1: float, lon1: float, lat2: float, lon2: float) -> Tuple[float, int]:
+    """
+    Distance (km) et durée estimée (minutes) entre deux points, mémoïsées
+    sur une grille d'environ 50 m et la version du modèle d'ETA
+    
+    Returns:
+        (distance_km arrondie à 10 m, minutes)
+    """
+    key = _travel_key((lat1, lon1), (lat2, lon2), local_hour())
+    cached = travel_memo.get(key)
+    if cached is not None:
+        return cached
+    distance_km = haversine_distance(lat1, lon1, lat2, lon2)
+    result = (distance_km, int(eta_model.predict_minutes(lat1, lon1, lat2, lon2, distance_km=distance_km)))
+    travel_memo.set(key, result)
+    return result
+
+
+def get_memo_stats() -> Dict[str, Any]:
+    """Compteurs des mémos trajets / adresses"""
+    return {"travel": travel_memo.get_stats(), "address": address_memo.get_stats()}
+
+
+def _resolve_point(address: Optional[str], coords: Optional[str]) -> Optional[Tuple[float, float]]:
+    point = parse_coords(coords)
+    if point is None and address and address != "Position actuelle":
+        point = geocode_address(address)
+    return point
+
+
+def batch_mission_distances(
+    missions: List[Dict[str, Any]],
+    livreur_position: Optional[Tuple[float, float]] = None
+) -> List[Dict[str, Any]]:
+    """
+    Calcule en une passe vectorisée la distance départ → arrivée de chaque mission
+    (et la distance livreur → départ si la position est connue)
+    
+    Args:
+        missions: Missions avec adresses et coordonnées optionnelles
+        livreur_position: Position actuelle du livreur (lat, lng) optionnel
+    
+    Returns:
+        Une entrée par mission, au format de estimate_distance_from_addresses,
+        avec en plus "to_pickup_km" (None si inconnu)
+    """
+    results = [{
+        "distance_km": 0,
+        "distance_text": "—",
+        "estimated_time": "—",
+        "success": False,
+        "to_pickup_km": None,
+    } for _ in missions]
+    
+    pickups, dropoffs, idx_trip = [], [], []
+    pickup_only, idx_pickup = [], []
+    for i, m in enumerate(missions):
+        try:
+            start = _resolve_point(m.get("adresse_recuperation"), m.get("coordonnees_recuperation"))
+            end = _resolve_point(m.get("adresse_livraison"), m.get("coordonnees_livraison"))
+        except Exception as e:
+            logger.error(f"[DISTANCE] Erreur mission {m.get('id')}: {e}")
+            continue
+        if start and end:
+            pickups.append(start)
+            dropoffs.append(end)
+            idx_trip.append(i)
+        if start:
+            pickup_only.append(start)
+            idx_pickup.append(i)
+    
+    if idx_trip:
+        hour = local_hour()
+        keys = [_travel_key(a, b, hour) for a, b in zip(pickups, dropoffs)]
+        estimates = [travel_memo.get(k) for k in keys]
+        missing = [n for n, est in enumerate(estimates) if est is None]
+        if missing:
+            # Calcul vectorisé des seules paires absentes du mémo
+            dist = np.round(haversine_pairwise([pickups[n] for n in missing], [dropoffs[n] for n in missing]), 2)
+            for n, d_km in zip(missing, dist.tolist()):
+                a, b = pickups[n], dropoffs[n]
+                # ETA par zone et heure (tables apprises sur l'historique GPS)
+                estimates[n] = (d_km, int(eta_model.predict_minutes(a[0], a[1], b[0], b[1], hour=hour, distance_km=d_km)))
+                travel_memo.set(keys[n], estimates[n])
+        for i, (d_km, t_min) in zip(idx_trip, estimates):
+            results[i].update({
+                "distance_km": d_km,
+                "distance_text": f"{d_km} km",
+                "estimated_time": format_travel_time(t_min),
+                "success": True,
+            })
+    
+    if livreur_position and idx_pickup:
+        to_pickup = np.round(haversine_matrix([livreur_position], pickup_only)[0], 2)
+        for i, d_km in zip(idx_pickup, to_pickup.tolist()):
+            results[i]["to_pickup_km"] = d_km
+    
+    return results
+
+
 def estimate_distance_from_addresses(
     address1: str, 
     address2: str,
@@ -152,20 +383,9 @@ def estimate_distance_from_addresses(
                 "success": False
             }
         
-        # Calculer la distance
-        distance_km = haversine_distance(lat1, lon1, lat2, lon2)
-        
-        # Estimer le temps de trajet (vitesse moyenne 25 km/h en ville)
-        average_speed = 25  # km/h
-        time_minutes = int((distance_km / average_speed) * 60)
-        
-        # Formatter le temps
-        if time_minutes < 60:
-            time_text = f"{time_minutes} min"
-        else:
-            hours = time_minutes // 60
-            mins = time_minutes % 60
-            time_text = f"{hours}h{mins:02d}"
+        # Distance et temps de trajet (mémoïsés ; vitesse apprise par zone et heure, 25 km/h à défaut)
+        distance_km, time_minutes = travel_estimate(lat1, lon1, lat2, lon2)
+        time_text = format_travel_time(time_minutes)
         
         return {
             "distance_km": distance_km,
@@ -231,28 +451,16 @@ def format_mission_for_livreur(mission: Dict[str, Any], livreur_position: Option
     mid = mission.get("id", "—")
     depart = mission.get("adresse_recuperation", "—")
     dest = mission.get("adresse_livraison", "—")
-    coords_depart = mission.get("coordonnees_recuperation")
-    coords_dest = mission.get("coordonnees_livraison")
     valeur = mission.get("valeur_produit", 0)
     
-    # Distance entre départ et destination
-    dist_trajet = estimate_distance_from_addresses(depart, dest, coords_depart, coords_dest)
-    
-    # Distance du livreur au point de départ (si position fournie)
+    # Distances départ → arrivée et livreur → départ (calcul vectorisé)
+    dist_trajet = batch_mission_distances([mission], livreur_position)[0]
     dist_to_pickup = None
-    if livreur_position and coords_depart:
-        try:
-            lat, lon = livreur_position
-            depart_coords = coords_depart.split(",")
-            if len(depart_coords) == 2:
-                lat_depart, lon_depart = map(float, depart_coords)
-                dist_km = haversine_distance(lat, lon, lat_depart, lon_depart)
-                dist_to_pickup = {
-                    "distance_km": dist_km,
-                    "distance_text": f"{dist_km} km"
-                }
-        except:
-            pass
+    if dist_trajet["to_pickup_km"] is not None:
+        dist_to_pickup = {
+            "distance_km": dist_trajet["to_pickup_km"],
+            "distance_text": f"{dist_trajet['to_pickup_km']} km"
+        }
     
     # Formatter le message
     lines = [
@@ -0,0 +1,311 @@
+# chatbot/intent_classifier.py
+"""
+Classifieur d'intention local (NumPy)
+N-grammes de caractères hachés + régression logistique multinomiale :
+coursier, marketplace, follow, menu ou none (pas de changement de flow).
+Appris sur des exemples annotés et les tours journalisés ; l'IA n'est
+appelée que lorsque la confiance est trop faible
+"""
+import os
+import re
+import json
+import time
+import zlib
+import random
+import logging
+import threading
+from collections import Counter
+from typing import Dict, Any, Optional, Tuple, List, Iterable
+
+import numpy as np
+
+from .gazetteer import fold
+
+logger = logging.getLogger(__name__)
+
+# Configuration
+INTENT_MODEL_PATH = os.getenv(
+    "TOKTOK_INTENT_MODEL_PATH",
+    os.path.join(os.path.dirname(__file__), "data", "intent_model.npz")
+)
+INTENT_SEED_PATH = os.path.join(os.path.dirname(__file__), "data", "intent_seed.jsonl")
+# Journal des tours annotés : désactivé par défaut (saisies brutes des utilisateurs)
+INTENT_LOG_PATH = os.getenv("TOKTOK_INTENT_LOG_PATH", "")
+INTENT_CONFIDENCE_THRESHOLD = float(os.getenv("TOKTOK_INTENT_CONFIDENCE_THRESHOLD", "0.75"))
+
+LABELS = ["none", "coursier", "marketplace", "follow", "menu"]
+N_FEATURES = 2 ** 14
+NGRAM_RANGE = (2, 4)
+
+# Hyperparamètres d'apprentissage
+EPOCHS = 150
+LEARNING_RATE = 20.0
+L2 = 1e-5
+
+_log_lock = threading.Lock()
+_model_lock = threading.Lock()
+_stats_lock = threading.Lock()
+stats = {"classifier_answered": 0, "llm_fallback": 0}
+
+
+def featurize(text: str, n_features: int = N_FEATURES,
+              ngram_range: Tuple[int, int] = NGRAM_RANGE) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    N-grammes de caractères du texte normalisé, hachés (crc32)
+
+    Returns:
+        (indices, valeurs) : vecteur creux TF log, normalisé L2
+    """
+    padded = f" {fold(text)} "
+    counts = Counter()
+    for n in range(ngram_range[0], ngram_range[1] + 1):
+        for i in range(len(padded) - n + 1):
+            counts[zlib.crc32(padded[i:i + n].encode()) % n_features] += 1
+    if not counts:
+        return np.zeros(0, dtype=np.int64), np.zeros(0, dtype=np.float32)
+    idx = np.fromiter(counts.keys(), dtype=np.int64, count=len(counts))
+    val = 1.0 + np.log(np.fromiter(counts.values(), dtype=np.float32, count=len(counts)))
+    return idx, val / np.linalg.norm(val)
+
+
+def _softmax(z: np.ndarray) -> np.ndarray:
+    z = z - z.max(axis=-1, keepdims=True)
+    e = np.exp(z)
+    return e / e.sum(axis=-1, keepdims=True)
+
+
+class IntentClassifier:
+    """Modèle linéaire : W (features × classes) + biais"""
+
+    def __init__(self, weights: np.ndarray, bias: np.ndarray, labels: List[str] = LABELS,
+                 version: str = "untrained"):
+        self.W = weights
+        self.b = bias
+        self.labels = list(labels)
+        self.version = version
+        self.n_features = weights.shape[0]
+
+    def predict_proba(self, text: str) -> np.ndarray:
+        idx, val = featurize(text, self.n_features)
+        return _softmax(val @ self.W[idx] + self.b)
+
+    def predict(self, text: str) -> Tuple[str, float]:
+        """(intention, confiance)"""
+        proba = self.predict_proba(text)
+        best = int(proba.argmax())
+        return self.labels[best], float(proba[best])
+
+    def save(self, path: str = INTENT_MODEL_PATH):
+        tmp = f"{path}.{os.getpid()}.tmp.npz"
+        np.savez_compressed(tmp, W=self.W, b=self.b, labels=np.array(self.labels), version=np.array(self.version))
+        os.replace(tmp, path)
+
+    @classmethod
+    def load(cls, path: str = INTENT_MODEL_PATH) -> Optional["IntentClassifier"]:
+        """Modèle écrit par la commande train_intent_classifier (None s'il n'existe pas)"""
+        if not os.path.exists(path):
+            return None
+        try:
+            data = np.load(path)
+            model = cls(data["W"], data["b"], [str(x) for x in data["labels"]], str(data["version"]))
+            logger.info(f"[INTENT] Modèle {model.version} chargé")
+            return model
+        except Exception as e:
+            logger.error(f"[INTENT] Chargement impossible ({path}): {e}")
+            return None
+
+
+def load_examples(*paths: str) -> List[Tuple[str, str]]:
+    """Exemples (texte, intention) depuis des fichiers JSONL {"text", "label"}"""
+    examples = []
+    for path in paths:
+        if not path or not os.path.exists(path):
+            continue
+        with open(path, encoding="utf-8") as f:
+            for line in f:
+                try:
+                    row = json.loads(line)
+                except ValueError:
+                    continue
+                if row.get("text") and row.get("label") in LABELS:
+                    examples.append((row["text"], row["label"]))
+    return examples
+
+
+def train(examples: Iterable[Tuple[str, str]], epochs: int = EPOCHS, lr: float = LEARNING_RATE,
+          l2: float = L2, n_features: int = N_FEATURES) -> IntentClassifier:
+    """
+    Régression logistique multinomiale, descente de gradient sur matrice creuse
+
+    Args:
+        examples: Paires (texte, intention)
+        epochs: Nombre de passes complètes
+        lr: Pas d'apprentissage
+        l2: Régularisation
+    """
+    examples = list(examples)
+    rows, cols, vals = [], [], []
+    for r, (text, _) in enumerate(examples):
+        idx, val = featurize(text, n_features)
+        rows.append(np.full(len(idx), r))
+        cols.append(idx)
+        vals.append(val)
+    rows, cols, vals = np.concatenate(rows), np.concatenate(cols), np.concatenate(vals)
+    y = np.array([LABELS.index(label) for _, label in examples])
+    n, k = len(examples), len(LABELS)
+    target = np.eye(k, dtype=np.float32)[y]
+
+    # Pondération inverse à la fréquence : "none" domine les tours journalisés
+    freq = np.bincount(y, minlength=k).astype(np.float32)
+    sample_w = (n / (k * np.maximum(freq, 1)))[y][:, None]
+
+    W = np.zeros((n_features, k), dtype=np.float32)
+    b = np.zeros(k, dtype=np.float32)
+    for _ in range(epochs):
+        logits = np.zeros((n, k), dtype=np.float32)
+        np.add.at(logits, rows, vals[:, None] * W[cols])
+        grad = (_softmax(logits + b) - target) * sample_w / n
+        grad_W = np.zeros_like(W)
+        np.add.at(grad_W, cols, vals[:, None] * grad[rows])
+        W -= lr * (grad_W + l2 * W)
+        b -= lr * grad.sum(axis=0)
+
+    version = time.strftime("%Y%m%d%H%M%S", time.gmtime())
+    logger.info(f"[INTENT] Modèle {version} appris sur {n} exemples")
+    return IntentClassifier(W, b, LABELS, version)
+
+
+def evaluate(model: IntentClassifier, examples: Iterable[Tuple[str, str]],
+             threshold: float = INTENT_CONFIDENCE_THRESHOLD) -> Dict[str, Any]:
+    """
+    Exactitude globale et par intention, couverture au seuil de confiance
+
+    Returns:
+        Rapport : accuracy, coverage (part traitée sans IA), accuracy_confident,
+        precision/recall par intention, latence moyenne en µs
+    """
+    examples = list(examples)
+    if not examples:
+        return {"examples": 0}
+    preds = []
+    t0 = time.perf_counter()
+    for text, _ in examples:
+        preds.append(model.predict(text))
+    us = (time.perf_counter() - t0) / len(examples) * 1e6
+
+    correct = [p == label for (p, _), (_, label) in zip(preds, examples)]
+    confident = [c >= threshold for _, c in preds]
+    per_label = {}
+    for label in LABELS:
+        tp = sum(1 for (p, _), (_, l) in zip(preds, examples) if p == label and l == label)
+        predicted = sum(1 for p, _ in preds if p == label)
+        actual = sum(1 for _, l in examples if l == label)
+        per_label[label] = {
+            "precision": round(tp / predicted, 3) if predicted else None,
+            "recall": round(tp / actual, 3) if actual else None,
+            "support": actual,
+        }
+    n_confident = sum(confident)
+    return {
+        "examples": len(examples),
+        "accuracy": round(sum(correct) / len(examples), 4),
+        "coverage": round(n_confident / len(examples), 4),
+        "accuracy_confident": round(sum(c for c, ok in zip(correct, confident) if ok) / n_confident, 4)
+        if n_confident else None,
+        "per_label": per_label,
+        "predict_us": round(us, 1),
+    }
+
+
+def split(examples: List[Tuple[str, str]], holdout: float, seed: int = 7):
+    """Répartition apprentissage / évaluation reproductible"""
+    shuffled = list(examples)
+    random.Random(seed).shuffle(shuffled)
+    cut = int(len(shuffled) * (1 - holdout))
+    return shuffled[:cut], shuffled[cut:]
+
+
+_EMAIL_RE = re.compile(r"\S+@\S+")
+_DIGITS_RE = re.compile(r"\d+")
+
+
+def redact(text: str) -> str:
+    """Masque emails, téléphones et tout nombre (montants, numéros de rue) avant journalisation"""
+    return _DIGITS_RE.sub("0", _EMAIL_RE.sub("email", text))
+
+
+def log_turn(text: str, flow: str, label: Optional[str], source: str = "llm"):
+    """
+    Journalise un tour annoté (donnée d'apprentissage pour le prochain modèle)
+    Seulement si TOKTOK_INTENT_LOG_PATH est défini ; texte masqué, fichier lisible
+    par le seul utilisateur du service
+    """
+    if not INTENT_LOG_PATH or not text:
+        return
+    row = {"text": redact(text), "flow": flow, "label": label if label in LABELS else "none",
+           "source": source, "ts": int(time.time())}
+    try:
+        with _log_lock:
+            fd = os.open(INTENT_LOG_PATH, os.O_WRONLY | os.O_APPEND | os.O_CREAT, 0o600)
+            with open(fd, "a", encoding="utf-8") as f:
+                f.write(json.dumps(row, ensure_ascii=False) + "\n")
+    except OSError as e:
+        logger.debug(f"[INTENT] Journalisation impossible: {e}")
+
+
+def _train_from_seed():
+    global intent_classifier
+    examples = load_examples(INTENT_SEED_PATH)
+    if not examples:
+        logger.info("[INTENT] Ni modèle ni exemples : classifieur désactivé")
+        return
+    intent_classifier = train(examples)
+
+
+def get_classifier() -> Optional[IntentClassifier]:
+    """
+    Modèle courant ; sans modèle entraîné, apprentissage sur les exemples annotés
+    lancé en tâche de fond au premier besoin (None d'ici là : l'IA décide)
+    """
+    global _seed_training
+    if intent_classifier is not None:
+        return intent_classifier
+    with _model_lock:
+        if _seed_training is None:
+            _seed_training = threading.Thread(target=_train_from_seed, name="intent-train", daemon=True)
+            _seed_training.start()
+    return intent_classifier
+
+
+def classify(text: str, threshold: float = INTENT_CONFIDENCE_THRESHOLD) -> Optional[str]:
+    """
+    Intention prédite localement si la confiance est suffisante
+
+    Returns:
+        Intention ("none" = pas de changement) ou None (indécis : demander à l'IA)
+    """
+    model = get_classifier()
+    if model is None:
+        return None
+    label, confidence = model.predict(text)
+    confident = confidence >= threshold
+    with _stats_lock:
+        stats["classifier_answered" if confident else "llm_fallback"] += 1
+    logger.debug(f"[INTENT] '{text[:40]}' → {label} ({confidence:.2f})")
+    return label if confident else None
+
+
+def get_stats() -> Dict[str, Any]:
+    """Part des décisions d'intention prises sans IA"""
+    with _stats_lock:
+        snapshot = dict(stats)
+    total = snapshot["classifier_answered"] + snapshot["llm_fallback"]
+    snapshot["avoided_ratio"] = round(snapshot["classifier_answered"] / total, 4) if total else 0
+    snapshot["model_version"] = intent_classifier.version if intent_classifier else None
+    snapshot["threshold"] = INTENT_CONFIDENCE_THRESHOLD
+    return snapshot
+
+
+# Instance globale (modèle entraîné ; sinon appris au premier besoin, voir get_classifier)
+intent_classifier = IntentClassifier.load()
+_seed_training: Optional[threading.Thread] = None
@@ -0,0 +1,220 @@
+# chatbot/lexicon.py
+"""
+Lexique compilé (Aho-Corasick sur mots normalisés)
+Mots-clés d'intention, boutons, alias de rôles / véhicules et modes de
+paiement : un seul automate construit à l'import, un seul passage sur le
+message renvoie toutes les catégories et valeurs canoniques reconnues
+"""
+import logging
+from collections import deque
+from functools import lru_cache
+from typing import Dict, Any, Optional, List, Tuple
+
+from .gazetteer import fold
+
+logger = logging.getLogger(__name__)
+
+ANALYZE_CACHE_SIZE = 4096  # Boutons et réponses courtes reviennent sans cesse
+
+# Vocabulaire : catégorie → valeur canonique → expressions
+VOCABULARY: Dict[str, Dict[str, List[str]]] = {
+    # Changement d'intention (détection par mots-clés, avant le classifieur / l'IA)
+    "intent": {
+        "marketplace": ["marketplace", "commander", "restaurant", "manger", "plat", "menu"],
+        "follow": ["suivre", "suivi", "suivie", "track", "où est", "statut"],
+        "coursier": ["livraison", "envoyer colis", "envoyer un colis", "coursier"],
+        "menu": ["menu principal", "accueil"],
+    },
+    # Navigation
+    "nav": {
+        "retour": ["retour", "back"],
+        "menu": ["menu", "accueil"],
+    },
+    # Réponses aux récapitulatifs et étapes facultatives
+    "answer": {
+        "confirmer": ["confirmer", "oui", "ok", "valider", "yes"],
+        "annuler": ["annuler", "non", "cancel", "no"],
+        "modifier": ["modifier", "editer", "edit", "change", "changer"],
+        "passer": ["passer", "skip", "suivant", "continuer"],
+    },
+    # Menu principal client
+    "main_menu": {
+        "nouvelle_demande": ["nouvelle demande", "1"],
+        "suivre": ["suivre ma demande", "suivre", "2"],
+        "historique": ["historique", "history", "3"],
+        "marketplace": ["marketplace", "4"],
+    },
+    # Position du client (flow coursier)
+    "position": {
+        "depart": ["au point de départ", "point de départ", "départ", "1"],
+        "arrivee": ["au point d'arrivée", "point d'arrivée", "arrivée", "destination", "2"],
+    },
+    # Accueil non connecté
+    "welcome": {
+        "connexion": ["connexion", "login"],
+        "inscription": ["inscription", "s'inscrire", "sinscrire", "signup"],
+        "aide": ["aide", "help"],
+    },
+    "payment": {
+        "espèces": ["espèces", "cash", "1"],
+        "mobile_money": ["mobile money", "mobile", "mtn", "2"],
+        "virement": ["virement", "transfer", "bank", "3"],
+    },
+    "type_livreur": {
+        "independant": ["independant", "indep", "solo"],
+        "societe": ["societe", "company"],
+        "autoentrepreneur": ["autoentrepreneur", "auto-entrepreneur", "auto entrepreneur"],
+    },
+    "type_vehicule": {
+        "moto": ["moto", "scooter", "2 roues", "deux roues"],
+        "voiture": ["voiture", "auto", "car"],
+        "velo": ["velo", "bicycle"],
+        "camionnette": ["camionnette", "pickup", "fourgon"],
+    },
+    # Menu livreur
+    "livreur": {
+        "statut": ["basculer", "toggle", "statut", "en ligne", "hors ligne", "basculer en ligne", "basculer hors ligne"],
+        "missions": ["missions", "missions dispo", "disponibles"],
+        "mes_missions": ["mes missions", "mes", "mes courses"],
+        "demarrer": ["démarrer", "start"],
+        "pickup": ["pickup", "arrivé pickup"],
+        "livree": ["livrée"],
+        "historique": ["historique", "history"],
+    },
+    # Menu entreprise
+    "marchand": {
+        "menu": ["menu", "bonjour", "salut", "hello", "hi", "accueil", "entreprise"],
+        "boutique": ["basculer", "toggle", "ouvrir", "fermer"],
+        "produits": ["mes produits", "produits", "catalogue"],
+        "creer_produit": ["créer produit", "nouveau produit", "ajouter produit"],
+        "commandes": ["commandes", "mes commandes"],
+        # Statuts de commande : valeur = statut envoyé au backend
+        "acceptee": ["accepter", "acceptée"],
+        "preparee": ["préparer", "préparée"],
+        "expediee": ["expédier", "expédiée"],
+        "livree": ["livrée", "livrer"],
+        "annulee": ["annuler", "annulée"],
+        "publier": ["publier", "creer", "confirmer"],
+    },
+}
+
+
+def _stem(token: str) -> str:
+    """Pluriel courant (s / x final) ignoré : "restaurants" = "restaurant" """
+    return token[:-1] if len(token) > 3 and token[-1] in "sx" else token
+
+
+def tokenize(text: str) -> List[str]:
+    """Mots normalisés : minuscules, sans accents, émojis ni ponctuation"""
+    return [_stem(tok) for tok in fold(text).split()]
+
+
+class Analysis:
+    """Résultat d'un passage : correspondances (catégorie, valeur, début, fin)"""
+
+    __slots__ = ("tokens", "hits")
+
+    def __init__(self, tokens: List[str], hits: List[Tuple[str, str, int, int]]):
+        self.tokens = tokens
+        self.hits = hits
+
+    def values(self, category: str) -> List[str]:
+        """
+        Valeurs reconnues n'importe où dans le message, dans l'ordre d'apparition
+        Une expression incluse dans une plus longue de la même catégorie est ignorée
+        ("menu principal" ne compte pas aussi comme "menu"), de même qu'un raccourci
+        numérique ("1", "2"...) qui n'est pas le message entier
+        """
+        spans = [(start, end) for cat, _, start, end in self.hits if cat == category]
+        seen = []
+        for cat, value, start, end in self.hits:
+            if cat != category or value in seen:
+                continue
+            if any(s <= start and end <= e and (s, e) != (start, end) for s, e in spans):
+                continue
+            if all(tok.isdigit() for tok in self.tokens[start:end]) and (start, end) != (0, len(self.tokens)):
+                continue
+            seen.append(value)
+        return seen
+
+    def has(self, category: str, value: Optional[str] = None) -> bool:
+        return any(cat == category and (value is None or v == value) for cat, v, _, _ in self.hits)
+
+    def exact(self, category: str) -> Optional[str]:
+        """Valeur dont une expression couvre tout le message (équivalent de `t in {...}`)"""
+        for cat, value, start, end in self.hits:
+            if cat == category and start == 0 and end == len(self.tokens):
+                return value
+        return None
+
+
+class Lexicon:
+    """Automate Aho-Corasick dont l'alphabet est l'ensemble des mots normalisés"""
+
+    def __init__(self, vocabulary: Dict[str, Dict[str, List[str]]]):
+        self._goto: List[Dict[str, int]] = [{}]
+        self._fail: List[int] = [0]
+        self._out: List[List[Tuple[str, str, int]]] = [[]]
+        self.patterns = 0
+        for category, values in vocabulary.items():
+            for value, phrases in values.items():
+                for phrase in phrases:
+                    self._add(tokenize(phrase), category, value)
+        self._build_failure_links()
+        self.analyze = lru_cache(maxsize=ANALYZE_CACHE_SIZE)(self._analyze)
+        logger.debug(f"[LEXICON] {self.patterns} expressions, {len(self._goto)} états")
+
+    def _add(self, tokens: List[str], category: str, value: str):
+        if not tokens:
+            return
+        state = 0
+        for tok in tokens:
+            nxt = self._goto[state].get(tok)
+            if nxt is None:
+                nxt = len(self._goto)
+                self._goto[state][tok] = nxt
+                self._goto.append({})
+                self._fail.append(0)
+                self._out.append([])
+            state = nxt
+        entry = (category, value, len(tokens))
+        if entry not in self._out[state]:
+            self._out[state].append(entry)
+            self.patterns += 1
+
+    def _build_failure_links(self):
+        queue = deque(self._goto[0].values())
+        while queue:
+            state = queue.popleft()
+            for tok, nxt in self._goto[state].items():
+                queue.append(nxt)
+                f = self._fail[state]
+                while f and tok not in self._goto[f]:
+                    f = self._fail[f]
+                self._fail[nxt] = self._goto[f].get(tok, 0)
+                self._out[nxt] = self._out[nxt] + self._out[self._fail[nxt]]
+
+    def _analyze(self, text: str) -> Analysis:
+        """Un passage sur le message : toutes les expressions reconnues (résultat partagé, ne pas modifier)"""
+        tokens = tokenize(text)
+        hits = []
+        state = 0
+        for i, tok in enumerate(tokens):
+            while state and tok not in self._goto[state]:
+                state = self._fail[state]
+            state = self._goto[state].get(tok, 0)
+            for category, value, length in self._out[state]:
+                hits.append((category, value, i + 1 - length, i + 1))
+        return Analysis(tokens, hits)
+
+    def exact(self, text: str, category: str) -> Optional[str]:
+        return self.analyze(text).exact(category)
+
+    def get_stats(self) -> Dict[str, Any]:
+        cache = self.analyze.cache_info()
+        return {"patterns": self.patterns, "states": len(self._goto), "categories": len(VOCABULARY),
+                "cache_hits": cache.hits, "cache_misses": cache.misses}
+
+
+# Instance globale
+lexicon = Lexicon(VOCABULARY)
@@ -4,12 +4,19 @@ import os, re, logging, requests
 from typing import Dict, Any, Optional, List
 from .auth_core import get_session, build_response, normalize  # sessions/menus centralisés
 from .smart_fallback import detect_intent_change
-from .geocoding_service import format_mission_for_livreur, estimate_distance_from_addresses
+from .lexicon import lexicon
+from .geocoding_service import format_mission_for_livreur, batch_mission_distances, parse_coords
+from .gazetteer import gazetteer
+from .spatial_index import mission_index
+from .mission_broadcast import driver_registry, mission_broadcaster
+from .backend_warmth import backend_warmth
 
 logger = logging.getLogger(__name__)
 
 API_BASE = os.getenv("TOKTOK_BASE_URL", "https://toktok-bsfz.onrender.com")
 TIMEOUT = int(os.getenv("TOKTOK_TIMEOUT", "15"))
+MISSION_SEARCH_RADIUS_KM = float(os.getenv("TOKTOK_MISSION_RADIUS_KM", "15"))
+MAX_LISTED_MISSIONS = int(os.getenv("TOKTOK_MAX_LISTED_MISSIONS", "40"))  # Affichées page par page
 
 # Boutons (≤ 20 caractères pour WhatsApp). Max 3 par message via build_response.
 MAIN_MENU_BTNS = ["📋 Missions", "🚴 Mes missions", "🔄 Statut"]
@@ -44,10 +51,50 @@ def api_request(session: Dict[str, Any], method: str, path: str, **kwargs) -> re
     token = (session.get("auth") or {}).get("access")
     if token:
         headers["Authorization"] = f"Bearer {token}"
-    r = requests.request(method, url, headers=headers, timeout=TIMEOUT, **kwargs)
+    r = backend_warmth.request(method, url, headers=headers, timeout=TIMEOUT, **kwargs)
     logger.debug(f"[API-L] {method} {path} -> {r.status_code}")
     return r
 
+def _driver_position(session: Dict[str, Any]) -> Optional[tuple]:
+    """Dernière position partagée par le livreur (lat, lng) ou None."""
+    loc = session.get("last_location") or {}
+    if loc.get("latitude") is not None and loc.get("longitude") is not None:
+        try:
+            return (float(loc["latitude"]), float(loc["longitude"]))
+        except (TypeError, ValueError):
+            return None
+    return parse_coords(loc.get("coords"))
+
+def _sync_mission_index(missions: List[Dict[str, Any]]) -> None:
+    """Aligne l'index spatial sur la liste des missions ouvertes (sans appel réseau)."""
+    items = {}
+    for d in missions:
+        mid = d.get("id")
+        if mid is None:
+            continue
+        known = mission_index.get(mid)
+        coords_raw = d.get("coordonnees_recuperation")
+        # Mission déjà indexée et inchangée : on garde sa position
+        if known and (known[2] or {}).get("coords") == coords_raw:
+            items[mid] = (known[0], known[1], known[2])
+            continue
+        point = parse_coords(coords_raw) or gazetteer.geocode(d.get("adresse_recuperation") or "")
+        if point:
+            items[mid] = (point[0], point[1], {"coords": coords_raw})
+    mission_index.sync(items)
+
+def _rank_missions(session: Dict[str, Any], missions: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    """Missions les plus proches du livreur d'abord, puis les autres dans l'ordre de l'API."""
+    position = _driver_position(session)
+    if not position:
+        return missions[:MAX_LISTED_MISSIONS]
+    nearest = mission_index.nearest(position[0], position[1], k=MAX_LISTED_MISSIONS, radius_km=MISSION_SEARCH_RADIUS_KM)
+    by_id = {str(d.get("id")): d for d in missions}
+    ranked = [by_id[key] for key, _, _ in nearest if key in by_id]
+    seen = {str(d.get("id")) for d in ranked}
+    ranked += [d for d in missions if str(d.get("id")) not in seen]
+    return ranked[:MAX_LISTED_MISSIONS]
+
 # ---------- Disponibilité ----------
 def toggle_disponibilite(session: Dict[str, Any]) -> Dict[str, Any]:
     me = api_request(session, "GET", "/api/v1/auth/livreurs/my_profile/")
@@ -62,6 +109,7 @@ def toggle_disponibilite(session: Dict[str, Any]) -> Dict[str, Any]:
     if r.status_code in (200, 202):
         me2 = api_request(session, "GET", "/api/v1/auth/livreurs/my_profile/")
         dispo = me2.json().get("disponible", False) if me2.status_code == 200 else False
+        driver_registry.set_available(session.get("phone"), dispo)
         etat = "🟢 Disponible (En ligne)" if dispo else "🔴 Indisponible (Hors ligne)"
         return build_response(f"✅ Statut mis à jour : {etat}", MAIN_MENU_BTNS)
 
@@ -84,27 +132,29 @@ def list_missions_disponibles(session: Dict[str, Any]) -> Dict[str, Any]:
             MAIN_MENU_BTNS + ["🔙 Retour"]
         )
 
-    arr = arr[:5]  # Afficher jusqu'à 5 missions
+    # Index spatial des missions ouvertes, puis tri par distance au livreur
+    _sync_mission_index(arr)
+    arr = _rank_missions(session, arr)  # Liste complète, paginée à l'affichage
     session.setdefault("ctx", {})["last_list"] = [d.get("id") for d in arr]
 
+    # Distances de toutes les missions en une seule passe
+    distances = batch_mission_distances(arr, _driver_position(session))
+
     rows = []
-    for d in arr:
+    for d, dist_info in zip(arr, distances):
         mid = d.get("id")
         depart = d.get("adresse_recuperation") or "Adresse inconnue"
         dest = d.get("adresse_livraison") or "Adresse inconnue"
-        coords_depart = d.get("coordonnees_recuperation")
-        coords_dest = d.get("coordonnees_livraison")
         valeur = d.get("valeur_produit", 0)
         
-        # Calculer la distance
-        dist_info = estimate_distance_from_addresses(depart, dest, coords_depart, coords_dest)
-        
         # Titre de la liste (max 24 chars)
         title = f"Mission #{mid}"
         
         # Description (max 72 chars) avec distance si disponible
         if dist_info["success"]:
             description = f"{dist_info['distance_text']} • {dist_info['estimated_time']} • {_fmt_xaf(valeur)} F"
+            if dist_info["to_pickup_km"] is not None:
+                description = f"🚴 {dist_info['to_pickup_km']} km • " + description
         else:
             description = f"{depart[:30]}... → {dest[:20]}..."
         
@@ -166,18 +216,16 @@ def list_mes_missions(session: Dict[str, Any]) -> Dict[str, Any]:
             MAIN_MENU_BTNS + ["🔙 Retour"]
         )
 
+    shown = en_cours[:MAX_LISTED_MISSIONS]
+    distances = batch_mission_distances(shown)
+
     rows = []
-    for d in en_cours[:5]:
+    for d, dist_info in zip(shown, distances):
         mid = d.get("id")
         statut_raw = d.get("statut") or "—"
         statut = statut_raw.replace("_", " ").title()
         depart = d.get("adresse_recuperation", "—")
         dest = d.get("adresse_livraison", "—")
-        coords_depart = d.get("coordonnees_recuperation")
-        coords_dest = d.get("coordonnees_livraison")
-        
-        # Calculer la distance
-        dist_info = estimate_distance_from_addresses(depart, dest, coords_depart, coords_dest)
         
         # Titre (max 24 chars)
         title = f"Mission #{mid}"
@@ -297,6 +345,8 @@ def accepter_mission(session: Dict[str, Any], mission_id: str) -> Dict[str, Any]
         return build_response("😕 Impossible d'accepter cette mission (peut-être déjà prise).", MAIN_MENU_BTNS + ["🔙 Retour"])
 
     session.setdefault("ctx", {})["current_mission_id"] = mission_id
+    mission_index.remove(mission_id)  # Plus ouverte aux autres livreurs
+    mission_broadcaster.cancel(mission_id)
     
     # Message premium de confirmation
     msg = (
@@ -478,6 +528,9 @@ def set_statut_simple(session: Dict[str, Any], statut: str) -> Dict[str, Any]:
     return _update_statut(session, liv_id, statut)
 
 def update_position(session: Dict[str, Any], lat: float, lng: float, livraison_id: Optional[str] = None) -> Dict[str, Any]:
+    # Position connue du registre : alertes des nouvelles missions à proximité
+    driver_registry.update_position(session.get("phone"), lat, lng)
+
     liv_id = livraison_id or (session.get("ctx") or {}).get("current_livraison_id")
     if not liv_id:
         return build_response("❌ Aucune livraison active à mettre à jour.", _buttons("🚴 Mes missions", BTN_MENU, "🔙 Retour"))
@@ -534,9 +587,11 @@ def handle_message(
 ) -> Dict[str, Any]:
     t = normalize(text); tl = t.lower().strip()
     session = get_session(phone)
+    lex = lexicon.analyze(tl)  # Boutons reconnus en un seul passage
+    action = lex.exact("livreur")
 
     # Gestion bouton retour contextuel
-    if tl in {"retour", "back", "🔙 retour"}:
+    if lex.exact("nav") == "retour":
         # Pour livreur, retour simple au menu principal
         # (pas de wizard multi-étapes comme client/inscription)
         session["step"] = "MENU"
@@ -553,14 +608,14 @@ def handle_message(
         return update_position(session, lat, lng)
 
     # Disponibilité (toggle)
-    if tl in {"basculer","toggle","statut","en ligne","hors ligne","basculer en ligne","basculer hors ligne","🔄 statut"}:
+    if action == "statut":
         return toggle_disponibilite(session)
 
     # Menus
-    if tl in {"📋 missions","missions","missions dispo","disponibles","📋 missions dispo"}:
+    if action == "missions":
         return list_missions_disponibles(session)
 
-    if tl in {"🚴 mes missions","mes missions","mes","mes courses"}:
+    if action == "mes_missions":
         return list_mes_missions(session)
 
     # Détails / Accepter / Refuser (texte libre ou boutons)
@@ -609,13 +664,13 @@ def handle_message(
         return refuser_mission(session, mid)
 
     # Actions directes
-    if tl in {"▶️ démarrer","démarrer","demarrer","start"}:
+    if action == "demarrer":
         return action_demarrer(session)
 
-    if tl in {"📍 pickup","pickup","arrivé pickup","arrive pickup"}:
+    if action == "pickup":
         return action_arrive_pickup(session)
 
-    if tl in {"✅ livrée","livree","livrée"}:
+    if action == "livree":
         return action_livree(session)
 
     # Mise à jour simple de statut (avancé)
@@ -625,7 +680,7 @@ def handle_message(
             return build_response("❌ Statut inconnu. Ex: en_route_recuperation, recupere, livree.", MAIN_MENU_BTNS)
         return set_statut_simple(session, s)
 
-    if tl in {"historique","history"}:
+    if action == "historique":
         return handle_history(session)
 
     # === GESTION DES SÉLECTIONS DE LISTE INTERACTIVE ===
@@ -0,0 +1,199 @@
+# chatbot/llm_cache.py
+"""
+Cache persistant des réponses LLM (SQLite)
+Clé : (fonction, étape, flow, saisie normalisée) ; TTL et taille bornée,
+partagé entre workers ; désactivable par appel quand le contexte compte.
+Fichier lisible par le seul utilisateur du service (répertoire 0700, fichier 0600)
+"""
+import os
+import json
+import time
+import sqlite3
+import hashlib
+import logging
+import tempfile
+import threading
+from typing import Dict, Any, Optional, Callable
+
+from .gazetteer import fold
+
+logger = logging.getLogger(__name__)
+
+# Configuration
+LLM_CACHE_ENABLED = os.getenv("TOKTOK_LLM_CACHE_ENABLED", "1") not in ("0", "false", "False")
+LLM_CACHE_DIR = os.path.join(tempfile.gettempdir(), f"toktok-{os.getuid() if hasattr(os, 'getuid') else 'app'}")
+LLM_CACHE_PATH = os.getenv("TOKTOK_LLM_CACHE_PATH", os.path.join(LLM_CACHE_DIR, "llm_cache.sqlite3"))
+LLM_CACHE_TTL = int(os.getenv("TOKTOK_LLM_CACHE_TTL", "86400"))  # 24 h
+LLM_CACHE_MAX_ENTRIES = int(os.getenv("TOKTOK_LLM_CACHE_MAX_ENTRIES", "5000"))
+PRUNE_EVERY = 100  # Écritures entre deux purges
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS llm_cache (
+    key TEXT PRIMARY KEY,
+    function TEXT NOT NULL,
+    value TEXT NOT NULL,
+    latency_ms REAL NOT NULL DEFAULT 0,
+    created_at REAL NOT NULL,
+    last_hit REAL NOT NULL,
+    hits INTEGER NOT NULL DEFAULT 0
+)
+"""
+
+
+# Types de saisie dont la valeur extraite est une donnée personnelle : jamais écrite sur disque
+PRIVATE_EXPECTED_TYPES = {"phone", "name"}
+
+# Fonctions qui ne renvoient qu'une intention : la ponctuation et les accents n'y changent rien
+INTENT_ONLY_FUNCTIONS = {"detect_intent_change"}
+
+
+def normalize_input(text: str, fold_punctuation: bool = False) -> str:
+    """
+    Saisie normalisée pour la clé
+
+    Args:
+        text: Saisie utilisateur brute
+        fold_punctuation: True = aussi sans accents ni ponctuation (intentions seulement ;
+                          "jean.dupont@x.cg" et "12.500" doivent garder leur propre valeur extraite)
+    """
+    if fold_punctuation:
+        return fold(text or "")
+    return " ".join((text or "").lower().split())
+
+
+def make_key(function: str, text: str, step: str = "", flow: str = "") -> str:
+    # Sans le modèle : la passerelle peut répondre via OpenAI ou OpenRouter, inconnu avant l'appel
+    normalized = normalize_input(text, fold_punctuation=function in INTENT_ONLY_FUNCTIONS)
+    raw = "\x1f".join([function, step or "", flow or "", normalized])
+    return hashlib.sha1(raw.encode("utf-8")).hexdigest()
+
+
+class LLMResponseCache:
+    """Réponses LLM déjà obtenues, réutilisées tant qu'elles sont fraîches"""
+
+    def __init__(self, path: str = LLM_CACHE_PATH, ttl: int = LLM_CACHE_TTL,
+                 max_entries: int = LLM_CACHE_MAX_ENTRIES, enabled: bool = LLM_CACHE_ENABLED):
+        self.path = path
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.enabled = enabled
+        self._conn: Optional[sqlite3.Connection] = None
+        self._lock = threading.Lock()
+        self._writes = 0
+        self.stats = {"hits": 0, "misses": 0, "bypassed": 0, "errors": 0, "saved_latency_ms": 0.0}
+
+    def _db(self) -> sqlite3.Connection:
+        if self._conn is None:
+            directory = os.path.dirname(self.path)
+            if directory and not os.path.isdir(directory):
+                os.makedirs(directory, mode=0o700, exist_ok=True)
+            # Créé 0600 avant que SQLite l'ouvre (les fichiers -wal / -shm héritent de ces droits)
+            os.close(os.open(self.path, os.O_RDWR | os.O_CREAT, 0o600))
+            os.chmod(self.path, 0o600)
+            self._conn = sqlite3.connect(self.path, timeout=2, check_same_thread=False)
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute(_SCHEMA)
+            self._conn.commit()
+        return self._conn
+
+    def get(self, key: str) -> Optional[Any]:
+        """Valeur en cache (None si absente ou expirée)"""
+        now = time.time()
+        try:
+            with self._lock:
+                db = self._db()
+                row = db.execute("SELECT value, latency_ms, created_at FROM llm_cache WHERE key = ?", (key,)).fetchone()
+                if row is None or now - row[2] > self.ttl:
+                    self.stats["misses"] += 1
+                    return None
+                db.execute("UPDATE llm_cache SET hits = hits + 1, last_hit = ? WHERE key = ?", (now, key))
+                db.commit()
+                self.stats["hits"] += 1
+                self.stats["saved_latency_ms"] += row[1]
+            return json.loads(row[0])
+        except (sqlite3.Error, ValueError) as e:
+            self.stats["errors"] += 1
+            logger.warning(f"[LLM_CACHE] Lecture impossible: {e}")
+            return None
+
+    def set(self, key: str, function: str, value: Any, latency_ms: float = 0.0):
+        """Enregistre une réponse (purge périodique des entrées expirées / excédentaires)"""
+        now = time.time()
+        try:
+            with self._lock:
+                db = self._db()
+                db.execute(
+                    "INSERT OR REPLACE INTO llm_cache (key, function, value, latency_ms, created_at, last_hit, hits) "
+                    "VALUES (?, ?, ?, ?, ?, ?, 0)",
+                    (key, function, json.dumps(value, ensure_ascii=False), latency_ms, now, now),
+                )
+                self._writes += 1
+                if self._writes % PRUNE_EVERY == 0:
+                    self._prune(db, now)
+                db.commit()
+        except (sqlite3.Error, TypeError, ValueError) as e:
+            self.stats["errors"] += 1
+            logger.warning(f"[LLM_CACHE] Écriture impossible: {e}")
+
+    def _prune(self, db: sqlite3.Connection, now: float):
+        db.execute("DELETE FROM llm_cache WHERE created_at < ?", (now - self.ttl,))
+        excess = db.execute("SELECT COUNT(*) FROM llm_cache").fetchone()[0] - self.max_entries
+        if excess > 0:
+            db.execute(
+                "DELETE FROM llm_cache WHERE key IN (SELECT key FROM llm_cache ORDER BY last_hit ASC LIMIT ?)",
+                (excess,),
+            )
+
+    def cached_call(self, function: str, text: str, compute: Callable[[], Any], step: str = "",
+                    flow: str = "", use_cache: bool = True) -> Any:
+        """
+        Renvoie la réponse en cache ou appelle compute() et mémorise son résultat
+
+        Args:
+            function: Nom de la fonction appelante (fait partie de la clé)
+            text: Saisie utilisateur (normalisée pour la clé)
+            compute: Appel LLM réel ; ses exceptions sont propagées et rien n'est mis en cache
+            step, flow: Autres composantes de la clé
+            use_cache: False quand la réponse dépend d'un contexte absent de la clé
+                       ou contient une donnée personnelle (PRIVATE_EXPECTED_TYPES)
+        """
+        if not (self.enabled and use_cache):
+            self.stats["bypassed"] += 1
+            return compute()
+
+        key = make_key(function, text, step, flow)
+        cached = self.get(key)
+        if cached is not None:
+            logger.debug(f"[LLM_CACHE] HIT {function} '{text[:40]}'")
+            return cached
+
+        t0 = time.perf_counter()
+        result = compute()
+        if result is not None:
+            self.set(key, function, result, (time.perf_counter() - t0) * 1000)
+        return result
+
+    def clear(self):
+        with self._lock:
+            self._db().execute("DELETE FROM llm_cache")
+            self._db().commit()
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Taux de succès et latence LLM économisée"""
+        lookups = self.stats["hits"] + self.stats["misses"]
+        try:
+            with self._lock:
+                entries = self._db().execute("SELECT COUNT(*) FROM llm_cache").fetchone()[0]
+        except sqlite3.Error:
+            entries = None
+        return {
+            **self.stats,
+            "saved_latency_ms": round(self.stats["saved_latency_ms"], 1),
+            "hit_rate": round(self.stats["hits"] / lookups, 4) if lookups else 0,
+            "entries": entries,
+            "enabled": self.enabled,
+        }
+
+
+# Instance globale
+llm_cache = LLMResponseCache()
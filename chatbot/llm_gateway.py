@@ -0,0 +1,247 @@
+# chatbot/llm_gateway.py
+"""
+Passerelle LLM : OpenAI et OpenRouter derrière un seul appel
+Échéance par appel et par tour ; si le premier fournisseur n'a pas répondu
+au percentile de latence observé, requête de couverture (hedge) vers le
+second, la première réponse gagne et l'autre est abandonnée. Échéance
+dépassée : LLMDeadlineExceeded, l'appelant bascule sur les règles
+"""
+import os
+import time
+import logging
+import threading
+from collections import deque
+from contextlib import contextmanager
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+from typing import Dict, Any, Optional, List
+
+from openai import OpenAI
+
+from .llm_metering import llm_meter
+
+logger = logging.getLogger(__name__)
+
+# Configuration
+OPENAI_API_KEY = os.getenv("OPENAI_API_KEY", "").strip()
+OPENAI_MODEL = os.getenv("OPENAI_MODEL", "gpt-4o-mini").strip()
+OPENAI_BASE_URL = os.getenv("OPENAI_BASE_URL", "https://api.openai.com/v1").strip()  # Faux serveur : fake_llm_server
+OPENROUTER_API_KEY = os.getenv("OPENROUTER_API_KEY", "").strip()
+OPENROUTER_MODEL = os.getenv("OPENROUTER_MODEL", "openai/gpt-4o-mini").strip()
+OPENROUTER_BASE_URL = os.getenv("OPENROUTER_BASE_URL", "https://openrouter.ai/api/v1").strip()
+
+LLM_PRIMARY = os.getenv("TOKTOK_LLM_PRIMARY", "openai")  # Fournisseur essayé en premier
+LLM_CALL_DEADLINE_MS = int(os.getenv("TOKTOK_LLM_DEADLINE_MS", "6000"))
+LLM_TURN_DEADLINE_MS = int(os.getenv("TOKTOK_LLM_TURN_DEADLINE_MS", "8000"))
+LLM_HEDGE_PERCENTILE = float(os.getenv("TOKTOK_LLM_HEDGE_PERCENTILE", "90"))
+LLM_HEDGE_DEFAULT_MS = int(os.getenv("TOKTOK_LLM_HEDGE_AFTER_MS", "2500"))  # Tant que l'historique est trop court
+LLM_HEDGE_MIN_MS = 300
+HEDGE_MIN_SAMPLES = 20
+LATENCY_WINDOW = 200
+MAX_WORKERS = int(os.getenv("TOKTOK_LLM_WORKERS", "8"))
+
+_turn = threading.local()
+
+
+class LLMDeadlineExceeded(Exception):
+    """Aucun fournisseur n'a répondu avant l'échéance"""
+
+
+class LLMUnavailable(Exception):
+    """Aucun fournisseur configuré, ou tous en échec"""
+
+
+class Provider:
+    """Un fournisseur compatible API OpenAI et l'historique de ses latences"""
+
+    def __init__(self, name: str, client: Any, model: str):
+        self.name = name
+        self.client = client
+        self.model = model
+        self.latencies = deque(maxlen=LATENCY_WINDOW)
+        self._lock = threading.Lock()
+
+    def record(self, latency_ms: float):
+        with self._lock:
+            self.latencies.append(latency_ms)
+
+    def percentile(self, q: float) -> Optional[float]:
+        """Percentile q des latences récentes (None si historique trop court)"""
+        with self._lock:
+            samples = sorted(self.latencies)
+        if len(samples) < HEDGE_MIN_SAMPLES:
+            return None
+        return samples[min(len(samples) - 1, int(len(samples) * q / 100))]
+
+    def complete(self, messages: List[Dict[str, str]], timeout_s: float, **kwargs):
+        t0 = time.perf_counter()
+        completion = self.client.chat.completions.create(
+            model=self.model, messages=messages, timeout=timeout_s, **kwargs
+        )
+        self.record((time.perf_counter() - t0) * 1000)
+        return completion
+
+
+def _remaining_ms(call_deadline_ms: Optional[int]) -> float:
+    """Temps restant : échéance de l'appel bornée par celle du tour en cours"""
+    remaining = float(call_deadline_ms or LLM_CALL_DEADLINE_MS)
+    turn_deadline = getattr(_turn, "deadline", None)
+    if turn_deadline is not None:
+        remaining = min(remaining, (turn_deadline - time.monotonic()) * 1000)
+    return remaining
+
+
+@contextmanager
+def turn_deadline(deadline_ms: int = LLM_TURN_DEADLINE_MS):
+    """
+    Budget commun à tous les appels LLM d'un tour (message WhatsApp)
+
+    Usage:
+        with turn_deadline():
+            handle_incoming(...)
+    """
+    previous = getattr(_turn, "deadline", None)
+    _turn.deadline = time.monotonic() + deadline_ms / 1000
+    try:
+        yield
+    finally:
+        _turn.deadline = previous
+
+
+class LLMGateway:
+    """Appels chat completions avec échéance, couverture et bascule entre fournisseurs"""
+
+    def __init__(self, providers: List[Provider]):
+        self.providers = providers
+        self._executor = ThreadPoolExecutor(max_workers=MAX_WORKERS, thread_name_prefix="llm")
+        self._lock = threading.Lock()
+        self.stats = {"calls": 0, "primary_won": 0, "hedges": 0, "hedge_won": 0,
+                      "failovers": 0, "deadline_exceeded": 0, "errors": 0}
+
+    @property
+    def available(self) -> bool:
+        return bool(self.providers)
+
+    def _count(self, key: str):
+        with self._lock:
+            self.stats[key] += 1
+
+    def _hedge_after_ms(self, provider: Provider) -> float:
+        observed = provider.percentile(LLM_HEDGE_PERCENTILE)
+        return max(LLM_HEDGE_MIN_MS, observed if observed is not None else LLM_HEDGE_DEFAULT_MS)
+
+    def complete(self, messages: List[Dict[str, str]], deadline_ms: Optional[int] = None,
+                 function: str = "llm", flow: str = "", step: str = "", **kwargs):
+        """
+        Chat completion (mêmes paramètres que l'API OpenAI, sans model)
+
+        Args:
+            messages: Messages system / user
+            deadline_ms: Échéance de cet appel (défaut TOKTOK_LLM_DEADLINE_MS), bornée par le tour
+            function, flow, step: Site d'appel (comptage et quotas)
+            **kwargs: temperature, max_tokens, response_format...
+
+        Returns:
+            Completion du premier fournisseur ayant répondu
+
+        Raises:
+            LLMDeadlineExceeded: échéance atteinte sans réponse
+            LLMUnavailable: aucun fournisseur ou tous en échec
+            LLMQuotaExceeded: quota utilisateur ou global atteint
+        """
+        if not self.providers:
+            raise LLMUnavailable("Aucun fournisseur LLM configuré")
+        llm_meter.acquire(function, flow, step)
+        t0 = time.perf_counter()
+        try:
+            completion = self._complete(messages, deadline_ms, **kwargs)
+        except LLMDeadlineExceeded:
+            llm_meter.record(function, flow, step, "deadline", (time.perf_counter() - t0) * 1000)
+            raise
+        except Exception:
+            llm_meter.record(function, flow, step, "error", (time.perf_counter() - t0) * 1000)
+            raise
+        llm_meter.record(function, flow, step, "ok", (time.perf_counter() - t0) * 1000,
+                         getattr(completion, "usage", None))
+        return completion
+
+    def _complete(self, messages: List[Dict[str, str]], deadline_ms: Optional[int], **kwargs):
+        self._count("calls")
+        remaining = _remaining_ms(deadline_ms)
+        if remaining <= 0:
+            self._count("deadline_exceeded")
+            raise LLMDeadlineExceeded("Budget du tour épuisé")
+        end = time.monotonic() + remaining / 1000
+
+        def submit(provider: Provider):
+            return self._executor.submit(provider.complete, messages, max(0.1, end - time.monotonic()), **kwargs)
+
+        primary, backups = self.providers[0], list(self.providers[1:])
+        pending = {submit(primary): primary}
+        hedge_at = time.monotonic() + min(remaining, self._hedge_after_ms(primary)) / 1000
+        last_error = None
+
+        while pending:
+            now = time.monotonic()
+            if now >= end:
+                break
+            # Avant le seuil de couverture, on n'attend que jusqu'au seuil
+            timeout = (hedge_at if backups else end) - now
+            done, _ = wait(pending, timeout=max(0, min(timeout, end - now)), return_when=FIRST_COMPLETED)
+            for future in done:
+                provider = pending.pop(future)
+                try:
+                    completion = future.result()
+                except Exception as e:
+                    last_error = e
+                    self._count("errors")
+                    logger.warning(f"[LLM] {provider.name} en échec: {e}")
+                    continue
+                self._count("primary_won" if provider is primary else "hedge_won")
+                for loser in pending:
+                    loser.cancel()  # Non démarrée : annulée ; en cours : bornée par l'échéance, ignorée
+                return completion
+            if not backups:
+                continue
+            if not pending:
+                self._count("failovers")
+            elif time.monotonic() >= hedge_at:
+                self._count("hedges")
+                logger.info(f"[LLM] {primary.name} > {self._hedge_after_ms(primary):.0f} ms, couverture")
+            else:
+                continue
+            backup = backups.pop(0)
+            pending[submit(backup)] = backup
+
+        if pending:
+            for future in pending:
+                future.cancel()
+            self._count("deadline_exceeded")
+            logger.warning(f"[LLM] Échéance {remaining:.0f} ms dépassée, bascule sur les règles")
+            raise LLMDeadlineExceeded(f"Pas de réponse en {remaining:.0f} ms")
+        raise LLMUnavailable(f"Tous les fournisseurs en échec: {last_error}")
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Compteurs et seuils de couverture par fournisseur"""
+        with self._lock:
+            snapshot = dict(self.stats)
+        snapshot["providers"] = {
+            p.name: {"model": p.model, "p50_ms": p.percentile(50), "hedge_after_ms": round(self._hedge_after_ms(p))}
+            for p in self.providers
+        }
+        return snapshot
+
+
+def _build_providers() -> List[Provider]:
+    providers = []
+    if OPENAI_API_KEY:
+        client = OpenAI(api_key=OPENAI_API_KEY, base_url=OPENAI_BASE_URL, max_retries=0)
+        providers.append(Provider("openai", client, OPENAI_MODEL))
+    if OPENROUTER_API_KEY:
+        client = OpenAI(api_key=OPENROUTER_API_KEY, base_url=OPENROUTER_BASE_URL, max_retries=0)
+        providers.append(Provider("openrouter", client, OPENROUTER_MODEL))
+    providers.sort(key=lambda p: p.name != LLM_PRIMARY)
+    return providers
+
+
+# Instance globale
+llm_gateway = LLMGateway(_build_providers())
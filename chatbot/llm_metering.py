@@ -0,0 +1,195 @@
+# chatbot/llm_metering.py
+"""
+Comptage des appels LLM et quotas
+Latence, tokens, coût estimé et issue (ok / échéance / erreur / quota) par
+fonction, flow et étape ; quotas glissants par utilisateur et global. Quota
+atteint : LLMQuotaExceeded, l'appelant reprend le chemin déterministe
+"""
+import os
+import time
+import logging
+import threading
+from collections import deque, defaultdict
+from contextlib import contextmanager
+from typing import Dict, Any, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+# Configuration
+LLM_USER_QUOTA = int(os.getenv("TOKTOK_LLM_USER_QUOTA", "40"))  # Appels par utilisateur et par fenêtre (0 = illimité)
+LLM_USER_QUOTA_WINDOW = int(os.getenv("TOKTOK_LLM_USER_QUOTA_WINDOW", "3600"))
+LLM_GLOBAL_QUOTA = int(os.getenv("TOKTOK_LLM_GLOBAL_QUOTA", "2000"))  # Tous utilisateurs confondus (0 = illimité)
+LLM_GLOBAL_QUOTA_WINDOW = int(os.getenv("TOKTOK_LLM_GLOBAL_QUOTA_WINDOW", "3600"))
+PRICE_INPUT_PER_1M = float(os.getenv("TOKTOK_LLM_PRICE_INPUT_PER_1M", "0.15"))  # USD, gpt-4o-mini
+PRICE_OUTPUT_PER_1M = float(os.getenv("TOKTOK_LLM_PRICE_OUTPUT_PER_1M", "0.60"))
+LATENCY_SAMPLES = 500  # Par (fonction, flow, étape)
+MAX_TRACKED_USERS = int(os.getenv("TOKTOK_LLM_MAX_TRACKED_USERS", "1000"))  # Compteur des plus gros consommateurs
+PRUNE_EVERY = 500  # Réservations entre deux purges des fenêtres inactives
+
+OUTCOMES = ("ok", "deadline", "error", "quota")
+
+_user = threading.local()
+
+
+class LLMQuotaExceeded(Exception):
+    """Quota d'appels LLM atteint (utilisateur ou global)"""
+
+
+@contextmanager
+def for_user(phone: Optional[str]):
+    """Rattache les appels LLM du bloc à un utilisateur (quota et statistiques)"""
+    previous = getattr(_user, "phone", None)
+    _user.phone = phone
+    try:
+        yield
+    finally:
+        _user.phone = previous
+
+
+def current_user() -> Optional[str]:
+    return getattr(_user, "phone", None)
+
+
+class _Bucket:
+    """Agrégats d'un (fonction, flow, étape)"""
+
+    __slots__ = ("outcomes", "latencies", "prompt_tokens", "completion_tokens")
+
+    def __init__(self):
+        self.outcomes = dict.fromkeys(OUTCOMES, 0)
+        self.latencies = deque(maxlen=LATENCY_SAMPLES)
+        self.prompt_tokens = 0
+        self.completion_tokens = 0
+
+
+def _percentile(samples, q: float) -> Optional[float]:
+    if not samples:
+        return None
+    ordered = sorted(samples)
+    return round(ordered[min(len(ordered) - 1, int(len(ordered) * q / 100))], 1)
+
+
+class LLMMeter:
+    """Compteurs par site d'appel et fenêtres glissantes des quotas"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.buckets: Dict[Tuple[str, str, str], _Bucket] = defaultdict(_Bucket)
+        self.user_calls: Dict[str, int] = defaultdict(int)
+        self._user_windows: Dict[str, deque] = {}
+        self._global_window: deque = deque()
+        self._acquired = 0
+
+    def acquire(self, function: str, flow: str = "", step: str = ""):
+        """
+        Réserve un appel dans les quotas de l'utilisateur courant et global
+
+        Raises:
+            LLMQuotaExceeded: quota atteint (l'appel est compté comme refusé)
+        """
+        phone = current_user()
+        now = time.monotonic()
+        with self._lock:
+            self._acquired += 1
+            if self._acquired % PRUNE_EVERY == 0:
+                self._prune_windows(now)
+            exceeded = None
+            if LLM_GLOBAL_QUOTA:
+                window = self._global_window
+                while window and now - window[0] > LLM_GLOBAL_QUOTA_WINDOW:
+                    window.popleft()
+                if len(window) >= LLM_GLOBAL_QUOTA:
+                    exceeded = "global"
+            if phone and LLM_USER_QUOTA and not exceeded:
+                window = self._user_windows.setdefault(phone, deque())
+                while window and now - window[0] > LLM_USER_QUOTA_WINDOW:
+                    window.popleft()
+                if len(window) >= LLM_USER_QUOTA:
+                    exceeded = "utilisateur"
+            if exceeded:
+                self.buckets[(function, flow, step)].outcomes["quota"] += 1
+            else:
+                if LLM_GLOBAL_QUOTA:
+                    self._global_window.append(now)
+                if phone and LLM_USER_QUOTA:
+                    self._user_windows[phone].append(now)
+        if exceeded:
+            logger.warning(f"[LLM_METER] Quota {exceeded} atteint ({function}/{flow}/{step}), chemin déterministe")
+            raise LLMQuotaExceeded(f"Quota {exceeded} atteint")
+
+    def record(self, function: str, flow: str, step: str, outcome: str, latency_ms: float,
+               usage: Any = None):
+        """
+        Enregistre un appel terminé
+
+        Args:
+            outcome: ok, deadline ou error
+            usage: completion.usage (prompt_tokens, completion_tokens) si disponible
+        """
+        prompt_tokens = getattr(usage, "prompt_tokens", None) or 0
+        completion_tokens = getattr(usage, "completion_tokens", None) or 0
+        phone = current_user()
+        with self._lock:
+            bucket = self.buckets[(function, flow, step)]
+            bucket.outcomes[outcome] += 1
+            bucket.latencies.append(latency_ms)
+            bucket.prompt_tokens += prompt_tokens
+            bucket.completion_tokens += completion_tokens
+            if phone:
+                self.user_calls[phone] += 1
+                if len(self.user_calls) > MAX_TRACKED_USERS:
+                    self._trim_user_calls()
+        logger.debug(f"[LLM_METER] {function}/{flow}/{step} {outcome} {latency_ms:.0f} ms "
+                     f"{prompt_tokens}+{completion_tokens} tokens")
+
+    def _prune_windows(self, now: float):
+        """Sous verrou : oublie les fenêtres d'utilisateurs inactifs"""
+        for phone in [p for p, w in self._user_windows.items()
+                      if not w or now - w[-1] > LLM_USER_QUOTA_WINDOW]:
+            del self._user_windows[phone]
+
+    def _trim_user_calls(self):
+        """Sous verrou : ne garde que la moitié la plus consommatrice du compteur (mémoire bornée)"""
+        keep = sorted(self.user_calls.items(), key=lambda kv: kv[1], reverse=True)[:MAX_TRACKED_USERS // 2]
+        self.user_calls = defaultdict(int, keep)
+
+    def prune(self):
+        """Oublie les fenêtres d'utilisateurs inactifs et borne le compteur par utilisateur"""
+        with self._lock:
+            self._prune_windows(time.monotonic())
+            if len(self.user_calls) > MAX_TRACKED_USERS:
+                self._trim_user_calls()
+
+    def get_stats(self, top_users: int = 5) -> Dict[str, Any]:
+        """Par fonction/flow/étape : appels, issues, latences p50/p95, tokens, coût ; plus gros consommateurs"""
+        self.prune()
+        with self._lock:
+            rows = {k: (dict(b.outcomes), list(b.latencies), b.prompt_tokens, b.completion_tokens)
+                    for k, b in self.buckets.items()}
+            users = sorted(self.user_calls.items(), key=lambda kv: kv[1], reverse=True)[:top_users]
+            global_used = len(self._global_window)
+        sites = {}
+        total_cost = 0.0
+        for (function, flow, step), (outcomes, latencies, prompt, completion) in rows.items():
+            cost = (prompt * PRICE_INPUT_PER_1M + completion * PRICE_OUTPUT_PER_1M) / 1e6
+            total_cost += cost
+            sites[f"{function}/{flow or '-'}/{step or '-'}"] = {
+                "calls": sum(outcomes.values()) - outcomes["quota"],
+                **outcomes,
+                "p50_ms": _percentile(latencies, 50),
+                "p95_ms": _percentile(latencies, 95),
+                "prompt_tokens": prompt,
+                "completion_tokens": completion,
+                "cost_usd": round(cost, 6),
+            }
+        return {
+            "sites": dict(sorted(sites.items(), key=lambda kv: kv[1]["cost_usd"], reverse=True)),
+            "cost_usd": round(total_cost, 6),
+            "top_users": [{"phone": p[:3] + "****" + p[-3:] if len(p) > 6 else p, "calls": n} for p, n in users],
+            "global_quota": {"used": global_used, "limit": LLM_GLOBAL_QUOTA, "window_s": LLM_GLOBAL_QUOTA_WINDOW},
+            "user_quota": {"limit": LLM_USER_QUOTA, "window_s": LLM_USER_QUOTA_WINDOW},
+        }
+
+
+# Instance globale
+llm_meter = LLMMeter()
@@ -0,0 +1,89 @@
+# chatbot/management/commands/build_eta_tables.py
+"""
+Construit les tables de vitesse ETA à partir de l'historique TrackingGPS
+et affiche un rapport prédiction vs durée réelle sur un jeu de test
+
+Usage : python manage.py build_eta_tables [--holdout 0.2] [--report rapport.json]
+"""
+import json
+import logging
+from itertools import groupby
+
+from django.core.management.base import BaseCommand
+
+from chatbot.models import TrackingGPS
+from chatbot.eta_model import (
+    ETA_TABLES_PATH, ETA_CELL_KM, MIN_BUCKET_SECONDS,
+    ETAModel, build_tables, evaluate,
+)
+
+logger = logging.getLogger(__name__)
+
+
+def load_tracks():
+    """Une trace (epoch, lat, lon) par livraison, triée par horodatage"""
+    rows = (
+        TrackingGPS.objects
+        .order_by("livraison_id", "timestamp")
+        .values_list("livraison_id", "timestamp", "latitude", "longitude")
+        .iterator(chunk_size=5000)
+    )
+    for livraison_id, points in groupby(rows, key=lambda r: r[0]):
+        yield livraison_id, [(ts.timestamp(), float(lat), float(lon)) for _, ts, lat, lon in points]
+
+
+class Command(BaseCommand):
+    help = "Construit les tables ETA (vitesse par heure et par zone) depuis TrackingGPS"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--output", default=ETA_TABLES_PATH, help="Fichier JSON des tables")
+        parser.add_argument("--cell-km", type=float, default=ETA_CELL_KM, help="Taille des zones (km)")
+        parser.add_argument("--min-seconds", type=float, default=MIN_BUCKET_SECONDS,
+                            help="Temps cumulé minimal par case de table")
+        parser.add_argument("--holdout", type=float, default=0.2,
+                            help="Part des livraisons réservée à l'évaluation (0 = aucune)")
+        parser.add_argument("--report", default=None, help="Écrit aussi le rapport d'évaluation en JSON")
+        parser.add_argument("--dry-run", action="store_true", help="N'écrit pas les tables")
+
+    def handle(self, *args, **opts):
+        train, test = [], []
+        every = int(round(1 / opts["holdout"])) if opts["holdout"] > 0 else 0
+        for livraison_id, track in load_tracks():
+            # Répartition déterministe par identifiant de livraison
+            (test if every and livraison_id % every == 0 else train).append(track)
+
+        self.stdout.write(f"Traces : {len(train)} apprentissage, {len(test)} évaluation")
+        if not train:
+            self.stdout.write(self.style.WARNING("Aucune trace GPS exploitable, tables inchangées"))
+            return
+
+        tables = build_tables(train, cell_km=opts["cell_km"], min_bucket_seconds=opts["min_seconds"])
+        self.stdout.write(
+            f"Tables {tables['version']} : {tables['trips']} trajets, {len(tables['cells'])} zones, "
+            f"vitesse globale {tables['global_speed_kmh']} km/h, détour x{tables['detour_factor']}"
+        )
+
+        report = evaluate(ETAModel(tables), test) if test else {"trips": 0}
+        self._print_report(report)
+
+        if opts["report"]:
+            with open(opts["report"], "w", encoding="utf-8") as f:
+                json.dump({"version": tables["version"], **report}, f, ensure_ascii=False, indent=2)
+
+        if not opts["dry_run"]:
+            with open(opts["output"], "w", encoding="utf-8") as f:
+                json.dump(tables, f, ensure_ascii=False, indent=1)
+            self.stdout.write(self.style.SUCCESS(f"Tables écrites dans {opts['output']}"))
+
+    def _print_report(self, report):
+        if not report.get("trips"):
+            self.stdout.write("Évaluation : aucun trajet de test")
+            return
+        self.stdout.write(f"\nÉvaluation sur {report['trips']} trajets (minutes)")
+        self.stdout.write(f"{'':<16}{'MAE':>8}{'MAPE %':>9}{'médiane':>9}{'p90':>8}{'biais':>8}")
+        for label, key in (("Modèle appris", "model"), ("25 km/h fixe", "baseline_25kmh")):
+            m = report[key]
+            self.stdout.write(
+                f"{label:<16}{m['mae_min']:>8}{m['mape_pct']:>9}{m['median_abs_err_min']:>9}"
+                f"{m['p90_abs_err_min']:>8}{m['bias_min']:>8}"
+            )
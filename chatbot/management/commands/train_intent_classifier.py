@@ -0,0 +1,82 @@
+# chatbot/management/commands/train_intent_classifier.py
+"""
+Entraîne le classifieur d'intention local sur les exemples annotés
+et les tours journalisés (intentions décidées par l'IA), puis affiche
+un rapport d'évaluation sur un jeu de test
+
+Usage : python manage.py train_intent_classifier [--turns tours.jsonl ...] [--holdout 0.2]
+"""
+import json
+import logging
+
+from django.core.management.base import BaseCommand
+
+from chatbot.gazetteer import fold
+from chatbot.intent_classifier import (
+    INTENT_MODEL_PATH, INTENT_SEED_PATH, INTENT_LOG_PATH, INTENT_CONFIDENCE_THRESHOLD,
+    EPOCHS, LABELS, load_examples, split, train, evaluate,
+)
+
+logger = logging.getLogger(__name__)
+
+
+class Command(BaseCommand):
+    help = "Entraîne le classifieur d'intention (n-grammes + régression logistique) et l'évalue"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--seed-file", default=INTENT_SEED_PATH, help="Exemples annotés (JSONL)")
+        parser.add_argument("--turns", nargs="*", default=[INTENT_LOG_PATH] if INTENT_LOG_PATH else [],
+                            help="Tours journalisés (JSONL, TOKTOK_INTENT_LOG_PATH par défaut)")
+        parser.add_argument("--output", default=INTENT_MODEL_PATH, help="Fichier du modèle (.npz)")
+        parser.add_argument("--holdout", type=float, default=0.2, help="Part réservée à l'évaluation")
+        parser.add_argument("--threshold", type=float, default=INTENT_CONFIDENCE_THRESHOLD,
+                            help="Seuil de confiance en dessous duquel l'IA est consultée")
+        parser.add_argument("--epochs", type=int, default=EPOCHS)
+        parser.add_argument("--report", default=None, help="Écrit aussi le rapport d'évaluation en JSON")
+        parser.add_argument("--dry-run", action="store_true", help="N'écrit pas le modèle")
+
+    def handle(self, *args, **opts):
+        # Un même texte normalisé n'est compté qu'une fois (dernière annotation retenue)
+        examples = {}
+        for text, label in load_examples(opts["seed_file"], *opts["turns"]):
+            examples[fold(text)] = (text, label)
+        examples = list(examples.values())
+        if not examples:
+            self.stdout.write(self.style.WARNING("Aucun exemple, modèle inchangé"))
+            return
+
+        counts = {label: sum(1 for _, l in examples if l == label) for label in LABELS}
+        self.stdout.write(f"Exemples : {len(examples)} " + ", ".join(f"{k}={v}" for k, v in counts.items()))
+
+        report = {"examples": 0}
+        if opts["holdout"] > 0:
+            train_set, test_set = split(examples, opts["holdout"])
+            report = evaluate(train(train_set, epochs=opts["epochs"]), test_set, threshold=opts["threshold"])
+            self._print_report(report, opts["threshold"])
+
+        # Modèle final appris sur tous les exemples
+        model = train(examples, epochs=opts["epochs"])
+
+        if opts["report"]:
+            with open(opts["report"], "w", encoding="utf-8") as f:
+                json.dump({"version": model.version, **report}, f, ensure_ascii=False, indent=2)
+
+        if not opts["dry_run"]:
+            model.save(opts["output"])
+            self.stdout.write(self.style.SUCCESS(f"Modèle {model.version} écrit dans {opts['output']}"))
+
+    def _print_report(self, report, threshold):
+        if not report.get("examples"):
+            self.stdout.write("Évaluation : aucun exemple de test")
+            return
+        self.stdout.write(f"\nÉvaluation sur {report['examples']} exemples")
+        self.stdout.write(f"  exactitude          {report['accuracy']:.1%}")
+        self.stdout.write(f"  couverture ≥ {threshold:<6} {report['coverage']:.1%} (sans appel IA)")
+        if report["accuracy_confident"] is not None:
+            self.stdout.write(f"  exactitude couverte {report['accuracy_confident']:.1%}")
+        self.stdout.write(f"  latence             {report['predict_us']} µs/prédiction")
+        self.stdout.write(f"\n{'':<14}{'précision':>10}{'rappel':>8}{'n':>6}")
+        for label, m in report["per_label"].items():
+            precision = "-" if m["precision"] is None else f"{m['precision']:.2f}"
+            recall = "-" if m["recall"] is None else f"{m['recall']:.2f}"
+            self.stdout.write(f"{label:<14}{precision:>10}{recall:>8}{m['support']:>6}")
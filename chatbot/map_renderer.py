@@ -0,0 +1,247 @@
+# chatbot/map_renderer.py
+"""
+Rendu local de cartes de livraison (Pillow)
+Tuiles de fond lues sur disque (aucun service cartographique tiers),
+marqueurs départ / arrivée et tracé ; cartes mises en cache par coordonnées
+arrondies et uploadées une seule fois vers WhatsApp
+"""
+import os
+import io
+import math
+import time
+import hashlib
+import logging
+import tempfile
+import threading
+import unicodedata
+from typing import Dict, Any, Optional, Tuple, List, Sequence
+
+try:
+    from PIL import Image, ImageDraw, ImageFont
+except ImportError:  # Pillow absent : pas de carte, les appelants se rabattent sur le texte
+    Image = ImageDraw = ImageFont = None
+
+from .cache import LRUCache, cache
+from .gazetteer import gazetteer
+
+logger = logging.getLogger(__name__)
+
+# Configuration
+TILES_DIR = os.getenv("TOKTOK_MAP_TILES_DIR", os.path.join(os.path.dirname(__file__), "data", "tiles"))
+MAP_CACHE_DIR = os.getenv("TOKTOK_MAP_CACHE_DIR", os.path.join(tempfile.gettempdir(), "toktok_maps"))
+MAP_SIZE = (640, 400)
+TILE_SIZE = 256
+MIN_ZOOM, MAX_ZOOM = 10, 17
+PADDING_PX = 48
+COORD_PRECISION = 4  # ≈ 11 m : deux demandes aussi proches partagent la même carte
+MEDIA_ID_TTL = 29 * 24 * 3600  # Les media_id WhatsApp expirent après 30 jours
+
+# Couleurs
+BG_COLOR = (242, 239, 233)
+GRID_COLOR = (225, 221, 212)
+LABEL_COLOR = (120, 116, 108)
+PATH_COLOR = (33, 111, 219)
+PICKUP_COLOR = (46, 160, 67)
+DROPOFF_COLOR = (218, 54, 51)
+
+_tile_cache = LRUCache(max_size=256, name="map_tiles")
+_lock = threading.Lock()
+stats = {"renders": 0, "render_cache_hits": 0, "uploads": 0, "upload_cache_hits": 0, "render_ms_total": 0.0}
+
+Point = Tuple[float, float]
+
+
+def _to_pixel(lat: float, lon: float, zoom: int) -> Tuple[float, float]:
+    """Coordonnées pixel globales (projection Web Mercator)"""
+    scale = TILE_SIZE * (2 ** zoom)
+    x = (lon + 180.0) / 360.0 * scale
+    sin_lat = math.sin(math.radians(max(min(lat, 85.0511), -85.0511)))
+    y = (0.5 - math.log((1 + sin_lat) / (1 - sin_lat)) / (4 * math.pi)) * scale
+    return x, y
+
+
+def _fit_zoom(points: Sequence[Point], size: Tuple[int, int]) -> int:
+    """Zoom le plus fort où tous les points tiennent dans l'image"""
+    for zoom in range(MAX_ZOOM, MIN_ZOOM - 1, -1):
+        xs, ys = zip(*(_to_pixel(lat, lon, zoom) for lat, lon in points))
+        if max(xs) - min(xs) <= size[0] - 2 * PADDING_PX and max(ys) - min(ys) <= size[1] - 2 * PADDING_PX:
+            return zoom
+    return MIN_ZOOM
+
+
+_font = None
+
+
+def _get_font():
+    global _font
+    if _font is None:
+        _font = ImageFont.load_default()
+    return _font
+
+
+def _ascii_label(text: str) -> str:
+    """La police par défaut n'a pas tous les accents"""
+    return "".join(ch for ch in unicodedata.normalize("NFD", text) if unicodedata.category(ch) != "Mn")
+
+
+def _load_tile(zoom: int, x: int, y: int):
+    key = (zoom, x, y)
+    tile = _tile_cache.get(key)
+    if tile is not None:
+        return tile or None
+    path = os.path.join(TILES_DIR, str(zoom), str(x), f"{y}.png")
+    try:
+        tile = Image.open(path).convert("RGB")
+        tile.load()
+    except (OSError, ValueError):
+        tile = False  # Absence mémorisée aussi
+    _tile_cache.set(key, tile)
+    return tile or None
+
+
+def _draw_base(img, draw, left: float, top: float, zoom: int):
+    """Fond de carte : tuiles disque, sinon fond neutre + noms de quartiers"""
+    width, height = img.size
+    missing = False
+    for tx in range(int(left // TILE_SIZE), int((left + width) // TILE_SIZE) + 1):
+        for ty in range(int(top // TILE_SIZE), int((top + height) // TILE_SIZE) + 1):
+            tile = _load_tile(zoom, tx, ty)
+            if tile is None:
+                missing = True
+                continue
+            img.paste(tile, (int(tx * TILE_SIZE - left), int(ty * TILE_SIZE - top)))
+
+    if not missing:
+        return
+    # Repli : quadrillage léger et repères du gazetteer
+    step = TILE_SIZE // 4
+    for gx in range(-int(left % step), width, step):
+        draw.line([(gx, 0), (gx, height)], fill=GRID_COLOR)
+    for gy in range(-int(top % step), height, step):
+        draw.line([(0, gy), (width, gy)], fill=GRID_COLOR)
+    font = _get_font()
+    for entry in gazetteer.entries:
+        if entry.get("type") not in ("quartier", "arrondissement"):
+            continue
+        px, py = _to_pixel(entry["lat"], entry["lon"], zoom)
+        px, py = px - left, py - top
+        if 0 <= px < width and 0 <= py < height:
+            draw.text((px, py), _ascii_label(entry["name"]), fill=LABEL_COLOR, font=font, anchor="mm")
+
+
+def _draw_marker(draw, x: float, y: float, color, label: str):
+    r = 11
+    draw.ellipse([x - r, y - r, x + r, y + r], fill=color, outline=(255, 255, 255), width=3)
+    draw.text((x, y), label, fill=(255, 255, 255), font=_get_font(), anchor="mm")
+
+
+def render_delivery_map(pickup: Point, dropoff: Point, path: Optional[List[Point]] = None,
+                        size: Tuple[int, int] = MAP_SIZE) -> Optional[bytes]:
+    """
+    Dessine la carte départ → arrivée
+
+    Args:
+        pickup: (lat, lon) du point de départ
+        dropoff: (lat, lon) du point d'arrivée
+        path: Trace suivie (liste de (lat, lon)) ; ligne droite si absente
+        size: Dimensions de l'image en pixels
+
+    Returns:
+        Image PNG en octets, ou None si Pillow est indisponible
+    """
+    if Image is None:
+        return None
+    t0 = time.perf_counter()
+    line = list(path) if path and len(path) >= 2 else [pickup, dropoff]
+    zoom = _fit_zoom(line + [pickup, dropoff], size)
+
+    xs, ys = zip(*(_to_pixel(lat, lon, zoom) for lat, lon in line + [pickup, dropoff]))
+    left = (min(xs) + max(xs)) / 2 - size[0] / 2
+    top = (min(ys) + max(ys)) / 2 - size[1] / 2
+
+    img = Image.new("RGB", size, BG_COLOR)
+    draw = ImageDraw.Draw(img)
+    _draw_base(img, draw, left, top, zoom)
+
+    pixels = [(x - left, y - top) for x, y in (_to_pixel(lat, lon, zoom) for lat, lon in line)]
+    draw.line(pixels, fill=(255, 255, 255), width=8, joint="curve")
+    draw.line(pixels, fill=PATH_COLOR, width=4, joint="curve")
+
+    for (lat, lon), color, label in ((pickup, PICKUP_COLOR, "A"), (dropoff, DROPOFF_COLOR, "B")):
+        x, y = _to_pixel(lat, lon, zoom)
+        _draw_marker(draw, x - left, y - top, color, label)
+
+    buf = io.BytesIO()
+    img.save(buf, format="PNG")
+    with _lock:
+        stats["renders"] += 1
+        stats["render_ms_total"] += (time.perf_counter() - t0) * 1000
+    return buf.getvalue()
+
+
+def map_key(pickup: Point, dropoff: Point, path: Optional[List[Point]] = None,
+            size: Tuple[int, int] = MAP_SIZE) -> str:
+    """Clé de cache : coordonnées arrondies (+ empreinte de la trace)"""
+    parts = [f"{round(c, COORD_PRECISION)}" for c in (*pickup, *dropoff)] + [f"{size[0]}x{size[1]}"]
+    if path:
+        parts.append(",".join(f"{round(lat, COORD_PRECISION)}:{round(lon, COORD_PRECISION)}" for lat, lon in path))
+    return hashlib.sha1("|".join(parts).encode()).hexdigest()[:20]
+
+
+def get_delivery_map_file(pickup: Point, dropoff: Point, path: Optional[List[Point]] = None,
+                          size: Tuple[int, int] = MAP_SIZE) -> Optional[str]:
+    """Chemin du PNG de la carte (rendu seulement s'il n'existe pas encore)"""
+    file_path = os.path.join(MAP_CACHE_DIR, f"{map_key(pickup, dropoff, path, size)}.png")
+    if os.path.exists(file_path):
+        with _lock:
+            stats["render_cache_hits"] += 1
+        return file_path
+    png = render_delivery_map(pickup, dropoff, path, size)
+    if png is None:
+        return None
+    os.makedirs(MAP_CACHE_DIR, exist_ok=True)
+    tmp = f"{file_path}.{os.getpid()}.tmp"
+    with open(tmp, "wb") as f:
+        f.write(png)
+    os.replace(tmp, file_path)
+    return file_path
+
+
+def get_delivery_map_media_id(pickup: Point, dropoff: Point, path: Optional[List[Point]] = None) -> Optional[str]:
+    """
+    media_id WhatsApp de la carte, uploadée une seule fois
+
+    Returns:
+        media_id ou None (rendu ou upload impossible)
+    """
+    from .utils import upload_media
+
+    key = map_key(pickup, dropoff, path)
+    media_id = cache.get(f"map_media:{key}")
+    if media_id:
+        with _lock:
+            stats["upload_cache_hits"] += 1
+        return media_id
+
+    file_path = get_delivery_map_file(pickup, dropoff, path)
+    if not file_path:
+        return None
+    try:
+        media_id = (upload_media(file_path, "image/png") or {}).get("id")
+    except Exception as e:
+        logger.warning(f"[MAP] Upload impossible: {e}")
+        return None
+    if media_id:
+        cache.set(f"map_media:{key}", media_id, MEDIA_ID_TTL)
+        with _lock:
+            stats["uploads"] += 1
+    return media_id
+
+
+def get_stats() -> Dict[str, Any]:
+    """Statistiques de rendu et d'upload"""
+    with _lock:
+        snapshot = dict(stats)
+    snapshot["render_ms_avg"] = round(snapshot.pop("render_ms_total") / snapshot["renders"], 1) if snapshot["renders"] else 0
+    snapshot["tiles"] = _tile_cache.get_stats()
+    return snapshot
@@ -5,7 +5,11 @@ Documentation: https://developers.facebook.com/docs/whatsapp/conversation-types
 """
 import os
 import logging
-from .utils import send_whatsapp_media_url
+from typing import Optional, List, Tuple
+from .utils import send_whatsapp_media_url, send_whatsapp_media_id
+from .geocoding_service import parse_coords, travel_estimate, format_travel_time
+from .map_renderer import get_delivery_map_media_id
+from .product_images import get_product_image_media_id, photo_url_of
 
 logger = logging.getLogger(__name__)
 
@@ -14,9 +18,12 @@ def send_product_with_image(to: str, product: dict) -> dict:
     """
     Envoie un produit avec son image et description formatée.
     
+    La photo est réduite et uploadée une seule fois (product_images) ;
+    les envois suivants réutilisent son media_id. Envoi par lien en secours.
+    
     Args:
         to: Numéro WhatsApp du destinataire
-        product: Dict contenant {nom, prix, description, photo_url}
+        product: Dict contenant {id, nom, prix, description, photo_url}
     
     Returns:
         Response de l'API WhatsApp
@@ -24,7 +31,7 @@ def send_product_with_image(to: str, product: dict) -> dict:
     nom = product.get("nom", "Produit")
     prix = product.get("prix", 0)
     description = product.get("description", "")
-    photo_url = product.get("photo_url")
+    photo_url = photo_url_of(product)
     
     # Caption formatée professionnellement
     caption = (
@@ -43,8 +50,11 @@ def send_product_with_image(to: str, product: dict) -> dict:
         from .utils import send_whatsapp_message
         return send_whatsapp_message(to, caption)
     
-    # Envoyer l'image avec caption
+    # Envoyer l'image avec caption (media_id réutilisable, sinon lien)
     try:
+        media_id = get_product_image_media_id(product.get("id"), photo_url)
+        if media_id:
+            return send_whatsapp_media_id(to, media_id, kind="image", caption=caption)
         return send_whatsapp_media_url(
             to=to,
             media_url=photo_url,
@@ -59,17 +69,44 @@ def send_product_with_image(to: str, product: dict) -> dict:
 
 
 def send_delivery_map(to: str, mission_ref: str, pickup_coords: str, 
-                      delivery_coords: str) -> dict:
+                      delivery_coords: str, path: Optional[List[Tuple[float, float]]] = None) -> dict:
     """
     Envoie une carte avec l'itinéraire de livraison.
     
-    Utilise l'API WhatsApp Location Message pour partager:
-    - Point de départ (pickup)
-    - Point d'arrivée (delivery)
+    La carte est dessinée localement (map_renderer) puis uploadée une seule
+    fois ; les envois suivants pour le même trajet réutilisent le media_id.
+    
+    Args:
+        to: Numéro WhatsApp du destinataire
+        mission_ref: Référence de la mission (légende)
+        pickup_coords: Coordonnées du départ ("lat,lng")
+        delivery_coords: Coordonnées de l'arrivée ("lat,lng")
+        path: Trace GPS suivie (optionnel), sinon ligne droite
+    
+    Returns:
+        Response de l'API WhatsApp ({} si la carte n'a pas pu être envoyée)
     """
-    # TODO: Implémenter envoi de location WhatsApp
-    # https://developers.facebook.com/docs/whatsapp/cloud-api/reference/messages#location-object
-    pass
+    pickup = parse_coords(pickup_coords)
+    dropoff = parse_coords(delivery_coords)
+    if not pickup or not dropoff:
+        logger.warning(f"[MEDIA] Map skipped for {mission_ref}: missing coordinates")
+        return {}
+    
+    distance_km, minutes = travel_estimate(pickup[0], pickup[1], dropoff[0], dropoff[1])
+    caption = (
+        f"🗺️ *Itinéraire {mission_ref}*\n"
+        f"🟢 Départ → 🔴 Arrivée\n"
+        f"📏 {distance_km} km · ⏱️ {format_travel_time(minutes)}"
+    )
+    
+    try:
+        media_id = get_delivery_map_media_id(pickup, dropoff, path)
+        if not media_id:
+            return {}
+        return send_whatsapp_media_id(to, media_id, kind="image", caption=caption)
+    except Exception as e:
+        logger.error(f"[MEDIA] Failed to send delivery map: {e}")
+        return {}
 
 
 def send_receipt_pdf(to: str, mission_ref: str, receipt_data: dict) -> dict:
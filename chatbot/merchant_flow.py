@@ -4,6 +4,8 @@ import os, re, logging, requests
 from typing import Dict, Any, Optional, List
 from .auth_core import get_session, build_response, normalize
 from .smart_fallback import detect_intent_change
+from .lexicon import lexicon
+from .backend_warmth import backend_warmth
 
 logger = logging.getLogger(__name__)
 
@@ -38,7 +40,7 @@ def api_request(session: Dict[str, Any], method: str, path: str, **kwargs) -> re
     tok = (session.get("auth") or {}).get("access")
     if tok:
         headers["Authorization"] = f"Bearer {tok}"
-    r = requests.request(method, url, headers=headers, timeout=TIMEOUT, **kwargs)
+    r = backend_warmth.request(method, url, headers=headers, timeout=TIMEOUT, **kwargs)
     logger.debug(f"[API-E] {method} {path} -> {r.status_code}")
     return r
 
@@ -80,18 +82,20 @@ def list_my_products(session: Dict[str, Any]) -> Dict[str, Any]:
             "📦 Aucun produit publié.\n👉 Tapez *Créer produit* pour ajouter un article.",
             _btns("Créer produit","Commandes","🔙 Retour")
         )
-    lines = []
-    for p in arr[:5]:
+    # Liste complète (paginée à l'affichage) ; la ligne choisie renvoie "Détail <id>"
+    rows = []
+    for p in arr:
         pid   = p.get("id")
         nom   = p.get("nom") or p.get("name") or f"Produit {pid}"
         prix  = _fmt_xaf(p.get("prix") or p.get("price") or 0)
         stock = p.get("stock", "-")
         actif = "✅" if p.get("actif", True) else "⛔"
-        lines.append(f"#{pid} • {nom} • {prix} XAF • Stock {stock} {actif}")
-    return build_response(
-        "🗂️ *Mes produits*\n" + "\n".join(lines) + "\n\n👉 *Détail <id>* ou *Edit <id>*",
-        _btns("Créer produit","Commandes","🔙 Retour")
-    )
+        rows.append({"id": f"Détail {pid}", "title": nom[:24],
+                     "description": f"#{pid} • {prix} XAF • Stock {stock} {actif}"[:72]})
+    return {
+        "response": f"🗂️ *Mes produits* ({len(arr)})\n\n👉 Choisissez un produit, ou tapez *Edit <id>* / *Créer produit*",
+        "list": {"title": "Produits", "button": "Mes produits", "rows": rows},
+    }
 
 def product_detail(session: Dict[str, Any], pid: str) -> Dict[str, Any]:
     r = api_request(session, "GET", f"/api/v1/marketplace/produits/{pid}/")
@@ -181,7 +185,7 @@ def handle_create_wizard(session: Dict[str, Any], t: str, media_url: Optional[st
         return build_response("🖼️ Envoyez *une image* maintenant (ou tapez *Passer*).", ["Passer", "🔙 Retour"])
 
     if step == "PROD_IMAGE":
-        if tt.lower() in {"passer", "skip", "suivant"}:
+        if lexicon.exact(tt, "answer") == "passer":
             # Passer l'image
             pass
         elif media_url and media_url.startswith("http"):
@@ -199,13 +203,13 @@ def handle_create_wizard(session: Dict[str, Any], t: str, media_url: Optional[st
         return build_response(recap, ["Publier", "Modifier", "🔙 Retour"])
 
     if step == "PROD_CONFIRM":
-        low = tt.lower()
-        if low in {"publier","creer","confirmer"}:
+        lex = lexicon.analyze(tt)
+        if lex.exact("marchand") == "publier":
             return create_submit(session)
-        if low in {"modifier","edit"}:
+        if lex.exact("answer") == "modifier":
             session["step"] = "PROD_NAME"
             return build_response("✏️ Reprenons : quel est le *nom* ?", ["🔙 Retour"])
-        if low in {"annuler","cancel"}:
+        if lex.exact("answer") == "annuler":
             session["step"] = "ENTREPRISE_MENU"
             session["ctx"].pop("new_product", None)
             return build_response("❌ Création annulée.", MAIN_BTNS)
@@ -261,17 +265,19 @@ def list_my_orders(session: Dict[str, Any]) -> Dict[str, Any]:
     if not arr:
         return build_response("📭 Aucune commande pour le moment.", MAIN_BTNS + ["🔙 Retour"])
 
-    lines = []
-    for c in arr[:5]:
+    # Liste complète (paginée à l'affichage) ; la ligne choisie renvoie "Commande <id>"
+    rows = []
+    for c in arr:
         cid    = c.get("id")
         statut = c.get("statut") or "—"
         total  = _fmt_xaf(c.get("total_xaf") or c.get("montant") or 0)
         client = (c.get("client") or {}).get("username") or c.get("client_nom") or "—"
-        lines.append(f"#{cid} • {statut} • {total} XAF • {client}")
-    return build_response(
-        "🧾 *Mes commandes*\n" + "\n".join(lines) + "\n\n👉 *Commande <id>* pour le détail",
-        _btns("Commandes","Mes produits","🔙 Retour")
-    )
+        rows.append({"id": f"Commande {cid}", "title": f"Commande #{cid}"[:24],
+                     "description": f"{statut} • {total} XAF • {client}"[:72]})
+    return {
+        "response": f"🧾 *Mes commandes* ({len(arr)})\n\n👉 Choisissez une commande pour le détail",
+        "list": {"title": "Commandes", "button": "Commandes", "rows": rows},
+    }
 
 def order_detail(session: Dict[str, Any], cid: str) -> Dict[str, Any]:
     r = api_request(session, "GET", f"/api/v1/marketplace/commandes/{cid}/")
@@ -324,9 +330,11 @@ def handle_message(phone: str, text: str,
                    **_) -> Dict[str, Any]:
     t = (normalize(text) or "").lower()
     session = get_session(phone)
+    lex = lexicon.analyze(t)  # Boutons reconnus en un seul passage
+    action = lex.exact("marchand")
 
     # Gestion bouton retour contextuel - étape par étape
-    if t in {"retour", "back", "🔙 retour"}:
+    if lex.exact("nav") == "retour":
         current_step = session.get("step", "")
         
         # Navigation step-by-step pour création produit
@@ -368,20 +376,20 @@ def handle_message(phone: str, text: str,
         return build_response("🏠 Menu entreprise", MAIN_BTNS)
 
     # Salutations / Menu
-    if t in {"menu","bonjour","salut","hello","hi","accueil","entreprise"}:
+    if action == "menu":
         session["step"] = "ENTREPRISE_MENU"
         return build_response("🏪 *Espace entreprise* — choisissez une action :", MAIN_BTNS)
 
     # Toggle boutique (ouvert/fermé)
-    if t in {"basculer","toggle","ouvrir","fermer","basculer ouvert","basculer ferme"} or t.startswith("basculer"):
+    if action == "boutique" or t.startswith("basculer"):
         return toggle_boutique(session)
 
     # Produits
-    if t in {"mes produits","produits","catalogue"}:
+    if action == "produits":
         session["step"] = "ENTREPRISE_MENU"
         return list_my_products(session)
 
-    if t in {"créer produit","creer produit","nouveau produit","ajouter produit"}:
+    if action == "creer_produit":
         return create_start(session)
 
     if t.startswith("detail ") or t.startswith("détail "):
@@ -433,7 +441,7 @@ def handle_message(phone: str, text: str,
         return product_patch(session, str(pid), {fields[field]: value})
 
     # Commandes
-    if t in {"commandes","mes commandes"}:
+    if action == "commandes":
         return list_my_orders(session)
 
     if t.startswith("commande "):
@@ -443,11 +451,11 @@ def handle_message(phone: str, text: str,
             return build_response("❌ Id manquant. Ex. *Commande 123*")
         return order_detail(session, cid)
 
-    if t in {"accepter","préparer","preparer","expédier","expedier","livrée","livree","annuler"}:
+    if action in STATUTS_CMD:
         cid = (session.get("ctx") or {}).get("current_order_id")
         if not cid:
             return build_response("⚠️ Aucune commande sélectionnée. Envoyez d’abord *Commande <id>*.", _btns("Commandes","Menu"))
-        return order_update_status(session, str(cid), t)
+        return order_update_status(session, str(cid), action)
 
     # Aide
     return build_response(
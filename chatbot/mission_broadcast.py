@@ -0,0 +1,251 @@
+# chatbot/mission_broadcast.py
+"""
+Diffusion des nouvelles missions aux livreurs proches
+Registre en mémoire des positions livreurs + notifications par vagues
+(rayon croissant), avec limitation de débit et déduplication
+"""
+import os
+import time
+import logging
+import threading
+from typing import Dict, Any, Tuple, List
+
+from .cache import RateLimiter, cache
+from .gazetteer import gazetteer
+from .geocoding_service import parse_coords
+from .spatial_index import GridSpatialIndex
+from .utils import send_whatsapp_buttons
+
+logger = logging.getLogger(__name__)
+
+# Configuration
+DRIVER_POSITION_TTL = int(os.getenv("TOKTOK_DRIVER_POSITION_TTL", "1800"))  # Position jugée périmée après 30 min
+WAVE_INTERVAL_SEC = float(os.getenv("TOKTOK_BROADCAST_WAVE_INTERVAL", "45"))
+BROADCAST_MEMORY_TTL = 3600  # Une mission déjà diffusée n'est pas rediffusée pendant 1 h
+BROADCAST_ENABLED = os.getenv("TOKTOK_BROADCAST_ENABLED", "1") not in ("0", "false", "False")
+
+# Vagues successives : (rayon en km, nombre max de livreurs notifiés)
+WAVES: List[Tuple[float, int]] = [(3.0, 3), (6.0, 5), (12.0, 10)]
+
+# Un livreur ne reçoit pas plus de 6 alertes toutes les 10 minutes
+driver_alert_limiter = RateLimiter(max_requests=6, window_seconds=600)
+
+# Statuts qui déclenchent / arrêtent la diffusion
+OPEN_STATUSES = {"created", "pending", "en_attente", "nouvelle", "new"}
+CLOSED_STATUSES = {"accepted", "assigned", "assignee", "annulee", "cancelled", "livree", "delivered", "completed"}
+
+
+class DriverRegistry:
+    """Dernières positions connues des livreurs disponibles"""
+
+    def __init__(self, ttl: int = DRIVER_POSITION_TTL):
+        self.ttl = ttl
+        self.index = GridSpatialIndex()
+        self._drivers: Dict[str, Dict[str, Any]] = {}
+        self._lock = threading.Lock()
+
+    def update_position(self, phone: str, lat: float, lon: float):
+        """Enregistre la position partagée par un livreur"""
+        if not phone:
+            return
+        with self._lock:
+            d = self._drivers.setdefault(phone, {"available": True})
+            d.update({"lat": float(lat), "lon": float(lon), "updated_at": time.time()})
+            self._reindex(phone, d)
+
+    def set_available(self, phone: str, available: bool):
+        """Passe un livreur en ligne / hors ligne"""
+        if not phone:
+            return
+        with self._lock:
+            d = self._drivers.setdefault(phone, {})
+            d["available"] = bool(available)
+            self._reindex(phone, d)
+
+    def _reindex(self, phone: str, d: Dict[str, Any]):
+        if d.get("available") and d.get("lat") is not None:
+            self.index.upsert(phone, d["lat"], d["lon"], d)
+        else:
+            self.index.remove(phone)
+
+    def nearby(self, lat: float, lon: float, k: int, radius_km: float) -> List[Tuple[str, float]]:
+        """
+        Livreurs disponibles les plus proches, positions périmées exclues
+
+        Returns:
+            Liste triée de (téléphone, distance_km)
+        """
+        now = time.time()
+        out = []
+        for phone, dist, d in self.index.nearest(lat, lon, k=k, radius_km=radius_km):
+            if now - d.get("updated_at", 0) > self.ttl:
+                with self._lock:
+                    self.index.remove(phone)
+                continue
+            out.append((phone, dist))
+        return out
+
+    def get_stats(self) -> Dict[str, Any]:
+        return {
+            "drivers_known": len(self._drivers),
+            "drivers_indexed": len(self.index),
+        }
+
+
+class MissionBroadcaster:
+    """Notifie les livreurs proches d'une nouvelle mission, vague par vague"""
+
+    def __init__(self, registry: DriverRegistry, waves: List[Tuple[float, int]] = WAVES,
+                 wave_interval: float = WAVE_INTERVAL_SEC):
+        self.registry = registry
+        self.waves = waves
+        self.wave_interval = wave_interval
+        self._active: Dict[str, Dict[str, Any]] = {}  # mission_id → état de diffusion
+        self._lock = threading.Lock()
+        self.stats = {
+            "broadcasts": 0,
+            "waves": 0,
+            "notifications_sent": 0,
+            "notifications_failed": 0,
+            "deduplicated": 0,
+            "rate_limited": 0,
+            "no_location": 0,
+            "cancelled": 0,
+        }
+
+    def broadcast(self, mission: Dict[str, Any]) -> bool:
+        """
+        Démarre la diffusion d'une mission (non bloquant)
+
+        Args:
+            mission: Données de la mission (id, adresses, coordonnées, valeur)
+
+        Returns:
+            True si la diffusion a démarré
+        """
+        if not BROADCAST_ENABLED:
+            return False
+        mission_id = str(mission.get("id") or "")
+        if not mission_id or mission_id == "?":
+            return False
+
+        point = parse_coords(mission.get("coordonnees_recuperation")) \
+            or gazetteer.geocode(mission.get("adresse_recuperation") or "")
+        if not point:
+            self.stats["no_location"] += 1
+            logger.info(f"[BROADCAST] Mission {mission_id}: pickup non localisé, pas de diffusion")
+            return False
+
+        with self._lock:
+            if mission_id in self._active or cache.get(f"broadcast_done:{mission_id}"):
+                self.stats["deduplicated"] += 1
+                return False
+            self._active[mission_id] = {
+                "mission": mission,
+                "point": point,
+                "notified": set(),
+                "timer": None,
+            }
+            self.stats["broadcasts"] += 1
+
+        self._schedule(mission_id, 0, delay=0)
+        return True
+
+    def cancel(self, mission_id) -> bool:
+        """Arrête la diffusion (mission acceptée, annulée...)"""
+        with self._lock:
+            state = self._active.pop(str(mission_id), None)
+        if not state:
+            return False
+        cache.set(f"broadcast_done:{mission_id}", True, BROADCAST_MEMORY_TTL)
+        if state["timer"] is not None:
+            state["timer"].cancel()
+        self.stats["cancelled"] += 1
+        logger.info(f"[BROADCAST] Mission {mission_id}: diffusion arrêtée ({len(state['notified'])} livreurs notifiés)")
+        return True
+
+    def _schedule(self, mission_id: str, wave: int, delay: float):
+        timer = threading.Timer(delay, self._run_wave, args=(mission_id, wave))
+        timer.daemon = True
+        with self._lock:
+            state = self._active.get(mission_id)
+            if state is None:
+                return
+            state["timer"] = timer
+        timer.start()
+
+    def _run_wave(self, mission_id: str, wave: int):
+        with self._lock:
+            state = self._active.get(mission_id)
+        if state is None:
+            return
+
+        radius_km, size = self.waves[wave]
+        lat, lon = state["point"]
+        candidates = self.registry.nearby(lat, lon, k=size + len(state["notified"]), radius_km=radius_km)
+        self.stats["waves"] += 1
+
+        sent = 0
+        for phone, dist in candidates:
+            if sent >= size:
+                break
+            if phone in state["notified"]:
+                self.stats["deduplicated"] += 1
+                continue
+            if not driver_alert_limiter.is_allowed(f"broadcast:{phone}"):
+                self.stats["rate_limited"] += 1
+                continue
+            state["notified"].add(phone)
+            if self._notify(phone, state["mission"], dist):
+                sent += 1
+
+        logger.info(f"[BROADCAST] Mission {mission_id} vague {wave + 1}/{len(self.waves)}: "
+                    f"{sent} livreur(s) notifié(s) dans {radius_km} km")
+
+        if wave + 1 < len(self.waves):
+            self._schedule(mission_id, wave + 1, delay=self.wave_interval)
+        else:
+            with self._lock:
+                self._active.pop(mission_id, None)
+            cache.set(f"broadcast_done:{mission_id}", True, BROADCAST_MEMORY_TTL)
+
+    def _notify(self, phone: str, mission: Dict[str, Any], dist_km: float) -> bool:
+        mid = mission.get("id")
+        try:
+            valeur = f"{int(float(mission.get('valeur_produit') or 0)):,}".replace(",", " ")
+        except (TypeError, ValueError):
+            valeur = "0"
+        msg = (
+            "*🔔 NOUVELLE MISSION PRÈS DE TOI*\n"
+            "━━━━━━━━━━━━━━━━━━━━\n\n"
+            f"🚏 *Départ :* {mission.get('adresse_recuperation') or '—'}\n"
+            f"🎯 *Arrivée :* {mission.get('adresse_livraison') or '—'}\n"
+            f"🚴 *Tu es à :* {dist_km} km du départ\n"
+            f"💰 *Valeur :* {valeur} FCFA\n\n"
+            "⚡ _Premier arrivé, premier servi !_"
+        )
+        try:
+            res = send_whatsapp_buttons(phone, msg, [f"✅ Accepter {mid}", f"Détails {mid}"])
+        except Exception as e:
+            res = {"error": str(e)}
+        # L'API WhatsApp répond {"messages": [...]} en cas de succès, {"error": {...}} sinon
+        if isinstance(res, dict) and res.get("messages"):
+            self.stats["notifications_sent"] += 1
+            return True
+        self.stats["notifications_failed"] += 1
+        error = res.get("error") if isinstance(res, dict) else res
+        logger.warning(f"[BROADCAST] Envoi impossible à {phone}: {error}")
+        return False
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Statistiques de diffusion"""
+        return {
+            **self.stats,
+            "active_broadcasts": len(self._active),
+            **self.registry.get_stats(),
+        }
+
+
+# Instances globales
+driver_registry = DriverRegistry()
+mission_broadcaster = MissionBroadcaster(driver_registry)
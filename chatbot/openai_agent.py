@@ -1,20 +1,16 @@
 # openai_agent.py
 from __future__ import annotations
-import os
 import json
 import re
 from typing import List, Dict
 from urllib.parse import quote_plus
 
-import requests
+from .llm_gateway import llm_gateway
+from .catalog_search import catalog_index, merchant_name
 
 # -----------------------------
-# Config API : OpenRouter OU OpenAI
+# Config API : OpenRouter ET/OU OpenAI (clés et modèles lus par llm_gateway)
 # -----------------------------
-OPENROUTER_API_KEY = os.getenv("OPENROUTER_API_KEY")
-OPENROUTER_MODEL = os.getenv("OPENROUTER_MODEL", "openai/gpt-4o-mini")  # ex: "openai/gpt-4o-mini"
-OPENAI_API_KEY = os.getenv("OPENAI_API_KEY")
-OPENAI_MODEL = os.getenv("OPENAI_MODEL", "gpt-4o-mini")
 
 SYSTEM_PROMPT_PRO = """\
 Tu es l’agent IA de TokTok Delivery (Congo-Brazzaville).
@@ -29,39 +25,10 @@ Règles :
 - Si l’intention est ambiguë, propose le menu principal.
 """
 
-def _call_openrouter(messages: List[Dict]) -> str:
-    url = "https://openrouter.ai/api/v1/chat/completions"
-    headers = {
-        "Authorization": f"Bearer {OPENROUTER_API_KEY}",
-        "Content-Type": "application/json",
-    }
-    data = {
-        "model": OPENROUTER_MODEL,
-        "messages": messages,
-        "temperature": 0.2,
-        "response_format": {"type": "json_object"}  # utile si on demande du JSON
-    }
-    r = requests.post(url, headers=headers, json=data, timeout=30)
-    r.raise_for_status()
-    out = r.json()
-    return out["choices"][0]["message"]["content"]
-
-def _call_openai(messages: List[Dict]) -> str:
-    url = "https://api.openai.com/v1/chat/completions"
-    headers = {
-        "Authorization": f"Bearer {OPENAI_API_KEY}",
-        "Content-Type": "application/json",
-    }
-    data = {
-        "model": OPENAI_MODEL,
-        "messages": messages,
-        "temperature": 0.2,
-        "response_format": {"type": "json_object"}
-    }
-    r = requests.post(url, headers=headers, json=data, timeout=30)
-    r.raise_for_status()
-    out = r.json()
-    return out["choices"][0]["message"]["content"]
+def _call_llm(messages: List[Dict], function: str, **kwargs) -> str:
+    """OpenRouter / OpenAI via la passerelle (échéance, requête de couverture, comptage par fonction)"""
+    completion = llm_gateway.complete(messages=messages, function=function, flow="agent", **kwargs)
+    return completion.choices[0].message.content
 
 def ask_gpt(user_message: str, system_prompt: str = SYSTEM_PROMPT_PRO) -> str:
     """
@@ -72,37 +39,9 @@ def ask_gpt(user_message: str, system_prompt: str = SYSTEM_PROMPT_PRO) -> str:
         {"role": "user", "content": user_message}
     ]
     try:
-        if OPENROUTER_API_KEY:
+        if llm_gateway.available:
             # Pour les réponses texte simples, on n'impose pas JSON
-            url = "https://openrouter.ai/api/v1/chat/completions"
-            headers = {
-                "Authorization": f"Bearer {OPENROUTER_API_KEY}",
-                "Content-Type": "application/json",
-            }
-            data = {
-                "model": OPENROUTER_MODEL,
-                "messages": messages,
-                "temperature": 0.5
-            }
-            r = requests.post(url, headers=headers, json=data, timeout=30)
-            r.raise_for_status()
-            out = r.json()
-            return out["choices"][0]["message"]["content"]
-        elif OPENAI_API_KEY:
-            url = "https://api.openai.com/v1/chat/completions"
-            headers = {
-                "Authorization": f"Bearer {OPENAI_API_KEY}",
-                "Content-Type": "application/json",
-            }
-            data = {
-                "model": OPENAI_MODEL,
-                "messages": messages,
-                "temperature": 0.5
-            }
-            r = requests.post(url, headers=headers, json=data, timeout=30)
-            r.raise_for_status()
-            out = r.json()
-            return out["choices"][0]["message"]["content"]
+            return _call_llm(messages, "ask_gpt", temperature=0.5)
         else:
             # Fallback offline
             return "Je suis disponible. Dites-moi votre besoin (livraison, suivi, historique ou commande restaurant)."
@@ -125,7 +64,7 @@ def classify_intent(text: str) -> str:
     if any(k in t for k in ["envoyer", "colis", "livrer", "livraison", "coursier"]):
         return "courier"
 
-    if not (OPENROUTER_API_KEY or OPENAI_API_KEY):
+    if not llm_gateway.available:
         return "courier"  # fallback
 
     sys = "Tu retournes strictement un JSON: {\"intent\":\"courier|marketplace|follow|history\"}."
@@ -134,7 +73,7 @@ def classify_intent(text: str) -> str:
         {"role": "user", "content": f"Texte: {text}\nDonne uniquement le JSON."}
     ]
     try:
-        raw = _call_openrouter(messages) if OPENROUTER_API_KEY else _call_openai(messages)
+        raw = _call_llm(messages, "classify_intent", temperature=0.2, response_format={"type": "json_object"})
         data = json.loads(raw)
         intent = data.get("intent", "").lower()
         if intent in ["courier", "marketplace", "follow", "history"]:
@@ -143,28 +82,30 @@ def classify_intent(text: str) -> str:
         pass
     return "courier"
 
-def suggest_restaurants(query: str) -> List[Dict[str, str]]:
+def suggest_restaurants(query: str, limit: int = 3) -> List[Dict[str, str]]:
     """
-    MVP : suggestions mockées. À remplacer par DB/algorithme réel.
+    Produits et marchands réels correspondant à la requête (index local du catalogue, BM25).
+    Liste vide si rien ne correspond ou si le catalogue n'est pas encore chargé.
     """
-    base = [
-        {
-            "name": "Savana Grill",
-            "address": "Centre-ville",
-            "image_url": "https://picsum.photos/seed/savana/400/220",
-            "wa_url": "https://wa.me/242061234567?text=" + quote_plus(f"Bonjour, je veux {query}")
-        },
-        {
-            "name": "Chez Mama Poulet",
-            "address": "Poto-Poto",
-            "image_url": "https://picsum.photos/seed/mama/400/220",
-            "wa_url": "https://wa.me/242069876543?text=" + quote_plus(f"Bonjour, je veux {query}")
-        },
-        {
-            "name": "La Braise",
-            "address": "Moungali",
-            "image_url": "https://picsum.photos/seed/braise/400/220",
-            "wa_url": "https://wa.me/242055551111?text=" + quote_plus(f"Bonjour, je veux {query}")
-        },
-    ]
-    return base
+    suggestions = []
+    seen = set()
+    for hit in catalog_index.search(query, limit=limit * 3):
+        ent = hit["item"] if hit["kind"] == "merchant" else (hit["merchant"] or {})
+        key = ent.get("id") if ent else hit["id"]
+        if key in seen:
+            continue
+        seen.add(key)
+        item = hit["item"]
+        name = merchant_name(ent) if ent else ""
+        if hit["kind"] == "product":
+            name = f"{hit['name']} — {name}" if ent else hit["name"]
+        phone = re.sub(r"\D", "", str(ent.get("telephone") or ent.get("phone") or "")) if ent else ""
+        suggestions.append({
+            "name": name,
+            "address": str(ent.get("adresse") or ent.get("address") or "") if ent else "",
+            "image_url": item.get("photo_url") or item.get("image") or item.get("logo") or "",
+            "wa_url": f"https://wa.me/{phone}?text=" + quote_plus(f"Bonjour, je veux {query}") if phone else "",
+        })
+        if len(suggestions) >= limit:
+            break
+    return suggestions
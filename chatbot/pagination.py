@@ -0,0 +1,132 @@
+# chatbot/pagination.py
+"""
+Pagination des listes WhatsApp (10 lignes maximum par message)
+Les flows renvoient la liste complète ; on garde le jeu de résultats ordonné
+en session avec un curseur et on affiche une page à la fois, avec les lignes
+"➡️ Voir plus" / "⬅️ Précédent". Les pages suivantes sont servies depuis la
+mémoire, sans appel backend
+"""
+import os
+import logging
+import threading
+from typing import Dict, Any, Optional
+
+from .auth_core import normalize
+
+logger = logging.getLogger(__name__)
+
+# Configuration
+WHATSAPP_MAX_ROWS = 10
+PAGE_SIZE = int(os.getenv("TOKTOK_LIST_PAGE_SIZE", "8"))  # + 2 lignes de navigation ≤ 10
+MAX_CACHED_ROWS = int(os.getenv("TOKTOK_LIST_MAX_ROWS", "200"))
+
+NEXT_ID = "page_next"
+PREV_ID = "page_prev"
+NEXT_ROW = {"id": NEXT_ID, "title": "➡️ Voir plus", "description": "Page suivante"}
+PREV_ROW = {"id": PREV_ID, "title": "⬅️ Précédent", "description": "Page précédente"}
+
+# Saisies texte équivalentes aux lignes de navigation
+NEXT_WORDS = {NEXT_ID, "voir plus", "suivant", "page suivante"}
+PREV_WORDS = {PREV_ID, "precedent", "précédent", "page precedente", "page précédente"}
+
+_stats_lock = threading.Lock()
+_stats = {"lists": 0, "paginated": 0, "pages_served": 0, "stale": 0}
+
+
+def _count(key: str):
+    with _stats_lock:
+        _stats[key] += 1
+
+
+def _render(state: Dict[str, Any]) -> Dict[str, Any]:
+    """Construit la réponse de la page courante à partir de l'état en session"""
+    rows = state["rows"]
+    pages = (len(rows) + PAGE_SIZE - 1) // PAGE_SIZE
+    cursor = max(0, min(state["cursor"], pages - 1))
+    state["cursor"] = cursor
+    page_rows = rows[cursor * PAGE_SIZE:(cursor + 1) * PAGE_SIZE]
+    if cursor > 0:
+        page_rows = page_rows + [PREV_ROW]
+    if cursor < pages - 1:
+        page_rows = page_rows + [NEXT_ROW]
+    text = state["text"]
+    if pages > 1:
+        text = f"{text}\n\n_Page {cursor + 1}/{pages} • {len(rows)} résultats_"
+    resp = dict(state["extra"])
+    resp["response"] = text
+    resp["list"] = {"title": state["title"], "rows": page_rows}
+    if state.get("button"):
+        resp["list"]["button"] = state["button"]
+    return resp
+
+
+def paginate(session: Dict[str, Any], resp: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    Découpe une réponse liste trop longue en pages
+
+    Args:
+        session: Session de l'utilisateur (l'état de pagination y est gardé)
+        resp: Réponse du flow, liste éventuellement complète
+
+    Returns:
+        La réponse telle quelle si elle tient en un message, sinon sa première page
+    """
+    if not isinstance(resp, dict) or "list" not in resp:
+        session.pop("pagination", None)
+        return resp
+    _count("lists")
+    rows = [r for r in (resp["list"].get("rows") or []) if r.get("id") not in (NEXT_ID, PREV_ID)]
+    if len(rows) <= WHATSAPP_MAX_ROWS:
+        session.pop("pagination", None)
+        return resp
+    if len(rows) > MAX_CACHED_ROWS:
+        logger.info(f"[PAGINATION] {len(rows)} lignes, conservées : {MAX_CACHED_ROWS}")
+        rows = rows[:MAX_CACHED_ROWS]
+    session["pagination"] = {
+        "text": resp.get("response", ""),
+        "title": resp["list"].get("title", "Options"),
+        "button": resp["list"].get("button"),
+        "rows": rows,
+        "cursor": 0,
+        "step": session.get("step"),
+        "extra": {k: v for k, v in resp.items() if k not in ("response", "list")},
+    }
+    _count("paginated")
+    return _render(session["pagination"])
+
+
+def turn_page(session: Dict[str, Any], text: str) -> Optional[Dict[str, Any]]:
+    """
+    Page suivante / précédente de la dernière liste affichée, sans repasser par le flow
+
+    Args:
+        session: Session de l'utilisateur
+        text: Saisie ("page_next" depuis la liste, ou "voir plus" tapé)
+
+    Returns:
+        La page demandée, ou None si la saisie n'est pas une navigation de liste
+    """
+    state = session.get("pagination")
+    key = normalize(text or "")
+    if key in NEXT_WORDS:
+        step = 1
+    elif key in PREV_WORDS:
+        step = -1
+    else:
+        return None
+    if not state:
+        return None
+    if state.get("step") != session.get("step"):
+        # Le flow a changé d'étape depuis l'affichage : liste périmée
+        session.pop("pagination", None)
+        _count("stale")
+        return None
+    state["cursor"] += step
+    _count("pages_served")
+    logger.debug(f"[PAGINATION] page {state['cursor'] + 1} servie depuis la session")
+    return _render(state)
+
+
+def get_stats() -> Dict[str, Any]:
+    with _stats_lock:
+        return dict(_stats)
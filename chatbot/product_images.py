@@ -0,0 +1,208 @@
+# chatbot/product_images.py
+"""
+Photos produits préparées pour WhatsApp (Pillow)
+Chaque photo est téléchargée une seule fois, réduite et recompressée en JPEG
+léger, puis uploadée une seule fois ; le media_id est mis en cache par
+produit et empreinte de la photo. Les envois suivants réutilisent le
+media_id au lieu de faire télécharger l'original par Meta à chaque client
+"""
+import io
+import os
+import time
+import hashlib
+import logging
+import tempfile
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, Any, Optional
+
+import requests
+
+try:
+    from PIL import Image, ImageOps
+except ImportError:  # Pillow absent : envoi par lien, comme avant
+    Image = ImageOps = None
+
+from .cache import cache
+
+logger = logging.getLogger(__name__)
+
+# Configuration
+PRODUCT_IMAGE_DIR = os.getenv("TOKTOK_PRODUCT_IMAGE_DIR", os.path.join(tempfile.gettempdir(), "toktok_products"))
+MAX_SIDE = int(os.getenv("TOKTOK_PRODUCT_IMAGE_MAX_SIDE", "800"))    # px, côté le plus long
+JPEG_QUALITY = int(os.getenv("TOKTOK_PRODUCT_IMAGE_QUALITY", "75"))
+MAX_DOWNLOAD_BYTES = 15 * 1024 * 1024
+DOWNLOAD_TIMEOUT = 20
+MEDIA_ID_TTL = 29 * 24 * 3600  # Les media_id WhatsApp expirent après 30 jours
+
+_executor = ThreadPoolExecutor(max_workers=2, thread_name_prefix="product-images")
+_lock = threading.Lock()
+_key_locks: Dict[str, threading.Lock] = {}
+_pending: set = set()
+stats = {"downloads": 0, "uploads": 0, "media_cache_hits": 0, "file_cache_hits": 0, "errors": 0,
+         "bytes_in": 0, "bytes_out": 0, "process_ms_total": 0.0}
+
+
+def _count(key: str, n: float = 1):
+    with _lock:
+        stats[key] += n
+
+
+def photo_url_of(product: Dict[str, Any]) -> Optional[str]:
+    """URL de la photo, quel que soit le nom du champ renvoyé par le backend"""
+    for key in ("photo_url", "image", "photo", "image_url"):
+        url = product.get(key)
+        if isinstance(url, str) and url.startswith("http"):
+            return url
+    return None
+
+
+def image_key(product_id: Any, photo_url: str) -> str:
+    """Clé de cache : id produit + empreinte de l'URL de la photo (une nouvelle photo change la clé)"""
+    return f"{product_id}-{hashlib.sha1(photo_url.encode()).hexdigest()[:16]}"
+
+
+def compress_image(raw: bytes, max_side: int = MAX_SIDE, quality: int = JPEG_QUALITY) -> Optional[bytes]:
+    """
+    Réduit et recompresse une photo en JPEG progressif
+
+    Args:
+        raw: Image d'origine (tout format lu par Pillow)
+        max_side: Côté le plus long en sortie (pixels)
+        quality: Qualité JPEG
+
+    Returns:
+        Octets JPEG, ou None si Pillow est absent ou l'image illisible
+    """
+    if Image is None:
+        return None
+    try:
+        img = Image.open(io.BytesIO(raw))
+        img = ImageOps.exif_transpose(img)  # Photos de téléphone : orientation EXIF
+        if img.mode not in ("RGB", "L"):
+            # Transparence (PNG) aplatie sur fond blanc, WhatsApp n'accepte pas le JPEG avec alpha
+            background = Image.new("RGB", img.size, (255, 255, 255))
+            rgba = img.convert("RGBA")
+            background.paste(rgba, mask=rgba.split()[-1])
+            img = background
+        img.thumbnail((max_side, max_side), Image.LANCZOS)
+        out = io.BytesIO()
+        img.convert("RGB").save(out, "JPEG", quality=quality, optimize=True, progressive=True)
+        return out.getvalue()
+    except Exception as e:
+        logger.warning(f"[PRODUCT_IMG] Image illisible: {e}")
+        return None
+
+
+def _download(url: str) -> Optional[bytes]:
+    r = requests.get(url, timeout=DOWNLOAD_TIMEOUT, stream=True)
+    if r.status_code != 200:
+        logger.warning(f"[PRODUCT_IMG] Téléchargement {r.status_code}: {url[:80]}")
+        return None
+    chunks, size = [], 0
+    for chunk in r.iter_content(64 * 1024):
+        size += len(chunk)
+        if size > MAX_DOWNLOAD_BYTES:
+            logger.warning(f"[PRODUCT_IMG] Photo trop lourde (> {MAX_DOWNLOAD_BYTES // 1024 // 1024} Mo): {url[:80]}")
+            return None
+        chunks.append(chunk)
+    _count("downloads")
+    _count("bytes_in", size)
+    return b"".join(chunks)
+
+
+def get_product_image_file(product_id: Any, photo_url: str) -> Optional[str]:
+    """Chemin du JPEG préparé (téléchargement et compression seulement s'il n'existe pas encore)"""
+    file_path = os.path.join(PRODUCT_IMAGE_DIR, f"{image_key(product_id, photo_url)}.jpg")
+    if os.path.exists(file_path):
+        _count("file_cache_hits")
+        return file_path
+    t0 = time.perf_counter()
+    raw = _download(photo_url)
+    jpeg = compress_image(raw) if raw else None
+    if jpeg is None:
+        return None
+    os.makedirs(PRODUCT_IMAGE_DIR, exist_ok=True)
+    tmp = f"{file_path}.{os.getpid()}.tmp"
+    with open(tmp, "wb") as f:
+        f.write(jpeg)
+    os.replace(tmp, file_path)
+    _count("bytes_out", len(jpeg))
+    _count("process_ms_total", (time.perf_counter() - t0) * 1000)
+    logger.info(f"[PRODUCT_IMG] Produit {product_id}: {len(raw) // 1024} Ko → {len(jpeg) // 1024} Ko")
+    return file_path
+
+
+def _prepare(product_id: Any, photo_url: str) -> Optional[str]:
+    """Télécharge, compresse et uploade la photo (une seule fois par clé, même en concurrence)"""
+    from .utils import upload_media
+
+    key = image_key(product_id, photo_url)
+    with _lock:
+        key_lock = _key_locks.setdefault(key, threading.Lock())
+    with key_lock:
+        media_id = cache.get(f"product_media:{key}")
+        if media_id:  # Préparée entre-temps par un autre thread
+            return media_id
+        try:
+            file_path = get_product_image_file(product_id, photo_url)
+            if not file_path:
+                return None
+            media_id = (upload_media(file_path, "image/jpeg") or {}).get("id")
+        except Exception as e:
+            _count("errors")
+            logger.warning(f"[PRODUCT_IMG] Préparation impossible (produit {product_id}): {e}")
+            return None
+        if media_id:
+            cache.set(f"product_media:{key}", media_id, MEDIA_ID_TTL)
+            _count("uploads")
+        return media_id
+
+
+def _prepare_background(product_id: Any, photo_url: str):
+    try:
+        _prepare(product_id, photo_url)
+    finally:
+        with _lock:
+            _pending.discard(image_key(product_id, photo_url))
+
+
+def get_product_image_media_id(product_id: Any, photo_url: Optional[str], wait: bool = True) -> Optional[str]:
+    """
+    media_id WhatsApp de la photo préparée d'un produit
+
+    Args:
+        product_id: Id du produit
+        photo_url: URL de la photo d'origine
+        wait: False = ne jamais bloquer (préparation lancée en tâche de fond,
+              l'appelant envoie par lien cette fois-ci)
+
+    Returns:
+        media_id ou None (pas encore prêt, Pillow absent, téléchargement ou upload impossible)
+    """
+    if not photo_url or product_id is None:
+        return None
+    key = image_key(product_id, photo_url)
+    media_id = cache.get(f"product_media:{key}")
+    if media_id:
+        _count("media_cache_hits")
+        return media_id
+    if Image is None:
+        return None
+    if wait:
+        return _prepare(product_id, photo_url)
+    with _lock:
+        if key in _pending:
+            return None
+        _pending.add(key)
+    _executor.submit(_prepare_background, product_id, photo_url)
+    return None
+
+
+def get_stats() -> Dict[str, Any]:
+    """Téléchargements, uploads, réutilisations du media_id et gain de poids"""
+    with _lock:
+        snapshot = dict(stats)
+    snapshot["process_ms_avg"] = round(snapshot.pop("process_ms_total") / snapshot["downloads"], 1) if snapshot["downloads"] else 0
+    snapshot["size_ratio"] = round(snapshot["bytes_out"] / snapshot["bytes_in"], 3) if snapshot["bytes_in"] else 0
+    return snapshot
@@ -0,0 +1,130 @@
+# chatbot/prompt_builder.py
+"""
+Construction des prompts sous budget de tokens
+Contexte de session filtré par étape (liste blanche), valeurs longues
+tronquées, JSON compact ; les instructions fixes restent en tête du prompt
+pour profiter du cache de préfixe côté fournisseur. Tokens réels relevés
+à chaque appel
+"""
+import os
+import json
+import logging
+import threading
+from typing import Dict, Any, Optional, List
+
+try:
+    import tiktoken
+    _encoding = tiktoken.get_encoding("o200k_base")
+except Exception:  # tiktoken absent ou encodage indisponible : estimation
+    _encoding = None
+
+logger = logging.getLogger(__name__)
+
+# Configuration
+CONTEXT_TOKEN_BUDGET = int(os.getenv("TOKTOK_PROMPT_CONTEXT_TOKENS", "150"))
+MAX_VALUE_CHARS = 120
+MAX_LIST_ITEMS = 3
+CHARS_PER_TOKEN = 3.5  # Français, estimation sans tiktoken
+
+# Champs de session utiles à l'IA, par étape, du plus au moins important
+DEFAULT_FIELDS = ["client_position", "depart", "destination"]
+STEP_FIELDS: Dict[str, List[str]] = {
+    "COURIER_POSITION_TYPE": ["client_position", "depart", "destination"],
+    "COURIER_DEPART_TEXT": ["client_position", "destination"],
+    "COURIER_DEST_TEXT": ["client_position", "depart"],
+    "DEST_NOM": ["destination"],
+    "DEST_TEL": ["destination", "destinataire_nom"],
+    "EXPEDITEUR_NOM": ["depart"],
+    "EXPEDITEUR_TEL": ["depart", "expediteur_nom"],
+    "COURIER_VALUE": ["description"],
+    "COURIER_DESC": ["value_fcfa"],
+    "MARKET_PRODUCTS": ["market_category", "market_choice"],
+    "MARKET_QUANTITY": ["market_choice", "unit_price"],
+    "MARKET_DESTINATION": ["market_choice", "quantity"],
+    "MARKET_PAY": ["market_choice", "quantity", "value_fcfa"],
+}
+
+_lock = threading.Lock()
+stats: Dict[str, Dict[str, int]] = {}
+
+
+def estimate_tokens(text: str) -> int:
+    """Nombre de tokens (tiktoken si disponible, sinon estimation par caractères)"""
+    if not text:
+        return 0
+    if _encoding is not None:
+        return len(_encoding.encode(text))
+    return int(len(text) / CHARS_PER_TOKEN) + 1
+
+
+def _trim(value: Any) -> Any:
+    if isinstance(value, str) and len(value) > MAX_VALUE_CHARS:
+        return value[:MAX_VALUE_CHARS] + "…"
+    if isinstance(value, (list, tuple)):
+        items = [_trim(v) for v in value[:MAX_LIST_ITEMS]]
+        if len(value) > MAX_LIST_ITEMS:
+            items.append(f"(+{len(value) - MAX_LIST_ITEMS})")
+        return items
+    if isinstance(value, dict):
+        return {k: _trim(v) for k, v in list(value.items())[:MAX_LIST_ITEMS * 2]}
+    return value
+
+
+def render_context(context: Optional[Dict[str, Any]], step: str,
+                   budget_tokens: int = CONTEXT_TOKEN_BUDGET) -> str:
+    """
+    Contexte de session pour le prompt : champs de l'étape seulement, sous budget
+
+    Args:
+        context: Session (new_request)
+        step: Étape courante (choix de la liste blanche)
+        budget_tokens: Taille maximale du JSON produit
+
+    Returns:
+        JSON compact ("" si rien d'utile)
+    """
+    if not context:
+        return ""
+    fields = STEP_FIELDS.get(step, DEFAULT_FIELDS)
+    selected = {k: _trim(context[k]) for k in fields if context.get(k) not in (None, "", [], {})}
+    # Les champs les moins importants sautent en premier
+    while selected:
+        rendered = json.dumps(selected, ensure_ascii=False, separators=(",", ":"), default=str)
+        if estimate_tokens(rendered) <= budget_tokens:
+            return rendered
+        selected.pop(next(reversed(selected)))
+    return ""
+
+
+def record_usage(function: str, usage: Any, estimated: Optional[int] = None):
+    """
+    Relève les tokens d'un appel (usage renvoyé par l'API)
+
+    Args:
+        function: Fonction appelante
+        usage: completion.usage (prompt_tokens, completion_tokens, prompt_tokens_details.cached_tokens)
+        estimated: Estimation locale, si l'API ne renvoie pas d'usage
+    """
+    prompt_tokens = getattr(usage, "prompt_tokens", None) or estimated or 0
+    completion_tokens = getattr(usage, "completion_tokens", None) or 0
+    details = getattr(usage, "prompt_tokens_details", None)
+    cached_tokens = getattr(details, "cached_tokens", None) or 0
+    with _lock:
+        s = stats.setdefault(function, {"calls": 0, "prompt_tokens": 0, "cached_tokens": 0,
+                                        "completion_tokens": 0, "max_prompt_tokens": 0})
+        s["calls"] += 1
+        s["prompt_tokens"] += prompt_tokens
+        s["cached_tokens"] += cached_tokens
+        s["completion_tokens"] += completion_tokens
+        s["max_prompt_tokens"] = max(s["max_prompt_tokens"], prompt_tokens)
+    logger.debug(f"[PROMPT] {function}: {prompt_tokens} tokens prompt ({cached_tokens} en cache)")
+
+
+def get_stats() -> Dict[str, Any]:
+    """Tokens de prompt par fonction : moyenne, maximum, part servie par le cache fournisseur"""
+    with _lock:
+        snapshot = {k: dict(v) for k, v in stats.items()}
+    for s in snapshot.values():
+        s["avg_prompt_tokens"] = round(s["prompt_tokens"] / s["calls"], 1) if s["calls"] else 0
+        s["cached_ratio"] = round(s["cached_tokens"] / s["prompt_tokens"], 4) if s["prompt_tokens"] else 0
+    return snapshot
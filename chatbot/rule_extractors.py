@@ -0,0 +1,178 @@
+# chatbot/rule_extractors.py
+"""
+Extracteurs déterministes (regex) pour les saisies courantes
+Montants, téléphones congolais, quantités, références de mission :
+réponse immédiate avec un score de confiance, l'IA n'est appelée
+qu'en dessous du seuil
+"""
+import os
+import re
+import logging
+import threading
+from typing import Dict, Any, Optional
+
+logger = logging.getLogger(__name__)
+
+# Au-dessus de ce score, la réponse des règles est utilisée telle quelle
+RULE_CONFIDENCE_THRESHOLD = float(os.getenv("TOKTOK_RULE_CONFIDENCE_THRESHOLD", "0.85"))
+
+# Préfixes mobiles / fixes au Congo-Brazzaville (9 chiffres au format national)
+PHONE_PREFIXES = {"04", "05", "06", "07", "22"}
+
+NUMBER_WORDS = {
+    "un": 1, "une": 1, "deux": 2, "trois": 3, "quatre": 4, "cinq": 5, "six": 6,
+    "sept": 7, "huit": 8, "neuf": 9, "dix": 10, "onze": 11, "douze": 12,
+}
+
+_AMOUNT_RE = re.compile(
+    r"^(?P<num>\d{1,3}(?:[ ., ]\d{3})+|\d+(?:[.,]\d+)?)\s*"
+    r"(?P<mult>k|mille|m|millions?)?\s*"
+    r"(?P<cur>f|fr|frs|francs?|fcfa|f\s?cfa|xaf|cfa)?\.?$"
+)
+_NUMBER_IN_TEXT_RE = re.compile(r"\d{1,3}(?:[ ., ]\d{3})+|\d+")
+_PHONE_RE = re.compile(r"(?:\+|00)?(?:242[\s.-]?)?0?\d(?:[\s.-]?\d){7,8}")
+_QUANTITY_RE = re.compile(r"^(?:x\s*)?(?P<num>\d{1,3})\s*(?:x|pcs?|pi[eè]ces?|unit[eé]s?|fois|plats?|portions?)?$")
+_REFERENCE_RE = re.compile(r"\b(?:COUR|CMD|M)-[A-Z0-9-]+\b", re.IGNORECASE)
+_SUFFIX_REF_RE = re.compile(r"^#?(\d{1,6})$")
+
+_stats_lock = threading.Lock()
+stats: Dict[str, Dict[str, int]] = {}
+
+
+def _result(is_valid: bool, value: Any, confidence: float, error: str = "") -> Dict[str, Any]:
+    return {"is_valid": is_valid, "value": value, "confidence": confidence, "error_message": error}
+
+
+def _clean(text: str) -> str:
+    return " ".join((text or "").lower().strip().split())
+
+
+def extract_amount(text: str) -> Dict[str, Any]:
+    """Montant en FCFA : "5000", "5 000 F", "15,000 FCFA", "15 mille", "2,5k", "10000 FCFA" """
+    t = _clean(text)
+    m = _AMOUNT_RE.match(t)
+    if m:
+        raw = m.group("num")
+        grouped = re.fullmatch(r"\d{1,3}(?:[ ., ]\d{3})+", raw)
+        num = float(re.sub(r"[ ., ]", "", raw)) if grouped else float(raw.replace(",", "."))
+        mult = m.group("mult")
+        # Le FCFA n'a pas de décimales : "12.5" seul est ambigu, l'IA tranche
+        fractional = not grouped and any(sep in raw for sep in ".,")
+        if mult in ("k", "mille"):
+            num *= 1000
+        elif mult:
+            num *= 1_000_000
+        amount = int(round(num))
+        if amount <= 0:
+            return _result(False, None, 0.95, "Montant invalide")
+        if fractional and not mult:
+            return _result(True, amount, 0.6)
+        return _result(True, amount, 0.97 if (mult or m.group("cur")) else 0.99)
+
+    numbers = _NUMBER_IN_TEXT_RE.findall(t)
+    if len(numbers) == 1:
+        # Un seul nombre noyé dans une phrase : probable, mais on laisse l'IA confirmer
+        return _result(True, int(re.sub(r"\D", "", numbers[0])), 0.7)
+    return _result(False, None, 0.4 if not numbers else 0.5, "Montant invalide")
+
+
+def extract_phone(text: str) -> Dict[str, Any]:
+    """Téléphone congolais : "06 123 45 67", "+242 06 123 4567", "055551234" """
+    t = (text or "").strip()
+    matches = _PHONE_RE.findall(t)
+    if not matches:
+        has_digits = any(ch.isdigit() for ch in t)
+        return _result(False, None, 0.9 if has_digits and len(re.sub(r"\D", "", t)) < 6 else 0.5,
+                       "Numéro de téléphone invalide")
+    if len(matches) > 1:
+        return _result(False, None, 0.5, "Plusieurs numéros détectés")
+
+    match = matches[0].strip()
+    digits = re.sub(r"\D", "", match)
+    if digits.startswith("00"):
+        digits = digits[2:]
+    if digits.startswith("242") and len(digits) > 9:
+        digits = digits[3:]
+    if len(digits) != 9 or digits[:2] not in PHONE_PREFIXES:
+        return _result(False, None, 0.9, "Numéro de téléphone invalide")
+
+    whole_input = re.sub(r"[\s.+-]", "", t) == re.sub(r"[\s.+-]", "", match)
+    return _result(True, match if not whole_input else t, 0.99 if whole_input else 0.88)
+
+
+def extract_quantity(text: str) -> Dict[str, Any]:
+    """Quantité entre 1 et 99 : "2", "x3", "2 pièces", "deux" """
+    t = _clean(text)
+    m = _QUANTITY_RE.match(t)
+    qty = int(m.group("num")) if m else NUMBER_WORDS.get(t)
+    if qty is None:
+        return _result(False, None, 0.5, "Quantité invalide")
+    if not 1 <= qty <= 99:
+        return _result(False, None, 0.95, "Quantité doit être entre 1 et 99")
+    return _result(True, qty, 0.98)
+
+
+def extract_reference(text: str) -> Dict[str, Any]:
+    """Référence de mission : "COUR-20250919-003", "#003", "M-61" """
+    t = (text or "").strip()
+    m = _REFERENCE_RE.search(t)
+    if m:
+        return _result(True, m.group(0).upper(), 0.99 if m.group(0) == t.upper() or m.group(0) == t else 0.9)
+    m = _SUFFIX_REF_RE.match(t)
+    if m:
+        return _result(True, f"#{m.group(1)}", 0.95)
+    return _result(False, None, 0.4, "Référence invalide")
+
+
+EXTRACTORS = {
+    "amount": extract_amount,
+    "phone": extract_phone,
+    "quantity": extract_quantity,
+    "reference": extract_reference,
+}
+
+
+def rule_validate(user_input: str, expected_type: str) -> Optional[Dict[str, Any]]:
+    """
+    Applique l'extracteur du type attendu
+
+    Returns:
+        {"is_valid", "value", "confidence", "error_message"} ou None si aucun extracteur
+    """
+    extractor = EXTRACTORS.get(expected_type)
+    if extractor is None:
+        return None
+    try:
+        return extractor(user_input)
+    except Exception as e:
+        logger.warning(f"[RULES] {expected_type} extractor failed on '{user_input}': {e}")
+        return None
+
+
+def is_confident(result: Optional[Dict[str, Any]]) -> bool:
+    return bool(result) and result["confidence"] >= RULE_CONFIDENCE_THRESHOLD
+
+
+def record(expected_type: str, avoided_llm: bool):
+    """Comptabilise une décision : règles seules ou appel IA"""
+    with _stats_lock:
+        s = stats.setdefault(expected_type, {"rule_answered": 0, "llm_calls": 0})
+        s["rule_answered" if avoided_llm else "llm_calls"] += 1
+
+
+def get_stats() -> Dict[str, Any]:
+    """Part des appels IA évités, par type et au total"""
+    with _stats_lock:
+        by_type = {k: dict(v) for k, v in stats.items()}
+    answered = sum(v["rule_answered"] for v in by_type.values())
+    llm = sum(v["llm_calls"] for v in by_type.values())
+    for v in by_type.values():
+        total = v["rule_answered"] + v["llm_calls"]
+        v["avoided_ratio"] = round(v["rule_answered"] / total, 4) if total else 0
+    return {
+        "threshold": RULE_CONFIDENCE_THRESHOLD,
+        "rule_answered": answered,
+        "llm_calls": llm,
+        "avoided_ratio": round(answered / (answered + llm), 4) if answered + llm else 0,
+        "by_type": by_type,
+    }
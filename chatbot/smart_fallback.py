@@ -4,59 +4,78 @@ Smart AI Fallback System - Comprend l'intention et extrait les informations
 même si l'utilisateur ne suit pas exactement le flow prévu
 """
 
-import os
 import json
 import logging
 import re
 from typing import Dict, Any, Optional, List
-from openai import OpenAI
+from .rule_extractors import rule_validate, is_confident, record as record_rule_decision
+from .llm_cache import llm_cache, PRIVATE_EXPECTED_TYPES
+from .intent_classifier import classify as classify_intent, log_turn
+from .lexicon import lexicon
+from .prompt_builder import render_context, record_usage, estimate_tokens
+from .llm_gateway import llm_gateway
 
 logger = logging.getLogger(__name__)
 
 # Configuration
-OPENAI_API_KEY = os.getenv("OPENAI_API_KEY", "").strip()
-OPENAI_MODEL = os.getenv("OPENAI_MODEL", "gpt-4o-mini").strip()
-openai_client = OpenAI(api_key=OPENAI_API_KEY) if OPENAI_API_KEY else None
+llm_client = llm_gateway if llm_gateway.available else None  # OpenAI / OpenRouter, échéance et couverture
+
+VALIDATION_PROMPTS = {
+    "address": "C'est une adresse valide au Congo (rue, quartier, ville) ?",
+    "amount": "C'est un montant valide en FCFA ? Extrais juste le nombre.",
+    "phone": "C'est un numéro de téléphone congolais valide ? Format: 06/05/07 + 7 chiffres",
+    "name": "C'est un nom de personne valide ?",
+    "quantity": "C'est une quantité valide (nombre entre 1 et 99) ?",
+    "reference": "C'est une référence de mission valide (format: M-XX, COUR-XXX, etc.) ?",
+}
 
+# En dessous, un texte libre ne justifie pas un appel IA pour l'intention
+INTENT_LLM_MIN_LENGTH = 15
 
-def extract_structured_data(user_input: str, current_step: str, current_flow: str, context: Dict[str, Any]) -> Dict[str, Any]:
+
+def _llm_json(system_prompt: str, user_content: str, temperature: float = 0.0, max_tokens: int = 200,
+              cache_as: Optional[str] = None, cache_input: str = "", step: str = "", flow: str = "",
+              use_cache: bool = True, meter_as: str = "llm") -> Dict[str, Any]:
     """
-    Utilise l'IA pour extraire des données structurées depuis un input utilisateur libre
+    Point d'appel unique vers le LLM (réponse JSON)
     
     Args:
-        user_input: Ce que l'utilisateur a tapé
-        current_step: L'étape actuelle du flow (ex: COURIER_DEPART_TEXT)
-        current_flow: Le flow actuel (ex: coursier, marketplace)
-        context: Contexte de la session
+        cache_as: Nom de la fonction appelante ; None = pas de cache
+        cache_input: Saisie utilisateur brute (normalisée pour la clé de cache)
+        step, flow: Étape et flow courants (font partie de la clé)
+        use_cache: False quand la réponse dépend d'un contexte absent de la clé
+        meter_as: Nom du site d'appel pour le comptage, quand il n'est pas mis en cache
     
     Returns:
-        Dict avec:
-        - extracted_value: La valeur extraite pour l'étape actuelle
-        - confidence: Niveau de confiance (0-1)
-        - intent_change: Changement d'intention détecté (nouveau flow)
-        - extracted_fields: Autres champs détectés
+        Réponse JSON décodée (lève une exception en cas d'échec)
     """
-    
-    if not openai_client:
-        return {
-            "extracted_value": None,
-            "confidence": 0,
-            "intent_change": None,
-            "extracted_fields": {}
-        }
-    
-    # Définir ce qu'on cherche selon l'étape
-    expected_info = _get_expected_info(current_step, current_flow)
-    
-    system_prompt = f"""Tu es un assistant intelligent pour TokTok Delivery.
+    function = cache_as or meter_as
+
+    def call():
+        completion = llm_client.complete(
+            messages=[
+                {"role": "system", "content": system_prompt},
+                {"role": "user", "content": user_content}
+            ],
+            temperature=temperature,
+            max_tokens=max_tokens,
+            response_format={"type": "json_object"},
+            function=function, flow=flow, step=step
+        )
+        record_usage(function, getattr(completion, "usage", None),
+                     estimated=estimate_tokens(system_prompt) + estimate_tokens(user_content))
+        return json.loads(completion.choices[0].message.content)
+
+    if cache_as is None:
+        return call()
+    return llm_cache.cached_call(cache_as, cache_input, call, step=step, flow=flow, use_cache=use_cache)
+
 
-CONTEXTE:
-- Flow actuel: {current_flow}
-- Étape actuelle: {current_step}
-- On attend: {expected_info}
+EXTRACT_SYSTEM_PROMPT = """Tu es un assistant intelligent pour TokTok Delivery.
 
 TÂCHE:
-Analyse ce que l'utilisateur a dit et extrait les informations pertinentes.
+Analyse ce que l'utilisateur a dit et extrait les informations pertinentes
+pour l'étape décrite dans le CONTEXTE du message.
 
 RÈGLES IMPORTANTES:
 1. Si l'utilisateur donne une information qui correspond à l'étape, extrais-la
@@ -73,40 +92,69 @@ EXEMPLES:
 - Input: "je veux suivre ma commande" → Changement intention: follow
 - Input: "non je préfère marketplace" → Changement intention: marketplace
 
-CONTEXTE ADDITIONNEL:
-{json.dumps(context, indent=2, ensure_ascii=False)}
-
 Réponds STRICTEMENT en JSON:
-{{
+{
     "extracted_value": "valeur principale pour l'étape actuelle ou null",
     "confidence": 0.0 à 1.0,
     "intent_change": "coursier|marketplace|follow|null",
-    "extracted_fields": {{
+    "extracted_fields": {
         "adresse_depart": "si trouvée",
         "adresse_destination": "si trouvée",
         "nom_expediteur": "si trouvé",
         "telephone": "si trouvé",
         "montant": "si trouvé",
         "description": "si trouvée"
-    }},
+    },
     "reasoning": "pourquoi tu as extrait ça"
-}}
+}
 """
+
+
+def extract_structured_data(user_input: str, current_step: str, current_flow: str, context: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    Utilise l'IA pour extraire des données structurées depuis un input utilisateur libre
+    
+    Args:
+        user_input: Ce que l'utilisateur a tapé
+        current_step: L'étape actuelle du flow (ex: COURIER_DEPART_TEXT)
+        current_flow: Le flow actuel (ex: coursier, marketplace)
+        context: Contexte de la session
+    
+    Returns:
+        Dict avec:
+        - extracted_value: La valeur extraite pour l'étape actuelle
+        - confidence: Niveau de confiance (0-1)
+        - intent_change: Changement d'intention détecté (nouveau flow)
+        - extracted_fields: Autres champs détectés
+    """
+    
+    if not llm_client:
+        return {
+            "extracted_value": None,
+            "confidence": 0,
+            "intent_change": None,
+            "extracted_fields": {}
+        }
+    
+    # Définir ce qu'on cherche selon l'étape
+    expected_info = _get_expected_info(current_step, current_flow)
+    
+    # Instructions fixes en system (préfixe identique d'un appel à l'autre),
+    # contexte de l'étape réduit aux champs utiles dans le message utilisateur
+    session_context = render_context(context, current_step)
+    user_content = (
+        f"CONTEXTE:\n- Flow actuel: {current_flow}\n- Étape actuelle: {current_step}\n"
+        f"- On attend: {expected_info}\n"
+        + (f"- Session: {session_context}\n" if session_context else "")
+        + f"\nInput utilisateur: {user_input}"
+    )
     
     try:
-        completion = openai_client.chat.completions.create(
-            model=OPENAI_MODEL,
-            messages=[
-                {"role": "system", "content": system_prompt},
-                {"role": "user", "content": f"Input utilisateur: {user_input}"}
-            ],
-            temperature=0.1,  # Faible pour être plus déterministe
-            max_tokens=500,
-            response_format={"type": "json_object"}
-        )
-        
-        ai_response = completion.choices[0].message.content
-        result = json.loads(ai_response)
+        # Température faible pour être plus déterministe
+        # Le contexte de session fait partie du prompt : cache seulement s'il est vide
+        result = _llm_json(EXTRACT_SYSTEM_PROMPT, user_content, temperature=0.1, max_tokens=500,
+                           cache_as="extract_structured_data", cache_input=user_input,
+                           step=current_step, flow=current_flow, use_cache=not session_context)
         
         logger.info(f"[SMART_FALLBACK] Extracted from '{user_input}': {result.get('extracted_value')} (confidence: {result.get('confidence')})")
         if result.get('reasoning'):
@@ -177,22 +225,21 @@ def smart_validate(user_input: str, expected_type: str, current_step: str) -> tu
         (is_valid, extracted_value, error_message)
     """
     
-    if not openai_client:
+    # Règles déterministes d'abord : "5000" ou "06 123 4567" n'ont pas besoin de l'IA
+    rule = rule_validate(user_input, expected_type)
+    if is_confident(rule):
+        record_rule_decision(expected_type, avoided_llm=True)
+        logger.debug(f"[SMART_VALIDATE] '{user_input}' → rules ({rule['confidence']}): {rule['value']}")
+        return (rule["is_valid"], rule["value"], rule["error_message"])
+    
+    if not llm_client:
         # Fallback sans IA: validation basique
         return _basic_validate(user_input, expected_type)
     
-    validation_prompts = {
-        "address": "C'est une adresse valide au Congo (rue, quartier, ville) ?",
-        "amount": "C'est un montant valide en FCFA ? Extrais juste le nombre.",
-        "phone": "C'est un numéro de téléphone congolais valide ? Format: 06/05/07 + 7 chiffres",
-        "name": "C'est un nom de personne valide ?",
-        "quantity": "C'est une quantité valide (nombre entre 1 et 99) ?",
-        "reference": "C'est une référence de mission valide (format: M-XX, COUR-XXX, etc.) ?",
-    }
-    
+    record_rule_decision(expected_type, avoided_llm=False)
     system_prompt = f"""Tu es un validateur intelligent.
 
-Question: {validation_prompts.get(expected_type, "C'est valide ?")}
+Question: {VALIDATION_PROMPTS.get(expected_type, "C'est valide ?")}
 
 Input: "{user_input}"
 
@@ -211,18 +258,10 @@ Exemples:
 """
     
     try:
-        completion = openai_client.chat.completions.create(
-            model=OPENAI_MODEL,
-            messages=[
-                {"role": "system", "content": system_prompt},
-                {"role": "user", "content": user_input}
-            ],
-            temperature=0.0,
-            max_tokens=200,
-            response_format={"type": "json_object"}
-        )
-        
-        result = json.loads(completion.choices[0].message.content)
+        result = _llm_json(system_prompt, user_input, temperature=0.0, max_tokens=200,
+                           cache_as="smart_validate", cache_input=user_input,
+                           step=f"{current_step}:{expected_type}",
+                           use_cache=expected_type not in PRIVATE_EXPECTED_TYPES)
         
         is_valid = result.get("is_valid", False)
         extracted_value = result.get("extracted_value")
@@ -289,32 +328,20 @@ def detect_intent_change(user_input: str, current_flow: str) -> Optional[str]:
         Nouveau flow souhaité ou None
     """
     
-    user_lower = user_input.lower()
+    keyword_intent = _keyword_intent(user_input, current_flow)
+    if keyword_intent:
+        return keyword_intent
     
-    # Mots-clés évidents
-    if any(word in user_lower for word in ["marketplace", "commander", "restaurant", "manger", "plat", "menu"]):
-        if current_flow != "marketplace":
-            return "marketplace"
-    
-    if any(word in user_lower for word in ["suivre", "suivi", "track", "où est", "statut"]):
-        if current_flow != "follow":
-            return "follow"
+    if len(user_input) <= INTENT_LLM_MIN_LENGTH:
+        return None
     
-    # Détecter "nouvelle demande" SEULEMENT si pas déjà dans un flow actif
-    # Éviter de détecter "Nouvelle demande" qui peut être un bouton dans marketplace
-    if current_flow == "coursier":
-        # Dans coursier, on garde les redirections
-        pass
-    elif any(word in user_lower for word in ["livraison", "envoyer colis", "coursier"]):
-        return "coursier"
-    
-    # NE PAS intercepter "retour" - laissons les flows gérer ça eux-mêmes
-    # On détecte seulement "menu" et "accueil" explicitement
-    if any(word in user_lower for word in ["menu principal", "accueil"]):
-        return "menu"
+    # Classifieur local (quelques dizaines de µs) avant l'IA
+    decided, local_intent = _classifier_intent(user_input, current_flow)
+    if decided:
+        return local_intent
     
     # Utiliser l'IA si disponible pour les cas ambigus
-    if openai_client and len(user_input) > 15:
+    if llm_client:
         try:
             system_prompt = """Tu détectes si l'utilisateur veut changer d'intention.
 
@@ -326,19 +353,11 @@ Réponds en JSON:
 }
 """
             
-            completion = openai_client.chat.completions.create(
-                model=OPENAI_MODEL,
-                messages=[
-                    {"role": "system", "content": system_prompt},
-                    {"role": "user", "content": f"Flow actuel: {current_flow}\nInput: {user_input}"}
-                ],
-                temperature=0.0,
-                max_tokens=50,
-                response_format={"type": "json_object"}
-            )
-            
-            result = json.loads(completion.choices[0].message.content)
+            result = _llm_json(system_prompt, f"Flow actuel: {current_flow}\nInput: {user_input}",
+                               temperature=0.0, max_tokens=50,
+                               cache_as="detect_intent_change", cache_input=user_input, flow=current_flow)
             intent_change = result.get("intent_change")
+            log_turn(user_input, current_flow, intent_change)
             
             if intent_change and intent_change != "null":
                 logger.info(f"[INTENT_CHANGE] Detected: {current_flow} → {intent_change}")
@@ -350,10 +369,55 @@ Réponds en JSON:
     return None
 
 
+def _classifier_intent(user_input: str, current_flow: str) -> tuple[bool, Optional[str]]:
+    """
+    Intention selon le classifieur local
+    
+    Returns:
+        (décidé, nouveau flow ou None) ; décidé=False si la confiance est trop faible
+    """
+    label = classify_intent(user_input)
+    if label is None:
+        return (False, None)
+    return (True, None if label in ("none", current_flow) else label)
+
+
+def _keyword_intent(user_input: str, current_flow: str) -> Optional[str]:
+    """Changement d'intention évident (mots-clés du lexique, sans IA)"""
+    
+    intents = lexicon.analyze(user_input).values("intent")
+    
+    # Mots-clés évidents
+    if "marketplace" in intents and current_flow != "marketplace":
+        return "marketplace"
+    
+    if "follow" in intents and current_flow != "follow":
+        return "follow"
+    
+    # Détecter "nouvelle demande" SEULEMENT si pas déjà dans un flow actif
+    # Éviter de détecter "Nouvelle demande" qui peut être un bouton dans marketplace
+    # (dans coursier, on garde les redirections)
+    if "coursier" in intents and current_flow != "coursier":
+        return "coursier"
+    
+    # NE PAS intercepter "retour" - laissons les flows gérer ça eux-mêmes
+    # On détecte seulement "menu principal" et "accueil" explicitement
+    if "menu" in intents:
+        return "menu"
+    
+    return None
+
+
 def generate_smart_error_message(user_input: str, expected_type: str, current_step: str) -> str:
     """Génère un message d'erreur intelligent et personnalisé"""
     
-    if not openai_client:
+    if not llm_client:
+        return _basic_error_message(expected_type)
+    
+    # Erreur déjà caractérisée par les règles (ex: 8 chiffres, quantité 150) : message standard
+    rule = rule_validate(user_input, expected_type)
+    if is_confident(rule) and not rule["is_valid"]:
+        record_rule_decision(expected_type, avoided_llm=True)
         return _basic_error_message(expected_type)
     
     try:
@@ -375,18 +439,8 @@ Réponds en JSON:
 }}
 """
         
-        completion = openai_client.chat.completions.create(
-            model=OPENAI_MODEL,
-            messages=[
-                {"role": "system", "content": system_prompt},
-                {"role": "user", "content": user_input}
-            ],
-            temperature=0.5,
-            max_tokens=150,
-            response_format={"type": "json_object"}
-        )
-        
-        result = json.loads(completion.choices[0].message.content)
+        result = _llm_json(system_prompt, user_input, temperature=0.5, max_tokens=150,
+                           meter_as="generate_smart_error_message", step=f"{current_step}:{expected_type}")
         return result.get("error_message", _basic_error_message(expected_type))
         
     except:
@@ -404,3 +458,157 @@ def _basic_error_message(expected_type: str) -> str:
     }
     return messages.get(expected_type, "⚠️ Format invalide. Réessayez.")
 
+
+TURN_SYSTEM_PROMPT = """Tu es un assistant intelligent pour TokTok Delivery.
+Le message utilisateur donne le CONTEXTE, les TÂCHES demandées et l'input à analyser.
+
+Réponds STRICTEMENT en JSON:
+{
+    "intent_change": "coursier|marketplace|follow|menu|null",
+    "validation": {"is_valid": true/false, "extracted_value": "... ou null", "error_message": "... ou null"},
+    "extraction": {
+        "extracted_value": "valeur principale ou null",
+        "confidence": 0.0 à 1.0,
+        "extracted_fields": {"adresse_depart": "", "adresse_destination": "", "nom_expediteur": "",
+                             "telephone": "", "montant": "", "description": ""}
+    }
+}
+Omets "validation" ou "extraction" s'ils ne sont pas demandés.
+"""
+
+
+def _invalid_if_expected(turn: Dict[str, Any], expected_type: Optional[str]) -> Dict[str, Any]:
+    """Tour non validé (saisie vide, média, changement de flow) : toujours un message d'erreur affichable"""
+    if expected_type:
+        turn.update(is_valid=False, error_message=_basic_error_message(expected_type))
+    return turn
+
+
+def understand_turn(user_input: str, current_step: str, current_flow: str,
+                    expected_type: Optional[str] = None, extract: bool = False,
+                    context: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+    """
+    Compréhension d'un tour en un seul appel IA au plus
+    Remplace la chaîne detect_intent_change → extract_structured_data →
+    smart_validate → generate_smart_error_message : mots-clés et règles
+    d'abord, puis une seule requête pour ce qui reste à déterminer
+    
+    Args:
+        user_input: Ce que l'utilisateur a tapé
+        current_step: Étape actuelle du flow
+        current_flow: Flow actuel (coursier, marketplace)
+        expected_type: Type à valider à cette étape (phone, amount, quantity...) ou None
+        extract: Extraire aussi les champs libres (adresses, noms...)
+        context: Contexte de la session (utile pour l'extraction)
+    
+    Returns:
+        Dict avec:
+        - intent_change: Nouveau flow souhaité ou None
+        - is_valid, value, error_message: Validation (None si pas de type attendu)
+        - extracted_value, confidence, extracted_fields: Extraction
+        - llm_calls: 0 ou 1
+    """
+    turn = {
+        "intent_change": _keyword_intent(user_input or "", current_flow),
+        "is_valid": None,
+        "value": None,
+        "error_message": "",
+        "extracted_value": None,
+        "confidence": 0,
+        "extracted_fields": {},
+        "llm_calls": 0,
+    }
+    if turn["intent_change"] or not user_input:
+        return _invalid_if_expected(turn, expected_type)
+    
+    need_intent = len(user_input) > INTENT_LLM_MIN_LENGTH
+    if need_intent:
+        decided, local_intent = _classifier_intent(user_input, current_flow)
+        if decided:
+            turn["intent_change"] = local_intent
+            need_intent = False
+            if local_intent:
+                return _invalid_if_expected(turn, expected_type)
+    need_validation = False
+    if expected_type:
+        rule = rule_validate(user_input, expected_type)
+        if is_confident(rule):
+            record_rule_decision(expected_type, avoided_llm=True)
+            turn.update(is_valid=rule["is_valid"], value=rule["value"],
+                        error_message="" if rule["is_valid"] else _basic_error_message(expected_type))
+        else:
+            need_validation = True
+    
+    if not llm_client or not (need_intent or need_validation or extract):
+        if need_validation:
+            is_valid, value, _ = _basic_validate(user_input, expected_type)
+            turn.update(is_valid=is_valid, value=value,
+                        error_message="" if is_valid else _basic_error_message(expected_type))
+        return turn
+    
+    if need_validation:
+        record_rule_decision(expected_type, avoided_llm=False)
+    
+    tasks = []
+    if need_intent:
+        tasks.append('1. "intent_change" : l\'utilisateur veut-il changer de flow ? '
+                     '(coursier = livraison, marketplace = commande, follow = suivi, menu = retour menu) sinon null')
+    if need_validation:
+        question = VALIDATION_PROMPTS.get(expected_type, "C'est valide ?")
+        tasks.append(f'2. "validation" : {question} '
+                     'Donne is_valid, extracted_value (nettoyée) et, si invalide, un error_message '
+                     'court et amical en français avec un exemple concret')
+    if extract:
+        tasks.append(f'3. "extraction" : on attend {_get_expected_info(current_step, current_flow)}. '
+                     'Extrais la valeur principale et tous les autres champs donnés d\'un coup')
+    session_context = render_context(context, current_step) if extract else ""
+    user_content = (
+        f"CONTEXTE:\n- Flow actuel: {current_flow}\n- Étape actuelle: {current_step}\n"
+        + (f"- Session: {session_context}\n" if session_context else "")
+        + "\nTÂCHES (toutes en une réponse):\n" + "\n".join(tasks)
+        + f"\n\nInput utilisateur: {user_input}"
+    )
+    
+    try:
+        result = _llm_json(TURN_SYSTEM_PROMPT, user_content, temperature=0.0, max_tokens=400,
+                           cache_as="understand_turn", cache_input=user_input,
+                           step=f"{current_step}:{expected_type if need_validation else ''}:{int(extract)}",
+                           flow=current_flow,
+                           use_cache=not session_context
+                           and not (need_validation and expected_type in PRIVATE_EXPECTED_TYPES))
+        turn["llm_calls"] = 1
+    except Exception as e:
+        logger.warning(f"[TURN] IA indisponible, repli sur les règles: {e}")
+        result = {}
+    
+    intent_change = result.get("intent_change")
+    if need_intent and result:
+        log_turn(user_input, current_flow, intent_change)
+    if need_intent and intent_change and intent_change not in ("null", current_flow):
+        logger.info(f"[TURN] Intent change detected: {current_flow} → {intent_change}")
+        turn["intent_change"] = intent_change
+    
+    if need_validation:
+        validation = result.get("validation")
+        if isinstance(validation, dict) and "is_valid" in validation:
+            is_valid = bool(validation.get("is_valid"))
+            turn.update(is_valid=is_valid, value=validation.get("extracted_value"),
+                        error_message="" if is_valid else (validation.get("error_message")
+                                                          or _basic_error_message(expected_type)))
+        else:
+            is_valid, value, _ = _basic_validate(user_input, expected_type)
+            turn.update(is_valid=is_valid, value=value,
+                        error_message="" if is_valid else _basic_error_message(expected_type))
+    
+    extraction = result.get("extraction")
+    if extract and isinstance(extraction, dict):
+        try:
+            confidence = float(extraction.get("confidence") or 0)
+        except (TypeError, ValueError):
+            confidence = 0
+        turn.update(extracted_value=extraction.get("extracted_value"), confidence=confidence,
+                    extracted_fields={k: v for k, v in (extraction.get("extracted_fields") or {}).items() if v})
+    
+    logger.info(f"[TURN] '{user_input}' @ {current_step} → intent={turn['intent_change']} "
+                f"valid={turn['is_valid']} value={turn['value']} (llm_calls={turn['llm_calls']})")
+    return turn
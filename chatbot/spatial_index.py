@@ -0,0 +1,169 @@
+# chatbot/spatial_index.py
+"""
+Index spatial en mémoire (grille régulière)
+Répond à "k points les plus proches dans un rayon de R km" sans parcourir
+toute la liste, avec mise à jour incrémentale
+"""
+import math
+import logging
+import threading
+from collections import defaultdict
+from typing import Dict, Any, Optional, Tuple, List, Set
+
+from .geocoding_service import haversine_matrix
+
+logger = logging.getLogger(__name__)
+
+KM_PER_DEG_LAT = 111.32
+DEFAULT_CELL_KM = 1.0
+DEFAULT_REF_LAT = -4.27  # Brazzaville : sert à dimensionner les cellules en longitude
+
+
+class GridSpatialIndex:
+    """Grille lat/lon de cellules d'environ cell_km de côté"""
+
+    def __init__(self, cell_km: float = DEFAULT_CELL_KM, ref_lat: float = DEFAULT_REF_LAT):
+        """
+        Args:
+            cell_km: Taille d'une cellule en kilomètres
+            ref_lat: Latitude de référence pour la largeur des cellules
+        """
+        self.cell_km = cell_km
+        self.dlat = cell_km / KM_PER_DEG_LAT
+        self.dlon = cell_km / (KM_PER_DEG_LAT * max(math.cos(math.radians(ref_lat)), 0.01))
+
+        self._points: Dict[str, Tuple[float, float, Any]] = {}  # clé → (lat, lon, payload)
+        self._cells: Dict[Tuple[int, int], Set[str]] = defaultdict(set)
+        self._lock = threading.RLock()
+
+    def _cell(self, lat: float, lon: float) -> Tuple[int, int]:
+        return (math.floor(lat / self.dlat), math.floor(lon / self.dlon))
+
+    def __len__(self) -> int:
+        return len(self._points)
+
+    def __contains__(self, key) -> bool:
+        return str(key) in self._points
+
+    def get(self, key) -> Optional[Tuple[float, float, Any]]:
+        return self._points.get(str(key))
+
+    def upsert(self, key, lat: float, lon: float, payload: Any = None):
+        """Ajoute ou déplace un point"""
+        key = str(key)
+        with self._lock:
+            old = self._points.get(key)
+            if old is not None:
+                old_cell = self._cell(old[0], old[1])
+                if old_cell != self._cell(lat, lon):
+                    self._discard_from_cell(old_cell, key)
+            self._points[key] = (float(lat), float(lon), payload)
+            self._cells[self._cell(lat, lon)].add(key)
+
+    def remove(self, key) -> bool:
+        """Retire un point (True s'il était présent)"""
+        key = str(key)
+        with self._lock:
+            old = self._points.pop(key, None)
+            if old is None:
+                return False
+            self._discard_from_cell(self._cell(old[0], old[1]), key)
+            return True
+
+    def _discard_from_cell(self, cell: Tuple[int, int], key: str):
+        bucket = self._cells.get(cell)
+        if bucket is not None:
+            bucket.discard(key)
+            if not bucket:
+                del self._cells[cell]
+
+    def sync(self, items: Dict[Any, Tuple[float, float, Any]]) -> Dict[str, int]:
+        """
+        Aligne l'index sur un instantané complet (ajouts, déplacements, retraits)
+
+        Args:
+            items: clé → (lat, lon, payload)
+
+        Returns:
+            {"added", "moved", "removed"}
+        """
+        items = {str(k): v for k, v in items.items()}
+        added = moved = 0
+        with self._lock:
+            removed_keys = [k for k in self._points if k not in items]
+            for key in removed_keys:
+                self.remove(key)
+            for key, (lat, lon, payload) in items.items():
+                old = self._points.get(key)
+                if old is None:
+                    added += 1
+                elif (old[0], old[1]) != (float(lat), float(lon)):
+                    moved += 1
+                self.upsert(key, lat, lon, payload)
+        if added or moved or removed_keys:
+            logger.debug(f"[SPATIAL] sync +{added} ~{moved} -{len(removed_keys)} (total {len(self._points)})")
+        return {"added": added, "moved": moved, "removed": len(removed_keys)}
+
+    def nearest(self, lat: float, lon: float, k: int = 5,
+                radius_km: float = 5.0) -> List[Tuple[str, float, Any]]:
+        """
+        Les k points les plus proches dans un rayon donné
+
+        Args:
+            lat, lon: Position de référence
+            k: Nombre maximum de résultats
+            radius_km: Rayon de recherche en kilomètres
+
+        Returns:
+            Liste triée de (clé, distance_km, payload)
+        """
+        if k <= 0:
+            return []
+        ci, cj = self._cell(lat, lon)
+        max_ring = int(math.ceil(radius_km / self.cell_km))
+
+        with self._lock:
+            keys: List[str] = []
+            coords: List[Tuple[float, float]] = []
+            dists = None
+            for ring in range(max_ring + 1):
+                for i in range(ci - ring, ci + ring + 1):
+                    for j in range(cj - ring, cj + ring + 1):
+                        if max(abs(i - ci), abs(j - cj)) != ring:
+                            continue
+                        for key in self._cells.get((i, j), ()):
+                            p = self._points[key]
+                            keys.append(key)
+                            coords.append((p[0], p[1]))
+                if len(keys) < k:
+                    continue
+                # Toute cellule non visitée est à plus de ring * cell_km
+                dists = haversine_matrix([(lat, lon)], coords)[0]
+                covered = ring * self.cell_km
+                if (dists <= covered).sum() >= k:
+                    break
+
+            if not keys:
+                return []
+            if dists is None or len(dists) != len(keys):
+                dists = haversine_matrix([(lat, lon)], coords)[0]
+            order = dists.argsort()
+            results = []
+            for idx in order[:k]:
+                d = float(dists[idx])
+                if d > radius_km:
+                    break
+                results.append((keys[idx], round(d, 2), self._points[keys[idx]][2]))
+            return results
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Statistiques de l'index"""
+        return {
+            "points": len(self._points),
+            "cells": len(self._cells),
+            "cell_km": self.cell_km,
+        }
+
+
+# Instance globale : points de retrait des missions ouvertes
+mission_index = GridSpatialIndex()
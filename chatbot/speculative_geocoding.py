@@ -0,0 +1,124 @@
+# chatbot/speculative_geocoding.py
+"""
+Géocodage spéculatif en arrière-plan
+Les adresses saisies dans le flow coursier sont géocodées dès leur saisie,
+pendant que l'utilisateur répond aux étapes suivantes ; le récapitulatif
+lit le résultat s'il est prêt, sans jamais attendre
+"""
+import os
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, Any, Optional, Tuple
+
+from .geocoding_service import geocode_address, parse_coords, travel_estimate, format_travel_time
+from .geocoding_scheduler import PRIORITY_BACKGROUND
+
+logger = logging.getLogger(__name__)
+
+PREFETCH_WORKERS = int(os.getenv("TOKTOK_GEO_PREFETCH_WORKERS", "2"))
+
+# Clé de session (hors new_request, qui est sérialisé en JSON pour l'IA)
+SESSION_KEY = "_geo_futures"
+
+_executor = ThreadPoolExecutor(max_workers=PREFETCH_WORKERS, thread_name_prefix="geo-prefetch")
+_stats_lock = threading.Lock()
+stats = {
+    "submitted": 0,
+    "ready_when_needed": 0,
+    "not_ready_when_needed": 0,
+    "not_found": 0,
+    "errors": 0,
+}
+
+
+def _count(key: str):
+    with _stats_lock:
+        stats[key] += 1
+
+
+def prefetch_geocode(session: Dict[str, Any], slot: str, address: Optional[str]):
+    """
+    Lance le géocodage d'une adresse en tâche de fond
+
+    Args:
+        session: Session utilisateur
+        slot: "depart" ou "destination"
+        address: Adresse saisie par l'utilisateur
+    """
+    if not address or address == "Position actuelle":
+        return
+    futures = session.setdefault(SESSION_KEY, {})
+    current = futures.get(slot)
+    if current and current["address"] == address:
+        return
+    futures[slot] = {
+        "address": address,
+        "future": _executor.submit(geocode_address, address, priority=PRIORITY_BACKGROUND),
+    }
+    _count("submitted")
+    logger.debug(f"[GEO_PREFETCH] {slot}: '{address}' soumis")
+
+
+def peek_geocode(session: Dict[str, Any], slot: str, address: Optional[str]) -> Optional[Tuple[float, float]]:
+    """
+    Résultat du géocodage spéculatif s'il est déjà disponible (jamais bloquant)
+
+    Returns:
+        (lat, lon) ou None si pas encore prêt / introuvable
+    """
+    entry = (session.get(SESSION_KEY) or {}).get(slot)
+    if not entry or entry["address"] != address:
+        return None
+    future = entry["future"]
+    if not future.done():
+        _count("not_ready_when_needed")
+        return None
+    try:
+        result = future.result()
+    except Exception as e:
+        logger.warning(f"[GEO_PREFETCH] {slot}: erreur {e}")
+        _count("errors")
+        return None
+    _count("ready_when_needed" if result else "not_found")
+    return result
+
+
+def clear_prefetch(session: Dict[str, Any]):
+    """Oublie les géocodages en cours (fin ou abandon de la demande)"""
+    session.pop(SESSION_KEY, None)
+
+
+def request_points(session: Dict[str, Any]) -> Tuple[Optional[Tuple[float, float]], Optional[Tuple[float, float]]]:
+    """
+    Points de départ et d'arrivée de la demande en cours (GPS partagé ou géocodage prêt)
+    Affichage seulement (distance / durée du récapitulatif) : un géocodage peut
+    n'être que le centre d'un quartier, il n'est jamais envoyé au backend
+    """
+    d = session.get("new_request") or {}
+    start = parse_coords(d.get("coordonnees_gps")) or peek_geocode(session, "depart", d.get("depart"))
+    end = parse_coords(d.get("coordonnees_livraison")) or peek_geocode(session, "destination", d.get("destination"))
+    return start, end
+
+
+def recap_distance(session: Dict[str, Any]) -> Optional[Dict[str, str]]:
+    """
+    Distance et durée estimées pour le récapitulatif, si les deux points sont connus
+
+    Returns:
+        {"distance_text", "estimated_time"} ou None
+    """
+    start, end = request_points(session)
+    if not start or not end:
+        return None
+    distance_km, minutes = travel_estimate(start[0], start[1], end[0], end[1])
+    return {"distance_text": f"{distance_km} km", "estimated_time": format_travel_time(minutes)}
+
+
+def get_stats() -> Dict[str, Any]:
+    """Part des géocodages prêts au moment où ils ont été lus"""
+    with _stats_lock:
+        snapshot = dict(stats)
+    needed = snapshot["ready_when_needed"] + snapshot["not_ready_when_needed"] + snapshot["not_found"]
+    snapshot["ready_ratio"] = round(snapshot["ready_when_needed"] / needed, 4) if needed else 0
+    return snapshot
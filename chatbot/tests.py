@@ -1,3 +1,94 @@
-from django.test import TestCase
+from django.test import SimpleTestCase
 
-# Create your tests here.
+from .gazetteer import Gazetteer
+
+
+class GazetteerLookupTests(SimpleTestCase):
+    """Résolution locale : jamais de lieu pris dans une autre ville"""
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.gazetteer = Gazetteer.load()
+
+    def name_of(self, address, city=None):
+        entry = self.gazetteer.lookup(address, city)
+        return entry["name"] if entry else None
+
+    def test_quartier_in_default_city(self):
+        self.assertEqual(self.name_of("25 Rue Malanda, Poto-Poto", "Brazzaville"), "Poto-Poto")
+
+    def test_other_city_quartier_is_not_returned(self):
+        # Lumumba est un arrondissement de Pointe-Noire
+        self.assertIsNone(self.name_of("Boulevard Lumumba, Brazzaville", "Brazzaville"))
+
+    def test_generic_word_does_not_match_landmark(self):
+        self.assertIsNone(self.name_of("Rue du Port", "Brazzaville"))
+        # "centre" seul ne désigne plus le Centre-ville : le quartier cité l'emporte
+        self.assertEqual(self.name_of("centre commercial Casino, Mpila", "Brazzaville"), "Mpila")
+
+    def test_city_name_alone_falls_through(self):
+        self.assertIsNone(self.name_of("Rue Bouenza, Pointe-Noire"))
+        self.assertIsNone(self.name_of("Pointe-Noire"))
+
+    def test_detected_city_overrides_default(self):
+        self.assertEqual(self.name_of("Siafoumou, Pointe-Noire", "Brazzaville"), "Siafoumou")
+
+    def test_explicit_landmark_with_city_name(self):
+        self.assertEqual(self.name_of("Port de Pointe-Noire"), "Port Autonome de Pointe-Noire")
+
+
+class UnderstandTurnTests(SimpleTestCase):
+    """Un tour non validé doit toujours fournir un message d'erreur affichable"""
+
+    def test_empty_input_with_expected_type(self):
+        from .smart_fallback import understand_turn
+        turn = understand_turn("", "DEST_TEL", "coursier", expected_type="phone")
+        self.assertIs(turn["is_valid"], False)
+        self.assertTrue(turn["error_message"])
+        self.assertEqual(turn["llm_calls"], 0)
+
+    def test_empty_input_without_expected_type(self):
+        from .smart_fallback import understand_turn
+        turn = understand_turn("", "MENU", "coursier")
+        self.assertIsNone(turn["is_valid"])
+
+
+class GeocodingSchedulerTests(SimpleTestCase):
+    """Une requête interactive dédupliquée sur une requête de fond ne reste pas en fin de file"""
+
+    def test_interactive_duplicate_promotes_background_entry(self):
+        import threading
+        from .geocoding_scheduler import GeocodingScheduler, PRIORITY_BACKGROUND
+
+        release, order = threading.Event(), []
+
+        def fetch(query):
+            release.wait(5)
+            order.append(query)
+            return query
+
+        scheduler = GeocodingScheduler(fetch, min_interval=0, name="test_geocoding_scheduler")
+        futures = [scheduler.submit(query, PRIORITY_BACKGROUND) for query in ("a", "b", "c", "d")]
+        promoted = scheduler.submit("d")
+        self.assertIs(promoted, futures[-1])
+        release.set()
+        for future in futures:
+            future.result(timeout=5)
+        # Passe devant les requêtes de fond soumises avant elle
+        self.assertLess(order.index("d"), order.index("b"))
+        self.assertEqual(scheduler.get_stats()["promoted"], 1)
+
+
+class MerchantOrderStatusLexiconTests(SimpleTestCase):
+    """Chaque statut de commande reconnu est un statut accepté par le backend"""
+
+    def test_status_words_map_to_backend_statuses(self):
+        from .lexicon import lexicon
+        from .merchant_flow import STATUTS_CMD
+        cases = {"Accepter": "acceptee", "préparer": "preparee", "Expédier": "expediee",
+                 "livrée": "livree", "livrées": "livree", "annuler": "annulee"}
+        for text, statut in cases.items():
+            value = lexicon.exact(text, "marchand")
+            self.assertEqual(value, statut, text)
+            self.assertIn(value, STATUTS_CMD)
@@ -234,6 +234,18 @@ def dispatch_whatsapp_message(to: str, resp: dict):
     """
     text = resp.get("response", "")
 
+    # Cas média : media_id déjà uploadé (réutilisable), sinon lien ;
+    # la liste ou les boutons éventuels suivent l'image (comme dans views.py)
+    media = resp.get("media") or {}
+    media_sent = None
+    if media.get("id") or media.get("url"):
+        kind = media.get("type", "image")
+        caption = media.get("caption", text)
+        if media.get("id"):
+            media_sent = send_whatsapp_media_id(to, media["id"], kind=kind, caption=caption)
+        else:
+            media_sent = send_whatsapp_media_url(to, media["url"], kind=kind, caption=caption)
+
     # Cas localisation
     if resp.get("ask_location"):
         return send_whatsapp_location_request(to)
@@ -249,5 +261,9 @@ def dispatch_whatsapp_message(to: str, resp: dict):
     if "buttons" in resp and resp["buttons"]:
         return send_whatsapp_buttons(to, text, resp["buttons"])
 
+    # Image seule : le texte est déjà dans la légende
+    if media_sent is not None:
+        return media_sent
+
     # Fallback texte
     return send_whatsapp_message(to, text)
\ No newline at end of file
@@ -8,12 +8,18 @@ from .utils import (
     send_whatsapp_buttons,
     send_whatsapp_location_request,
     send_whatsapp_media_url,
+    send_whatsapp_media_id,
     send_whatsapp_list,
     ACCESS_TOKEN,
 )
 from .router import handle_incoming        # ⇦ point d'entrée unique
 from .auth_core import get_session         # ⇦ sessions partagées
 from .analytics import analytics           # ⇦ tracking métriques
+from .llm_gateway import turn_deadline      # ⇦ budget IA par message
+from .llm_metering import for_user          # ⇦ quotas IA par utilisateur
+from .pagination import paginate, turn_page  # ⇦ listes longues en pages
+from .backend_warmth import backend_warmth, COLD_NOTICE  # ⇦ réveil du backend
+from .product_images import get_product_image_media_id  # ⇦ photos produits par media_id
 
 logger = logging.getLogger(__name__)
 VERIFY_TOKEN = "toktok_secret"
@@ -137,17 +143,26 @@ def whatsapp_webhook(request):
                     # On passe juste un texte indicatif
                     text = "LOCATION_SHARED"
 
-            # Passage au moteur
-            bot_output = handle_incoming(
-                from_number,
-                text,
-                lat=msg.get("location", {}).get("latitude") if msg_type == "location" else None,
-                lng=msg.get("location", {}).get("longitude") if msg_type == "location" else None,
-                media_url=media_url if media_url else None,
-                wa_message_id=wamid,
-                wa_timestamp=msg.get("timestamp"),
-                wa_type=msg_type,
-            )
+            # Page suivante / précédente d'une liste : servie depuis la session
+            bot_output = turn_page(session, text)
+
+            # Passage au moteur (appels IA du tour bornés par une échéance commune)
+            if bot_output is None:
+                # Backend en plein réveil : prévenir avant la réponse, qui peut prendre plusieurs secondes
+                if backend_warmth.should_notify(from_number):
+                    send_whatsapp_message(from_number, COLD_NOTICE)
+                with turn_deadline(), for_user(from_number):
+                    bot_output = handle_incoming(
+                        from_number,
+                        text,
+                        lat=msg.get("location", {}).get("latitude") if msg_type == "location" else None,
+                        lng=msg.get("location", {}).get("longitude") if msg_type == "location" else None,
+                        media_url=media_url if media_url else None,
+                        wa_message_id=wamid,
+                        wa_timestamp=msg.get("timestamp"),
+                        wa_type=msg_type,
+                    )
+                bot_output = paginate(session, bot_output)
 
             # Localisation demandée explicitement
             if session.get("step") == "COURIER_DEPART":
@@ -162,10 +177,16 @@ def whatsapp_webhook(request):
                 media_type = media_cfg.get("type", "image")
                 media_url = media_cfg.get("url")
                 media_caption = media_cfg.get("caption", bot_output.get("response", ""))
+                media_id = media_cfg.get("id")
+                if not media_id and media_cfg.get("product_id") is not None and media_type == "image":
+                    # Photo produit : media_id déjà uploadé, sinon préparation en fond et envoi par lien
+                    media_id = get_product_image_media_id(media_cfg["product_id"], media_url, wait=False)
                 
-                if media_url:
-                    from .utils import send_whatsapp_media_url
-                    send_whatsapp_media_url(from_number, media_url, kind=media_type, caption=media_caption)
+                if media_id or media_url:
+                    if media_id:
+                        send_whatsapp_media_id(from_number, media_id, kind=media_type, caption=media_caption)
+                    else:
+                        send_whatsapp_media_url(from_number, media_url, kind=media_type, caption=media_caption)
                     
                     # Si des boutons sont présents, les envoyer après l'image
                     if bot_output.get("buttons"):
@@ -14,6 +14,7 @@ from .notifications import (
     notify_order_confirmed,
     notify_order_ready
 )
+from .mission_broadcast import mission_broadcaster, OPEN_STATUSES, CLOSED_STATUSES
 
 logger = logging.getLogger(__name__)
 
@@ -51,6 +52,15 @@ def on_mission_status_changed(mission_id: int, new_status: str, mission_data: Di
             }
         )
     """
+    # Diffusion aux livreurs proches (indépendante de la notification client)
+    try:
+        if new_status in OPEN_STATUSES:
+            mission_broadcaster.broadcast({**mission_data, "id": mission_id})
+        elif new_status in CLOSED_STATUSES:
+            mission_broadcaster.cancel(mission_id)
+    except Exception as e:
+        logger.warning(f"[WEBHOOK] Broadcast error for mission {mission_id}: {e}")
+    
     try:
         client_phone = mission_data.get("contact_entreprise")
         if not client_phone: